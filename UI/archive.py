@@ -0,0 +1,513 @@
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from UI.recorder import (
+    COLUMNS, RUNS_DIR, concat_columns, decode_payload, iter_chunks, read_header,
+)
+
+# =========================
+# CONFIG
+# =========================
+INDEX_NAME = "index.sqlite"
+CACHE_DIR_NAME = "cache"     # uncompressed .npy copies, for memory-mapped loading
+SETPOINT_TOLERANCE_RPM = 50
+RUN_MATCH_S = 10             # an assay's run started within this of the assay's START
+RAMP_GAP_S = 1.0             # setpoint changes this close, in one direction, are one ramp
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    device_id TEXT,
+    path TEXT,
+    size INTEGER,
+    mtime REAL,
+    started REAL,
+    stopped REAL,
+    duration_s REAL,
+    rows INTEGER,
+    complete INTEGER,
+    setpoint_max REAL,
+    rpm_mean REAL,
+    rpm_std REAL,
+    rpm_min REAL,
+    rpm_max REAL,
+    pwm_mean REAL,
+    meta TEXT,
+    settling_s REAL,
+    overshoot_pct REAL,
+    ss_error_rpm REAL,
+    ripple_rpm REAL,
+    shear_exposure REAL,
+    verdict TEXT
+);
+CREATE TABLE IF NOT EXISTS setpoints (
+    run_id TEXT,
+    t_s REAL,
+    rpm REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    run_id TEXT,
+    offset INTEGER,
+    n_rows INTEGER,
+    t_first REAL,
+    t_last REAL
+);
+CREATE TABLE IF NOT EXISTS assays (
+    sample TEXT,
+    run_id TEXT,
+    device_id TEXT,
+    started REAL,
+    stopped REAL,
+    setpoint_rpm REAL,
+    runtime_s REAL,
+    image_dir TEXT,
+    counted REAL,
+    stat_count REAL,
+    stat_count_std REAL,
+    act_count REAL,
+    act_count_std REAL,
+    platelet_loss REAL,
+    platelet_loss_std REAL,
+    activity REAL,
+    activity_std REAL
+);
+CREATE INDEX IF NOT EXISTS runs_device ON runs (device_id, started);
+CREATE INDEX IF NOT EXISTS setpoints_rpm ON setpoints (rpm, run_id);
+CREATE INDEX IF NOT EXISTS chunks_run ON chunks (run_id, t_first);
+CREATE INDEX IF NOT EXISTS assays_run ON assays (run_id);
+"""
+
+# Columns added after the first index version, with their type
+ADDED_COLUMNS = {
+    "settling_s": "REAL", "overshoot_pct": "REAL", "ss_error_rpm": "REAL",
+    "ripple_rpm": "REAL", "shear_exposure": "REAL", "verdict": "TEXT",
+}
+
+def _profile_schedule(command, start_rpm, duration_s):
+    """
+    Segment boundaries of a run's profile, (t_s, rpm) from START, up to
+    duration_s. The first segment ramps from start_rpm.
+    """
+    rows, t = [(0.0, start_rpm)], 0.0
+    for segment in command.split(" ", 1)[1].split(","):
+        rpm, seconds = (float(v) for v in segment.split(":"))
+        t += seconds
+        if t > duration_s:
+            break
+        if (t, rpm) != rows[-1]:
+            rows.append((t, rpm))
+    return rows
+
+def _drop_ramp_ticks(changes):
+    """
+    Keep the first and last setpoint change of each ramp: an interior
+    change is as close to both neighbours as RAMP_GAP_S, in one direction.
+    """
+    kept = changes[:1]
+    for before, change, after in zip(changes, changes[1:], changes[2:]):
+        ramp = (change[0] - before[0] <= RAMP_GAP_S and after[0] - change[0] <= RAMP_GAP_S
+                and (change[1] > before[1]) == (after[1] > change[1]))
+        if not ramp:
+            kept.append(change)
+    return kept + changes[1:][-1:]
+
+def _epoch(value):
+    """Epoch seconds from a number, a datetime or a "YYYY-MM-DD[ HH:MM]" string."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        fmt = "%Y-%m-%d %H:%M" if " " in value else "%Y-%m-%d"
+        return time.mktime(time.strptime(value, fmt))
+    return value.timestamp()
+
+def _open_mmap(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+# =========================
+# RUN ARCHIVE
+# A SQLite index next to the recordings (see UI/recorder.py): one row of
+# summary stats per run, its setpoint schedule and the byte offset and
+# time span of every chunk. Queries only read the index; loads seek
+# straight to the chunks they need in the memory-mapped file.
+# A connection is opened per call, so any thread can use the archive.
+# =========================
+class RunArchive:
+    def __init__(self, runs_dir=RUNS_DIR):
+        self.runs_dir = runs_dir
+        self.index_path = os.path.join(runs_dir, INDEX_NAME)
+        self.cache_dir = os.path.join(runs_dir, CACHE_DIR_NAME)
+        os.makedirs(runs_dir, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            existing = {row["name"] for row in db.execute("PRAGMA table_info(runs)")}
+            for name, kind in ADDED_COLUMNS.items():
+                if name not in existing:
+                    db.execute(f"ALTER TABLE runs ADD COLUMN {name} {kind}")
+
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, timeout=10)
+        db.row_factory = sqlite3.Row
+        return db
+
+    # ================= INDEXING =================
+    def index_run(self, path):
+        """
+        (Re)index one run file in a single pass over its chunks. Stats are
+        combined chunk by chunk, so memory stays bounded whatever the length.
+
+        Returns:
+            - run_id (str | None) : None if the file is not a readable run
+        """
+        try:
+            data = _open_mmap(path)
+        except (OSError, ValueError):
+            return None  # empty file: the writer has not flushed its header yet
+        try:
+            meta, offset = read_header(data)
+        except ValueError:
+            data.close()
+            return None
+
+        run_id = meta["run_id"]
+        rows, rpm_sum, rpm_sq, pwm_sum = 0, 0.0, 0.0, 0.0
+        rpm_min, rpm_max, setpoint_max = np.inf, -np.inf, -np.inf
+        t_first = t_last = None
+        last_setpoint = None
+        schedule, chunks, summary = [], [], None
+        with data:
+            for chunk_offset, n_rows, payload in iter_chunks(data, offset):
+                if chunk_offset is None:
+                    summary = payload
+                    continue
+                c = decode_payload(payload, n_rows)
+                t = c["host_t"]
+                chunks.append((run_id, chunk_offset, n_rows, float(t[0]), float(t[-1])))
+                t_first = float(t[0]) if t_first is None else t_first
+                t_last = float(t[-1])
+
+                rpm = c["rpm"].astype(np.float64)
+                rows += n_rows
+                rpm_sum += rpm.sum()
+                rpm_sq += np.dot(rpm, rpm)
+                rpm_min = min(rpm_min, rpm.min())
+                rpm_max = max(rpm_max, rpm.max())
+                pwm_sum += c["pwm"].sum(dtype=np.float64)
+
+                # Setpoint schedule: the rows where the setpoint changes
+                sp = c["setpoint"]
+                setpoint_max = max(setpoint_max, float(sp.max()))
+                changes = np.flatnonzero(np.diff(sp)) + 1
+                if last_setpoint is None or sp[0] != last_setpoint:
+                    changes = np.concatenate(([0], changes))
+                schedule += [(float(t[i] - meta["started"]), float(sp[i])) for i in changes]
+                last_setpoint = sp[-1]
+
+        # A profile ramp changes the setpoint at every tick: keep the
+        # segment boundaries only
+        if meta.get("profile") and schedule:
+            start_rpm = meta.get("setpoint_rpm")  # setpoint at START
+            if start_rpm is None:
+                start_rpm = schedule[0][1]
+            schedule = _profile_schedule(meta["profile"], start_rpm, t_last - meta["started"])
+        else:
+            schedule = _drop_ramp_ticks(schedule)
+        schedule = [(run_id, t_s, rpm) for t_s, rpm in schedule]
+
+        started = meta["started"]
+        stopped = summary["stopped"] if summary else t_last
+        mean = rpm_sum / rows if rows else None
+        quality = (summary or {}).get("quality") or {}
+        st = os.stat(path)
+        record = {
+            "run_id": run_id, "device_id": meta["device_id"], "path": os.path.abspath(path),
+            "size": st.st_size, "mtime": st.st_mtime,
+            "started": started, "stopped": stopped,
+            "duration_s": (t_last - t_first) if rows else 0.0,
+            "rows": rows, "complete": int(summary is not None),
+            "setpoint_max": setpoint_max if rows else None,
+            "rpm_mean": mean,
+            "rpm_std": float(np.sqrt(max(rpm_sq / rows - mean * mean, 0))) if rows else None,
+            "rpm_min": float(rpm_min) if rows else None,
+            "rpm_max": float(rpm_max) if rows else None,
+            "pwm_mean": pwm_sum / rows if rows else None,
+            "meta": json.dumps({k: v for k, v in meta.items() if k != "columns"}),
+            "settling_s": quality.get("worst_settling_s"),
+            "overshoot_pct": quality.get("worst_overshoot_pct"),
+            "ss_error_rpm": quality.get("ss_error_rpm"),
+            "ripple_rpm": quality.get("ripple_rpm"),
+            "shear_exposure": quality.get("shear_exposure"),
+            "verdict": quality.get("verdict"),
+        }
+        with self._connect() as db:
+            db.execute("DELETE FROM setpoints WHERE run_id = ?", (run_id,))
+            db.execute("DELETE FROM chunks WHERE run_id = ?", (run_id,))
+            db.execute(f"INSERT OR REPLACE INTO runs ({', '.join(record)}) "
+                       f"VALUES ({', '.join('?' * len(record))})", list(record.values()))
+            db.executemany("INSERT INTO setpoints VALUES (?, ?, ?)", schedule)
+            db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", chunks)
+        return run_id
+
+    def scan(self):
+        """
+        Index every run file that is new or changed since it was indexed.
+
+        Returns:
+            - indexed (int) : Number of files (re)indexed
+        """
+        with self._connect() as db:
+            known = {r["path"]: (r["size"], r["mtime"])
+                     for r in db.execute("SELECT path, size, mtime FROM runs")}
+        indexed = 0
+        for folder, _, files in os.walk(self.runs_dir):
+            for name in files:
+                if not name.endswith(".vwr"):
+                    continue
+                path = os.path.abspath(os.path.join(folder, name))
+                st = os.stat(path)
+                if known.get(path) != (st.st_size, st.st_mtime):
+                    indexed += self.index_run(path) is not None
+        return indexed
+
+    # ================= QUERIES =================
+    def find(self, device_id=None, setpoint=None, since=None, until=None,
+             min_duration=None, complete=None, tolerance=SETPOINT_TOLERANCE_RPM):
+        """
+        Runs matching every given filter, from the index only.
+
+        Parameters:
+            - device_id (str | None) : Stirrer ID
+            - setpoint (float | None) : Runs with a step at this RPM (± tolerance)
+            - since, until (float | str | datetime | None) : Start time bounds
+            - min_duration (float | None) : Seconds of recorded telemetry
+            - complete (bool | None) : Only closed (True) or crashed (False) runs
+
+        Returns:
+            - runs (pandas.DataFrame) : One row per run, oldest first
+        """
+        where, args = [], []
+        if device_id is not None:
+            where.append("device_id = ?")
+            args.append(device_id)
+        if setpoint is not None:
+            where.append("run_id IN (SELECT run_id FROM setpoints WHERE rpm BETWEEN ? AND ?)")
+            args += [setpoint - tolerance, setpoint + tolerance]
+        if since is not None:
+            where.append("started >= ?")
+            args.append(_epoch(since))
+        if until is not None:
+            where.append("started < ?")
+            args.append(_epoch(until))
+        if min_duration is not None:
+            where.append("duration_s >= ?")
+            args.append(min_duration)
+        if complete is not None:
+            where.append("complete = ?")
+            args.append(int(complete))
+
+        query = "SELECT * FROM runs"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        with self._connect() as db:
+            runs = pd.read_sql_query(query + " ORDER BY started", db, params=args)
+        runs["started_at"] = pd.to_datetime(runs["started"], unit="s")
+        return runs
+
+    def run_at(self, device_id, t, tolerance=RUN_MATCH_S):
+        """
+        Run of a stirrer started closest to t (epoch seconds), for linking
+        to a run recorded elsewhere (the daemon).
+
+        Returns:
+            - run_id (str | None) : None if no run started within tolerance
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT run_id FROM runs WHERE device_id = ? AND started BETWEEN ? AND ? "
+                             "ORDER BY abs(started - ?) LIMIT 1",
+                             (device_id, t - tolerance, t + tolerance, t)).fetchone()
+        return row["run_id"] if row else None
+
+    def setpoint_schedule(self, run_id):
+        """
+        Returns:
+            - schedule (pandas.DataFrame) : t_s (from the run start) and rpm of each step
+        """
+        with self._connect() as db:
+            return pd.read_sql_query(
+                "SELECT t_s, rpm FROM setpoints WHERE run_id = ? ORDER BY t_s", db,
+                params=(run_id,))
+
+    def _run(self, db, run_id):
+        run = db.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            raise KeyError(f"unknown run {run_id}")
+        return run
+
+    # ================= LOADING =================
+    def load_arrays(self, run_id, t0=None, t1=None):
+        """
+        Columns of a run (or of t0..t1 seconds from its start). Uses the
+        memory-mapped cache if one was built, else decompresses only the
+        chunks overlapping the range.
+
+        Returns:
+            - columns (dict) : Column name -> NumPy array, plus "t" (s from the run start)
+        """
+        with self._connect() as db:
+            run = self._run(db, run_id)
+            started = run["started"]
+            lo = -np.inf if t0 is None else started + t0
+            hi = np.inf if t1 is None else started + t1
+
+            cache = self._cache_path(run_id)
+            if os.path.exists(cache):
+                table = np.load(cache, mmap_mode="r")
+                i = np.searchsorted(table["host_t"], lo, side="left")
+                j = np.searchsorted(table["host_t"], hi, side="right")
+                columns = {name: table[name][i:j] for name, _ in COLUMNS}
+            else:
+                chunks = db.execute(
+                    "SELECT offset, n_rows FROM chunks WHERE run_id = ? "
+                    "AND t_last >= ? AND t_first <= ? ORDER BY offset",
+                    (run_id, lo, hi)).fetchall()
+                with _open_mmap(run["path"]) as data:
+                    decoded = [decode_payload(payload, n_rows)
+                               for offset, n_rows, payload in
+                               (next(iter_chunks(data, c["offset"])) for c in chunks)]
+                columns = concat_columns(decoded)
+                keep = (columns["host_t"] >= lo) & (columns["host_t"] <= hi)
+                if not keep.all():
+                    columns = {name: a[keep] for name, a in columns.items()}
+
+        columns["t"] = columns["host_t"] - started
+        return columns
+
+    def load(self, run_id, t0=None, t1=None):
+        """
+        Same as load_arrays, as a DataFrame.
+
+        Returns:
+            - run (pandas.DataFrame) : One row per sample
+        """
+        return pd.DataFrame(self.load_arrays(run_id, t0, t1))
+
+    def memmap(self, run_id):
+        """
+        Zero-copy access to a whole run: its columns are written once,
+        uncompressed, to an .npy cache which is then memory-mapped. Later
+        load_arrays/load calls use the cache too. Runs that were not closed
+        (still recording, or crashed) are returned in memory, uncached.
+
+        Returns:
+            - table (numpy.memmap | numpy.ndarray) : Structured array, one field per column
+        """
+        cache = self._cache_path(run_id)
+        if os.path.exists(cache):
+            return np.load(cache, mmap_mode="r")
+
+        with self._connect() as db:
+            complete = self._run(db, run_id)["complete"]
+        columns = self.load_arrays(run_id)
+        table = np.empty(len(columns["host_t"]), dtype=np.dtype(COLUMNS))
+        for name, _ in COLUMNS:
+            table[name] = columns[name]
+        if not complete:
+            return table
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = cache + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp, cache)
+        return np.load(cache, mmap_mode="r")
+
+    # ================= ASSAYS =================
+    def link_assay(self, record):
+        """
+        Save the counting result of an assay (see UI/assay_tab.py), linked
+        to its stirrer run by run_id.
+
+        Parameters:
+            - record (dict) : Values of the assays table columns
+        """
+        with self._connect() as db:
+            db.execute(f"INSERT INTO assays ({', '.join(record)}) "
+                       f"VALUES ({', '.join('?' * len(record))})", list(record.values()))
+
+    def assays(self, run_id=None):
+        """
+        Returns:
+            - assays (pandas.DataFrame) : One row per counted assay, oldest first
+        """
+        query, args = "SELECT * FROM assays", []
+        if run_id is not None:
+            query += " WHERE run_id = ?"
+            args.append(run_id)
+        with self._connect() as db:
+            assays = pd.read_sql_query(query + " ORDER BY started", db, params=args)
+        assays["started_at"] = pd.to_datetime(assays["started"], unit="s")
+        return assays
+
+    def _cache_path(self, run_id):
+        return os.path.join(self.cache_dir, run_id + ".npy")
+
+def index_run(path):
+    """Index a just-finished run file, in the archive of its runs directory."""
+    RunArchive(os.path.dirname(os.path.dirname(path))).index_run(path)
+
+# =========================
+# COMMAND LINE
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(description="GBM8970 – VWFlow run archive")
+
+    parser.add_argument("--dir", default=RUNS_DIR, help="Runs directory")
+    parser.add_argument("--scan", action="store_true",
+                        help="Index new or changed run files first")
+    parser.add_argument("--device", default=None, help="Stirrer ID")
+    parser.add_argument("--setpoint", type=float, default=None,
+                        help="Runs with a step at this RPM")
+    parser.add_argument("--since", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--min-duration", type=float, default=None,
+                        help="Minimum recorded duration, in seconds")
+    parser.add_argument("--assays", action="store_true",
+                        help="List the counted assays and their runs instead")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    archive = RunArchive(args.dir)
+    if args.scan:
+        print(f"Indexed {archive.scan()} run file(s).")
+
+    if args.assays:
+        assays = archive.assays()
+        if assays.empty:
+            print("No counted assay.")
+            return
+        columns = ["sample", "run_id", "device_id", "started_at", "setpoint_rpm",
+                   "runtime_s", "platelet_loss", "activity", "activity_std"]
+        print(assays[columns].to_string(index=False))
+        return
+
+    runs = archive.find(device_id=args.device, setpoint=args.setpoint, since=args.since,
+                        until=args.until, min_duration=args.min_duration)
+    if runs.empty:
+        print("No matching run.")
+        return
+    columns = ["run_id", "device_id", "started_at", "duration_s", "rows",
+               "rpm_mean", "rpm_std", "settling_s", "verdict", "complete"]
+    print(runs[columns].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
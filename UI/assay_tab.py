@@ -0,0 +1,470 @@
+import os
+import threading
+import time
+import tkinter as tk
+
+from tkinter import filedialog, messagebox, ttk
+
+from UI.archive import RunArchive
+from UI.calibration import load_calibration
+from UI.stirrer_tab import RPM_MAX, RPM_MIN
+from UI.telemetry import TimeLeft
+
+# =========================
+# CONFIG
+# =========================
+ASSAY_DIR = os.path.join(os.path.expanduser("~"), ".vwflow", "assays")
+IMAGE_EXTENSIONS = (".png", ".tif", ".tiff", ".jpg", ".jpeg", ".bmp")
+STAT_PREFIX = "stat"                        # non activated platelet images
+ACT_PREFIX = "act"                          # activated platelet images
+BACKGROUND_PREFIXES = ("background", "bkg")
+IMAGES_PER_SET = 3        # non activated and activated images needed per sample
+POLL_MS = 1000            # queue tick: starts runs, watches the image folders
+COUNT_POLL_MS = 100       # how often a background count is checked for its result
+RUN_END_GRACE_S = 5       # a run not reported ended this long after its time is ended anyway
+IMAGE_SETTLE_S = 2.0      # an image unchanged for this long is fully written
+
+# Assay states, in order
+QUEUED = "queued"
+RUNNING = "running"
+IMAGING = "waiting for images"
+COUNTING = "counting"
+DONE = "done"
+FAILED = "failed"
+
+# =========================
+# IMAGE FOLDER
+# Each sample has its own folder, the images are told apart by their
+# file name: stat*, act* and background* (or bkg*). A sample without a
+# background image uses the one selected in the counter tab.
+# =========================
+def find_images(image_dir, settle_s=IMAGE_SETTLE_S):
+    """
+    Images of a sample folder, skipping those still being written.
+
+    Returns:
+        - stat (list) : Non activated image paths, sorted
+        - act (list) : Activated image paths, sorted
+        - background (str | None) : Background image path
+    """
+    stat, act, backgrounds = [], [], []
+    try:
+        names = sorted(os.listdir(image_dir))
+    except OSError:
+        return [], [], None
+    now = time.time()
+    for name in names:
+        lower = name.lower()
+        if not lower.endswith(IMAGE_EXTENSIONS) or lower.startswith("debug_"):
+            continue
+        path = os.path.join(image_dir, name)
+        try:
+            if now - os.path.getmtime(path) < settle_s:
+                continue
+        except OSError:
+            continue
+        if lower.startswith(BACKGROUND_PREFIXES):
+            backgrounds.append(path)
+        elif lower.startswith(STAT_PREFIX):
+            stat.append(path)
+        elif lower.startswith(ACT_PREFIX):
+            act.append(path)
+    return stat, act, (backgrounds[0] if backgrounds else None)
+
+# =========================
+# ASSAY
+# One sample: a timed stirrer run, its images, then the count.
+# =========================
+class Assay:
+    def __init__(self, sample, rpm, runtime_s, image_dir):
+        self.sample = sample
+        self.rpm = rpm
+        self.runtime_s = runtime_s
+        self.image_dir = image_dir
+        self.state = QUEUED
+        self.detail = ""
+        self.ui = None            # StirrerUI running it
+        self.run_id = None
+        self.started = None       # epoch seconds
+        self.stopped = None
+        self.running_seen = False # a TIME_LEFT of this run was received
+        self.result = None        # CountResult
+        self.images = None        # (stat, act, background) paths it was counted on
+
+    def record(self, run_id):
+        """Row of the archive's assays table."""
+        r = self.result
+        return {
+            "sample": self.sample, "run_id": run_id, "device_id": self.ui.device_id,
+            "started": self.started, "stopped": self.stopped,
+            "setpoint_rpm": self.rpm, "runtime_s": self.runtime_s,
+            "image_dir": os.path.abspath(self.image_dir), "counted": time.time(),
+            "stat_count": r.stat_count, "stat_count_std": r.stat_count_std,
+            "act_count": r.act_count, "act_count_std": r.act_count_std,
+            "platelet_loss": r.platelet_loss, "platelet_loss_std": r.platelet_loss_std,
+            "activity": r.activity, "activity_std": r.activity_std,
+        }
+
+# =========================
+# ASSAY QUEUE
+# Runs the queued samples on the idle stirrers, oldest first; a run ends
+# with TIME_LEFT,0 (or STOPPED). Its sample folder is then watched, and
+# once the images are there they are counted with the counter tab's
+# settings and the result is saved in the run archive, linked to the
+# recorded run. The images the operator selected in the counter tab are
+# left alone.
+# The queue lives on the Tk loop: the stirrer tabs report the run events
+# through their run_listeners, the rest is polled every POLL_MS. Counts
+# run on a worker thread, one at a time, checked every COUNT_POLL_MS.
+# =========================
+class AssayQueue:
+    def __init__(self, root, stirrer_uis, counter_ui, archive=None, on_change=None):
+        """
+        Parameters:
+            - root (tk widget) : For the polling timer
+            - stirrer_uis (list) : StirrerUI of each stirrer tab, those with a link run assays
+            - counter_ui (CounterUI) : Counts the images
+            - archive (RunArchive | None) : Where results are saved, the default one if None
+            - on_change (callable | None) : Called after any assay changed state
+        """
+        self.root = root
+        self.devices = [ui for ui in stirrer_uis if ui.transport is not None]
+        self.counter_ui = counter_ui
+        self.archive = archive
+        self.on_change = on_change
+        self.assays = []
+        self._counting = None     # (assay, thread, outcome) of the count in progress
+        self._count_after_id = None
+        for ui in self.devices:
+            ui.run_listeners.append(lambda event, ui=ui: self._on_run_event(ui, event))
+        self._after_id = self.root.after(POLL_MS, self._tick)
+
+    def add(self, assay):
+        os.makedirs(assay.image_dir, exist_ok=True)
+        self.assays.append(assay)
+        self._dispatch()
+        self._changed()
+
+    def remove(self, assay):
+        """Only a queued or finished assay can be removed."""
+        if assay.state in (QUEUED, DONE, FAILED):
+            self.assays.remove(assay)
+            self._changed()
+
+    def retry(self, assay):
+        """Run a failed assay again, or just count it again if its run went through."""
+        if assay.state == FAILED:
+            assay.state = IMAGING if assay.stopped is not None else QUEUED
+            assay.detail = ""
+            self._dispatch()
+            self._changed()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def _running(self, ui):
+        for assay in self.assays:
+            if assay.ui is ui and assay.state == RUNNING:
+                return assay
+        return None
+
+    # ================= RUNS =================
+    def _dispatch(self):
+        """Start the oldest queued assays on the idle stirrers."""
+        idle = [ui for ui in self.devices if self._running(ui) is None]
+        for assay in self.assays:
+            if not idle:
+                return
+            if assay.state == QUEUED:
+                self._start(assay, idle.pop(0))
+
+    def _start(self, assay, ui):
+        assay.ui = ui
+        assay.state = RUNNING
+        assay.running_seen = False
+        assay.started = time.time()
+        assay.stopped = None
+        assay.run_id = ui.start_timed_run(assay.rpm, assay.runtime_s, assay=assay.sample)
+        assay.detail = f"{assay.runtime_s} s at {assay.rpm} RPM"
+        print(f"Assay {assay.sample}: started on {ui.device_id}")
+
+    def _on_run_event(self, ui, event):
+        assay = self._running(ui)
+        if assay is None:
+            return
+        if isinstance(event, TimeLeft):
+            if event.ms:
+                assay.running_seen = True
+                assay.detail = f"{event.ms / 1000:.0f} s left"
+                self._changed()
+                return
+            if event.ms is None or not assay.running_seen:
+                return  # INF, or the end of an earlier run
+        elif not assay.running_seen:
+            return
+        self._run_ended(assay)
+
+    def _run_ended(self, assay):
+        assay.stopped = time.time()
+        assay.state = IMAGING
+        assay.detail = f"images in {assay.image_dir}"
+        print(f"Assay {assay.sample}: run ended, waiting for images in {assay.image_dir}")
+        self._dispatch()
+        self._changed()
+
+    def _check_run_timeouts(self):
+        """A run whose end was not reported (lost link, no TIME_LEFT,0) ends on host time."""
+        now = time.time()
+        for assay in self.assays:
+            if assay.state == RUNNING and now - assay.started > assay.runtime_s + RUN_END_GRACE_S:
+                if assay.running_seen:
+                    self._run_ended(assay)
+                else:
+                    assay.state = FAILED
+                    assay.detail = "no telemetry from the stirrer"
+                    self._dispatch()
+                    self._changed()
+
+    # ================= COUNTING =================
+    def _next_to_count(self):
+        for assay in self.assays:
+            if assay.state != IMAGING:
+                continue
+            stat, act, background = find_images(assay.image_dir)
+            background = background or self.counter_ui.selected_background_path
+            if len(stat) >= IMAGES_PER_SET and len(act) >= IMAGES_PER_SET and background:
+                return assay, stat, act, background
+        return None
+
+    def _count(self, assay, stat, act, background):
+        """Count on a worker thread; the result is picked up by _poll_count."""
+        assay.state = COUNTING
+        assay.detail = f"counting {len(stat)} + {len(act)} images"
+        assay.images = (stat, act, background)
+        self._changed()
+        try:
+            min_val = float(self.counter_ui.min_val_var.get())  # Tk variable, read here
+        except (tk.TclError, ValueError):
+            min_val = 0.0
+        outcome = {}
+        thread = threading.Thread(target=self._count_worker, daemon=True, name="assay count",
+                                  args=(assay, stat, act, background, min_val, outcome))
+        self._counting = (assay, thread, outcome)
+        thread.start()
+        self._count_after_id = self.root.after(COUNT_POLL_MS, self._poll_count)
+
+    def _count_worker(self, assay, stat, act, background, min_val, outcome):
+        """Worker thread: count the images and save the result, no tkinter call."""
+        stages = self.counter_ui.stages
+        stages.start_job(f"assay {assay.sample}")
+        try:
+            outcome["result"], _, _ = self.counter_ui.count_images(
+                stat, act, background, min_val=min_val)
+        except Exception as e:
+            outcome["error"] = e
+            return
+        finally:
+            stages.end_job()
+
+        # Link the result to the run, recorded here or by the daemon
+        assay.result = outcome["result"]
+        try:
+            archive = self.archive or RunArchive()
+            run_id = assay.run_id or archive.run_at(assay.ui.device_id, assay.started)
+            archive.link_assay(assay.record(run_id))
+            outcome["run_id"] = run_id
+        except Exception as e:
+            print(f"Assay {assay.sample}: result not saved ({e})")
+
+    def _poll_count(self):
+        """Tk loop: apply the outcome of the background count once it is done."""
+        self._count_after_id = None
+        assay, thread, outcome = self._counting
+        if thread.is_alive():
+            self._count_after_id = self.root.after(COUNT_POLL_MS, self._poll_count)
+            return
+        self._counting = None
+        if "error" in outcome:
+            assay.state = FAILED
+            assay.detail = f"count failed: {outcome['error']}"
+            print(f"Assay {assay.sample}: {assay.detail}")
+        else:
+            assay.run_id = outcome.get("run_id", assay.run_id)
+            assay.state = DONE
+            assay.detail = f"activity ({assay.result.activity:.1f} ± {assay.result.activity_std:.1f}) %"
+            print(f"Assay {assay.sample}: {assay.detail}, run {assay.run_id}")
+        self._changed()
+
+    def _tick(self):
+        try:
+            self._check_run_timeouts()
+            if self._counting is None:
+                ready = self._next_to_count()
+                if ready is not None:
+                    self._count(*ready)
+        finally:
+            self._after_id = self.root.after(POLL_MS, self._tick)
+
+    def close(self):
+        for attr in ("_after_id", "_count_after_id"):
+            after_id = getattr(self, attr)
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+                setattr(self, attr, None)
+
+# =========================
+# UI
+# =========================
+class AssayUI:
+    COLUMNS = ("sample", "stirrer", "setpoint", "time", "state", "detail", "run")
+
+    def __init__(self, parent, stirrer_uis, counter_ui):
+        """
+        Parameters:
+            - parent (tk widget) : Frame holding the tab
+            - stirrer_uis (list) : StirrerUI of each stirrer tab
+            - counter_ui (CounterUI) : Counts the images
+        """
+        self.root = parent
+        self.counter_ui = counter_ui
+        self.calibration = stirrer_uis[0].calibration if stirrer_uis else load_calibration()
+
+        # Form variables
+        self.sample_var = tk.StringVar(value="")
+        self.setpoint_var = tk.DoubleVar(value=RPM_MIN)
+        self.mode_var = tk.StringVar(value="RPM")
+        self.runtime_var = tk.IntVar(value=60)
+        self.folder_var = tk.StringVar(value="")
+        self.status_text = tk.StringVar(value="")
+
+        self._build_ui()
+        self.queue = AssayQueue(parent, stirrer_uis, counter_ui, on_change=self.refresh)
+        n = len(self.queue.devices)
+        self.status_text.set(f"{n} stirrer(s) available" if n
+                             else "No stirrer linked, assays stay queued")
+
+    # ================= UI =================
+    def _build_ui(self):
+        # Initialize left side bar
+        left = tk.Frame(self.root)
+        left.pack(side=tk.LEFT, padx=10, pady=10, anchor="n")
+
+        tk.Label(left, text="New sample", font=("Helvetica", 16)).pack(pady=5)
+        tk.Label(left, text="Sample name").pack(anchor="w")
+        tk.Entry(left, textvariable=self.sample_var, width=24).pack(pady=2)
+
+        tk.Label(left, text="Setpoint").pack(anchor="w", pady=(8, 0))
+        tk.Entry(left, textvariable=self.setpoint_var, width=10, justify="center").pack(pady=2)
+        tk.Radiobutton(left, text="Rotation speed (RPM)",
+                       variable=self.mode_var, value="RPM").pack(anchor="w")
+        tk.Radiobutton(left, text="Mean shear rate (s⁻¹)",
+                       variable=self.mode_var, value="SHEAR").pack(anchor="w")
+
+        tk.Label(left, text="Run time (seconds)").pack(anchor="w", pady=(8, 0))
+        tk.Entry(left, textvariable=self.runtime_var, width=10, justify="center").pack(pady=2)
+
+        tk.Label(left, text="Image folder (empty: default)").pack(anchor="w", pady=(8, 0))
+        tk.Entry(left, textvariable=self.folder_var, width=24).pack(pady=2)
+        tk.Button(left, text="Browse...", width=12, command=self.browse_folder).pack(pady=2)
+
+        tk.Button(left, text="Add to queue", width=12, command=self.add_sample).pack(pady=(10, 2))
+        tk.Button(left, text="Remove", width=12, command=self.remove_selected).pack(pady=2)
+        tk.Button(left, text="Retry", width=12, command=self.retry_selected).pack(pady=2)
+        tk.Button(left, text="Show in Counter", width=12, command=self.show_selected).pack(pady=2)
+
+        tk.Label(left, textvariable=self.status_text, font=("Helvetica", 10),
+                 wraplength=200, justify=tk.LEFT).pack(pady=(10, 2), anchor="w")
+        tk.Label(left, text=f"Name the images {STAT_PREFIX}*, {ACT_PREFIX}* and "
+                            f"{BACKGROUND_PREFIXES[0]}*; {IMAGES_PER_SET} of each "
+                            "set are needed.",
+                 font=("Helvetica", 9), wraplength=200, justify=tk.LEFT).pack(anchor="w")
+
+        # Queue table
+        self.table = ttk.Treeview(self.root, columns=self.COLUMNS, show="headings")
+        widths = (120, 120, 90, 60, 120, 260, 200)
+        for column, width in zip(self.COLUMNS, widths):
+            self.table.heading(column, text=column.capitalize())
+            self.table.column(column, width=width, anchor="w")
+        self.table.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def browse_folder(self):
+        path = filedialog.askdirectory(title="Select the sample's image folder")
+        if path:
+            self.folder_var.set(path)
+
+    def add_sample(self):
+        sample = self.sample_var.get().strip()
+        try:
+            setpoint = float(self.setpoint_var.get())
+            runtime_s = int(self.runtime_var.get())
+        except (tk.TclError, ValueError):
+            self.status_text.set("Setpoint and run time must be numbers")
+            return
+        if not sample or runtime_s <= 0:
+            self.status_text.set("A sample needs a name and a run time above 0")
+            return
+
+        rpm = setpoint if self.mode_var.get() == "RPM" else self.calibration.shear_to_rpm(setpoint)
+        rpm = int(max(RPM_MIN, min(RPM_MAX, rpm)))
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in sample)
+        folder = self.folder_var.get().strip() or os.path.join(
+            ASSAY_DIR, time.strftime("%Y%m%d"), safe_name)
+        self.queue.add(Assay(sample, rpm, runtime_s, folder))
+        self.sample_var.set("")
+        self.folder_var.set("")
+        self.status_text.set(f"{sample} queued, images in {folder}")
+
+    def _selected(self):
+        by_iid = {str(id(assay)): assay for assay in self.queue.assays}
+        return [by_iid[iid] for iid in self.table.selection() if iid in by_iid]
+
+    def remove_selected(self):
+        for assay in self._selected():
+            self.queue.remove(assay)
+
+    def retry_selected(self):
+        for assay in self._selected():
+            self.queue.retry(assay)
+
+    def show_selected(self):
+        """Load the images of the selected counted assay into the counter tab."""
+        counted = [assay for assay in self._selected() if assay.images and assay.state == DONE]
+        if not counted:
+            self.status_text.set("Select a counted assay to show it in the Counter tab")
+            return
+        assay = counted[0]
+        counter = self.counter_ui
+        if (counter.selected_stat_image_paths or counter.selected_act_image_paths) and \
+                not messagebox.askyesno(
+                    "Show in Counter",
+                    f"Replace the images selected in the Counter tab with those of {assay.sample}?"):
+            return
+        counter.set_images(*assay.images)
+        counter.run_count_platelets()
+        self.status_text.set(f"{assay.sample} shown in the Counter tab")
+
+    def refresh(self):
+        """Update the queue table in place, so the selection is kept."""
+        rows = {}
+        for assay in self.queue.assays:
+            rows[str(id(assay))] = (
+                assay.sample,
+                assay.ui.device_id if assay.ui else "",
+                f"{assay.rpm} RPM",
+                f"{assay.runtime_s} s",
+                assay.state,
+                assay.detail,
+                assay.run_id or "",
+            )
+        for iid in self.table.get_children():
+            if iid not in rows:
+                self.table.delete(iid)
+        for iid, values in rows.items():
+            if self.table.exists(iid):
+                self.table.item(iid, values=values)
+            else:
+                self.table.insert("", tk.END, iid=iid, values=values)
+
+    def on_close(self):
+        self.queue.close()
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+import platform
+import time
+import tkinter as tk
+
+from collections import deque
+from tkinter import ttk
+
+import numpy as np
+
+from UI.emulator import SERIAL_SKETCH, StirrerEmulator
+from UI.stirrer_tab import PLOT_REFRESH_MS, StirrerUI
+from UI.telemetry import ChunkParser, Sample
+from UI.transport import Transport, stop_transport_loop
+
+# =========================
+# CONFIG
+# =========================
+CHUNK_MS = 5             # synthetic telemetry is delivered in reads of this length
+RECORDED_CHUNK_BYTES = 256
+SETTLE_S = 0.5           # time given to the UI to catch up after the replay
+
+# =========================
+# ARGUMENT PARSING
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GBM8970 – VWFlow stirrer UI ingestion/plotting benchmark")
+
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="Telemetry rate in Hz at speed 1")
+    parser.add_argument("--speeds", default="1,2,5,10",
+                        help="Comma-separated replay speed multipliers")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="Replay length of each run, in seconds of wall time")
+    parser.add_argument("--input", default=None,
+                        help="Raw telemetry capture (bytes as read from the port) "
+                             "to replay instead of synthetic telemetry")
+    parser.add_argument("--report", default="benchmark_report.json",
+                        help="Where to write the JSON report")
+    parser.add_argument("--compare", default=None,
+                        help="Previous report to compare against")
+
+    return parser.parse_args()
+
+# =========================
+# TELEMETRY SOURCES
+# A source is a list of (t_s, bytes) chunks at speed 1.
+# =========================
+def synthetic_chunks(rate_hz, duration_s):
+    """Binary telemetry from the emulated serial stirrer, cut into USB-sized reads."""
+    emulator = StirrerEmulator(SERIAL_SKETCH, telemetry_hz=rate_hz)
+    for cmd in ("STREAM ON", "BIN ON", "S 4000", "START"):
+        emulator.handle_command(cmd)
+
+    chunks = []
+    for t_ms in np.arange(CHUNK_MS, duration_s * 1000 + CHUNK_MS, CHUNK_MS):
+        emulator.run_until(float(t_ms))
+        data = emulator.read()
+        if data:
+            chunks.append((t_ms / 1000, data))
+    return chunks
+
+def recorded_chunks(path, rate_hz):
+    """
+    A raw capture, paced so its samples arrive at rate_hz on average
+    (captures carry no arrival times).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    n_samples = sum(isinstance(e, Sample) for e in ChunkParser().feed(data, 0.0))
+    duration = max(n_samples, 1) / rate_hz
+    return [(duration * (i + RECORDED_CHUNK_BYTES) / len(data),
+             data[i:i + RECORDED_CHUNK_BYTES])
+            for i in range(0, len(data), RECORDED_CHUNK_BYTES)]
+
+def count_samples(chunks):
+    parser = ChunkParser()
+    return sum(isinstance(e, Sample) for _, data in chunks
+               for e in parser.feed(data, 0.0))
+
+# =========================
+# REPLAY TRANSPORT
+# Delivers the chunks on the shared transport loop, like a serial port
+# would, and timestamps each delivery.
+# =========================
+class ReplayTransport(Transport):
+    name = "Replay"
+    reconnect = False
+
+    def __init__(self, chunks, speed):
+        super().__init__("replay")
+        self.chunks = chunks
+        self.speed = speed
+        self.arrivals = deque()   # perf_counter of each delivered chunk
+        self.max_lag_ms = 0.0     # how far the loop fell behind the schedule
+        self.done = False
+
+    async def _open(self):
+        pass
+
+    async def _receive(self):
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        for t, data in self.chunks:
+            delay = t0 + t / self.speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_lag_ms = max(self.max_lag_ms, -1000 * delay)
+            t_arrival = time.perf_counter()
+            self._deliver(data)
+            self.arrivals.append(t_arrival)  # after on_data: queued once listed
+        self.done = True
+        await asyncio.Event().wait()  # keep the link "up" until closed
+
+    async def _write(self, data):
+        pass
+
+# =========================
+# ONE RUN
+# =========================
+def _stats(values):
+    if not len(values):
+        return {"p50": None, "p95": None, "max": None}
+    values = np.asarray(values)
+    return {"p50": float(np.percentile(values, 50)),
+            "p95": float(np.percentile(values, 95)),
+            "max": float(values.max())}
+
+def run_once(chunks, speed, n_samples):
+    """
+    Replay the chunks into a real StirrerUI (shown, so it draws) and
+    measure it.
+
+    Returns:
+        - result (dict) : Metrics of the run
+    """
+    root = tk.Tk()
+    root.title(f"VWFlow benchmark – speed ×{speed:g}")
+    root.geometry("1200x800")
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill="both", expand=True)
+    frame = ttk.Frame(notebook)
+    notebook.add(frame, text="Stirrer")
+
+    transport = ReplayTransport(chunks, speed)
+    ui = StirrerUI(frame, transport, record=False)
+
+    latencies, frame_times, intervals, depths = [], [], [], []
+    last_tick = [None]
+    update_plot = ui.update_plot
+    render = ui.renderer.render
+
+    def measured_update_plot():
+        """One scheduler tick: queue depth, frame time, byte-to-pixel latency."""
+        t_start = time.perf_counter()
+        if last_tick[0] is not None:
+            intervals.append(1000 * (t_start - last_tick[0]))
+        last_tick[0] = t_start
+        depths.append(len(ui.telemetry))
+
+        # Every chunk delivered before the drain is on screen after this frame
+        drained = len(transport.arrivals)
+        drawn = [False]
+
+        def measured_render():
+            drawn[0] = render()
+            return drawn[0]
+
+        ui.renderer.render = measured_render
+        update_plot()
+        ui.renderer.render = render
+        if drawn[0]:
+            ui.canvas.get_tk_widget().update_idletasks()
+        t_end = time.perf_counter()
+        frame_times.append(1000 * (t_end - t_start))
+        for _ in range(drained):
+            t_arrival = transport.arrivals.popleft()
+            if drawn[0]:
+                latencies.append(1000 * (t_end - t_arrival))
+
+    ui.update_plot = measured_update_plot
+
+    # Replay, then give the UI time to catch up
+    wall_t0, cpu_t0 = time.perf_counter(), time.process_time()
+    replay_s = chunks[-1][0] / speed if chunks else 0
+    settle_deadline = [None]
+
+    def poll():
+        if transport.done and settle_deadline[0] is None:
+            settle_deadline[0] = time.perf_counter() + SETTLE_S
+        if settle_deadline[0] is not None and time.perf_counter() >= settle_deadline[0]:
+            root.quit()
+            return
+        root.after(50, poll)
+
+    root.after(50, poll)
+    root.mainloop()
+    wall = time.perf_counter() - wall_t0
+    cpu = time.process_time() - cpu_t0
+
+    ui.on_close()
+    root.destroy()
+
+    plotted = ui.history.count
+    parser = ui.parser.stats()
+    return {
+        "speed": speed,
+        "sample_rate_hz": n_samples / replay_s if replay_s else None,
+        "samples_sent": n_samples,
+        "samples_plotted": plotted,
+        "dropped_samples": n_samples - plotted,
+        "parse_errors": parser["parse_errors"],
+        "lost_frames": parser["lost_frames"],
+        "latency_ms": _stats(latencies),
+        "frame_ms": _stats(frame_times),
+        "tick_interval_ms": _stats(intervals),
+        "queue_depth": {"mean": float(np.mean(depths)) if depths else None,
+                        "max": int(max(depths)) if depths else None},
+        "replay_lag_ms": transport.max_lag_ms,
+        "cpu_percent": 100 * cpu / wall if wall else None,
+    }
+
+# =========================
+# REPORT
+# =========================
+def print_report(report, previous=None):
+    """One line per speed; with a previous report, the change of each metric."""
+    rows = [("speed", lambda r: f"×{r['speed']:g}"),
+            ("rate Hz", lambda r: f"{r['sample_rate_hz']:.0f}"),
+            ("dropped", lambda r: f"{r['dropped_samples']}"),
+            ("lat p50", lambda r: _fmt(r["latency_ms"]["p50"])),
+            ("lat p95", lambda r: _fmt(r["latency_ms"]["p95"])),
+            ("frame p95", lambda r: _fmt(r["frame_ms"]["p95"])),
+            ("tick p95", lambda r: _fmt(r["tick_interval_ms"]["p95"])),
+            ("queue max", lambda r: f"{r['queue_depth']['max']}"),
+            ("lag ms", lambda r: _fmt(r["replay_lag_ms"])),
+            ("CPU %", lambda r: _fmt(r["cpu_percent"]))]
+    print("  ".join(f"{name:>9}" for name, _ in rows))
+    old = {r["speed"]: r for r in previous["runs"]} if previous else {}
+    for run in report["runs"]:
+        print("  ".join(f"{fmt(run):>9}" for _, fmt in rows))
+        if run["speed"] in old:
+            print("  ".join(f"{fmt(old[run['speed']]):>9}" for _, fmt in rows), "(previous)")
+
+def _fmt(value):
+    return "---" if value is None else f"{value:.1f}"
+
+# =========================
+# MAIN
+# =========================
+def main():
+    args = parse_args()
+    speeds = [float(s) for s in args.speeds.split(",")]
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "processor": platform.processor()},
+        "config": {"rate_hz": args.rate, "duration_s": args.duration, "input": args.input,
+                   "plot_refresh_ms": PLOT_REFRESH_MS},
+        "runs": [],
+    }
+
+    for speed in speeds:
+        # Same wall duration at every speed: the source covers duration × speed
+        if args.input:
+            chunks = recorded_chunks(args.input, args.rate)
+        else:
+            chunks = synthetic_chunks(args.rate, args.duration * speed)
+        n_samples = count_samples(chunks)
+        print(f"Speed ×{speed:g}: replaying {n_samples} samples...")
+        report["runs"].append(run_once(chunks, speed, n_samples))
+
+    stop_transport_loop()
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.report}\n")
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+
+if __name__ == "__main__":
+    main()
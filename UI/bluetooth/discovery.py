@@ -0,0 +1,70 @@
+import asyncio
+
+from bleak import BleakScanner
+
+from UI.device_cache import load_cached_device, save_cached_device
+
+# =========================
+# BLE CONFIG (must match Arduino sketch)
+# =========================
+DEVICE_BLE_NAME = "Arduino"
+
+# Stirrer service (advertised) and characteristics
+STIRRER_SERVICE_UUID = "12345678-1234-1234-1234-123456789abc"
+STIRRER_RX_UUID = "12345678-1234-1234-1234-123456789abd"
+STIRRER_TX_UUID = "12345678-1234-1234-1234-123456789abe"
+
+SCAN_TIMEOUT_S = 5.0
+SCAN_GRACE_S = 1.0     # without expected stirrers: keep scanning this long after the first one
+
+# =========================
+# DISCOVERY
+# The BLE address is the stirrer's stable ID.
+# =========================
+def is_stirrer(device, adv):
+    return STIRRER_SERVICE_UUID in (adv.service_uuids or [])
+
+async def scan_for_stirrers(timeout=SCAN_TIMEOUT_S, expected=(), grace_s=SCAN_GRACE_S):
+    """
+    Scan for advertising stirrers. The scan stops as soon as all the
+    expected addresses were seen or, with none expected, grace_s after the
+    first stirrer; grace_s=None scans for the full timeout.
+
+    Parameters:
+        - timeout (float) : Longest scan, in seconds
+        - expected (list) : Addresses of the stirrers seen last time
+        - grace_s (float | None) : See above
+
+    Returns:
+        - addresses (list) : Expected stirrers first (in their order), then new ones
+    """
+    loop = asyncio.get_running_loop()
+    found = []
+    done = asyncio.Event()
+
+    def on_detect(device, adv):
+        if is_stirrer(device, adv) and device.address not in found:
+            found.append(device.address)
+            if expected:
+                if set(expected) <= set(found):
+                    done.set()
+            elif grace_s is not None and len(found) == 1:
+                loop.call_later(grace_s, done.set)
+
+    async with BleakScanner(detection_callback=on_detect):
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    known = [a for a in expected if a in found]
+    return known + sorted(a for a in found if a not in known)
+
+def cached_addresses():
+    info = load_cached_device("ble") or {}
+    if "addresses" in info:
+        return list(info["addresses"])
+    return [info["address"]] if info.get("address") else []  # single-device cache format
+
+def remember_addresses(addresses):
+    save_cached_device("ble", {"addresses": list(addresses)})
@@ -0,0 +1,67 @@
+import asyncio
+
+from UI.emulator import BLE_PACKET_BYTES, BLE_SKETCH, StirrerEmulator
+
+# =========================
+# CONFIG
+# =========================
+PUMP_PERIOD_S = 0.005    # how often the emulated peripheral runs and notifies
+DEFAULT_MTU = 247        # what recent adapters negotiate with the Nano 33 BLE
+
+# =========================
+# EMULATED BLE PERIPHERAL
+# Stand-in for BleakClient (the subset BLETransport uses) talking to a
+# StirrerEmulator running the BLE sketch. Each address keeps its device,
+# and its clock, across reconnections like real hardware.
+# =========================
+class EmulatedBleakClient:
+    devices = {}   # address -> (StirrerEmulator, loop time of power-on)
+
+    def __init__(self, address, disconnected_callback=None, telemetry_hz=None,
+                 mtu_size=DEFAULT_MTU):
+        """
+        Parameters:
+            - address (str) : Any string, one emulated stirrer per address
+            - disconnected_callback (callable) : As for BleakClient
+            - telemetry_hz (float | None) : See StirrerEmulator, used when the device is created
+            - mtu_size (int) : Negotiated ATT MTU, as BleakClient.mtu_size
+        """
+        self.address = address
+        self.mtu_size = mtu_size
+        self.disconnected_callback = disconnected_callback
+        self.telemetry_hz = telemetry_hz
+        self.is_connected = False
+        self.emulator = None
+        self._callback = None
+        self._pump = None
+
+    async def connect(self):
+        if self.address not in self.devices:
+            emulator = StirrerEmulator(BLE_SKETCH, packet_bytes=BLE_PACKET_BYTES,
+                                       telemetry_hz=self.telemetry_hz)
+            self.devices[self.address] = (emulator, asyncio.get_running_loop().time())
+        self.emulator, self._t0 = self.devices[self.address]
+        self.emulator.central_connected()
+        self.is_connected = True
+
+    async def start_notify(self, uuid, callback):
+        self._callback = callback
+        self._pump = asyncio.ensure_future(self._run())
+
+    async def write_gatt_char(self, uuid, data, response=False):
+        if not self.is_connected:
+            raise RuntimeError("not connected")
+        self.emulator.write(bytes(data))
+
+    async def disconnect(self):
+        self.is_connected = False
+        if self._pump is not None:
+            self._pump.cancel()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self.is_connected:
+            self.emulator.run_until((loop.time() - self._t0) * 1000)
+            for notification in self.emulator.read_notifications():
+                self._callback(None, bytearray(notification))
+            await asyncio.sleep(PUMP_PERIOD_S)
@@ -2,11 +2,23 @@ import asyncio
 import argparse
 import tkinter as tk
 
+from bleak import BleakClient
+from functools import partial
 from tkinter import ttk
-from bleak import BleakScanner
 
-from UI.bluetooth.stirrer_tab import StirrerUI
+from UI import trace
+from UI.assay_tab import AssayUI
+from UI.bluetooth.discovery import (
+    DEVICE_BLE_NAME, SCAN_GRACE_S, STIRRER_RX_UUID, STIRRER_TX_UUID,
+    cached_addresses, remember_addresses, scan_for_stirrers,
+)
+from UI.bluetooth.emulator import EmulatedBleakClient
+from UI.bluetooth.transport import BLETransport
 from UI.counter_tab import CounterUI
+from UI.perf_hud import PerfHUD
+from UI.recorder import flush_recordings
+from UI.stirrer_tab import add_stirrer_tabs
+from UI.transport import stop_transport_loop
 
 # =========================
 # ARGUMENT PARSING
@@ -17,43 +29,69 @@ def parse_args():
     parser.add_argument(
         "--simulate-device",
         action="store_true",
-        help="Run the device in simulation mode"
+        help="Run emulated stirrers (fake BLE peripherals) instead of the hardware"
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--simulate-count",
+        type=int,
+        default=1,
+        help="Number of emulated stirrers"
+    )
 
-# =========================
-# BLE CONFIG (must match Arduino sketch)
-# =========================
-DEVICE_BLE_NAME = "Arduino"
+    parser.add_argument(
+        "--simulate-rate",
+        type=float,
+        default=None,
+        help="Emulated telemetry rate in Hz (up to kHz), overriding the UI's RATE"
+    )
 
-# Stirrer characteristics
-STIRRER_RX_UUID = "12345678-1234-1234-1234-123456789abd"
-STIRRER_TX_UUID = "12345678-1234-1234-1234-123456789abe"
+    parser.add_argument(
+        "--scan",
+        action="store_true",
+        help="Scan for the full timeout, to pick up stirrers not seen last time"
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=None,
+        help="Record a timing trace, written to FILE (Chrome trace JSON) on exit"
+    )
+
+    return parser.parse_args()
 
 # =========================
 # FIND BLE DEVICE
 # =========================
-def find_ble_device(simulation=False):
-    print(f"Scanning BLE for '{DEVICE_BLE_NAME}'...")
-
-    # Skip BLE discovery if simulation mode is enabled
-    if simulation:
-        print("Simulation mode enabled – skipping BLE device scan.\nLaunching UI...")
-        return None
-
-    async def scan():
-        devices = await BleakScanner.discover(timeout=5.0)
-        for d in devices:
-            if d.name == DEVICE_BLE_NAME:
-                print(f"  Found: {d.address}.\nLaunching UI...")
-                return d.address
-        return None
-
+def find_ble_devices(full_scan=False):
+    """
+    The stirrers seen last time are connected to directly, without a scan
+    (a tab keeps retrying one that is off). Otherwise the scan stops shortly
+    after the first stirrer; full_scan waits the whole timeout to pick up
+    every stirrer around.
+
+    Returns:
+        - addresses (list) : Every stirrer found, those seen last time first
+    """
+    cached = cached_addresses()
+    if cached and not full_scan:
+        print(f"Using last known stirrer(s) {', '.join(cached)} (--scan to look for others).")
+        print("Launching UI...")
+        return cached
+
+    print("Scanning BLE for the stirrer service...")
     loop = asyncio.new_event_loop()
-    address = loop.run_until_complete(scan())
+    grace_s = None if full_scan else SCAN_GRACE_S
+    found = loop.run_until_complete(scan_for_stirrers(grace_s=grace_s))
     loop.close()
-    return address
+    addresses = [a for a in cached if a in found] + [a for a in found if a not in cached]
+    for address in addresses:
+        print(f"  Found: {address}")
+    if addresses:
+        remember_addresses(addresses)
+        print("Launching UI...")
+    return addresses
 
 # =========================
 # MAIN
@@ -62,22 +100,25 @@ def main():
 
     # Parse command-line arguments
     args = parse_args()
-
-    # Set global simulation flag
-    global SIMULATION
-    SIMULATION = args.simulate_device
-
-    # Set BLE connection
-    ble_address = find_ble_device(SIMULATION)
-    if SIMULATION:
-        # Use a dummy address so downstream BLE code that expects a string does not crash
-        ble_address = "00:00:00:00:00:00"
+    if args.trace:
+        trace.enable()
+
+    # Set BLE connections
+    client_class = BleakClient
+    if args.simulate_device:
+        print(f"Emulating {args.simulate_count} stirrer(s).\nLaunching UI...")
+        addresses = [f"EMULATOR-{i + 1}" for i in range(args.simulate_count)]
+        client_class = partial(EmulatedBleakClient, telemetry_hz=args.simulate_rate)
     else:
-        if ble_address is None:
-            raise RuntimeError(
-                f"Could not find BLE device named '{DEVICE_BLE_NAME}'. "
-                "Make sure the Arduino is powered on and nearby."
-            )
+        addresses = find_ble_devices(args.scan)
+    if not addresses:
+        raise RuntimeError(
+            f"Could not find BLE device named '{DEVICE_BLE_NAME}' (stirrer service). "
+            "Make sure the Arduino is powered on and nearby."
+        )
+    devices = [(address, BLETransport(address, STIRRER_RX_UUID, STIRRER_TX_UUID,
+                                      client_class=client_class))
+               for address in addresses]
 
     # Initialize UI
     root = tk.Tk()
@@ -88,26 +129,32 @@ def main():
     notebook = ttk.Notebook(root)
     notebook.pack(fill="both", expand=True)
 
-    # Create stirrer tab
-    stirrer_frame = ttk.Frame(notebook)
-    notebook.add(stirrer_frame, text="Stirrer")
-    stirrer_ui = StirrerUI(
-        stirrer_frame,
-        ble_address=ble_address,
-        rx_uuid=STIRRER_RX_UUID,
-        tx_uuid=STIRRER_TX_UUID,
-        simulation_mode=SIMULATION,
-    )
+    # Create one tab per stirrer
+    stirrer_uis = add_stirrer_tabs(notebook, devices)
 
     # Create counter tab
     counter_frame = ttk.Frame(notebook)
     notebook.add(counter_frame, text="Counter")
     counter_ui = CounterUI(counter_frame)
 
+    # Create assay queue tab: timed runs on the stirrers, then the count
+    assay_frame = ttk.Frame(notebook)
+    notebook.add(assay_frame, text="Assays")
+    assay_ui = AssayUI(assay_frame, stirrer_uis, counter_ui)
+
+    # Performance overlay, toggled with F3
+    PerfHUD(root, stirrer_uis, counter_ui)
+
     # Handle window close event
     def on_close():
-        stirrer_ui.on_close()
+        for stirrer_ui in stirrer_uis:
+            stirrer_ui.on_close()
         counter_ui.on_close()
+        assay_ui.on_close()
+        stop_transport_loop()
+        flush_recordings()
+        if args.trace:
+            trace.export(args.trace)
         root.destroy()
         print("\nApplication closed with success.")
     root.protocol("WM_DELETE_WINDOW", on_close)
@@ -0,0 +1,74 @@
+import asyncio
+
+from bleak import BleakClient
+
+from UI.bluetooth.discovery import STIRRER_RX_UUID, STIRRER_TX_UUID
+from UI.protocol import FAST_TELEMETRY_MS
+from UI.transport import Transport
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_MTU = 23    # ATT MTU before any exchange: 20-byte notifications
+
+# =========================
+# BLE TRANSPORT
+# bleak is natively asyncio: notifications arrive on the shared loop and
+# writes are awaited there. The link is re-established with backoff when
+# it drops, always to the same address: with several stirrers around,
+# falling back to "any stirrer" could take over another tab's device.
+# =========================
+class BLETransport(Transport):
+    name = "BLE"
+
+    def __init__(self, address, rx_uuid=STIRRER_RX_UUID, tx_uuid=STIRRER_TX_UUID,
+                 client_class=BleakClient, **kwargs):
+        super().__init__(address, **kwargs)
+        self.rx_uuid = rx_uuid
+        self.tx_uuid = tx_uuid
+        self.client_class = client_class  # BleakClient, or an emulated peripheral
+        self._client: BleakClient = None
+        self._link_lost = None
+
+    def link_commands(self):
+        """
+        (Packed binary) streaming is enabled again on every connection,
+        after telling the sketch the MTU so its notifications fit.
+        """
+        mtu = getattr(self._client, "mtu_size", DEFAULT_MTU)
+        return [f"MTU {mtu}\n", "STREAM ON\n", "BIN ON\n", f"RATE {FAST_TELEMETRY_MS}\n"]
+
+    async def _open(self):
+        self._link_lost = asyncio.Event()
+        self._client = self.client_class(self.address, disconnected_callback=self._on_disconnect)
+        await self._client.connect()
+        print(f"BLE connected to {self.address}")
+
+        # Subscribe to TX notifications (Arduino → Python). A notification
+        # may hold several packed frames or part of a line; reassembly is
+        # left to the receiver's ChunkParser.
+        await self._client.start_notify(self.tx_uuid, self._on_notify)
+
+    def _on_disconnect(self, client):
+        self._link_lost.set()
+
+    def _on_notify(self, sender, data: bytearray):
+        self._deliver(data)
+
+    async def _receive(self):
+        await self._link_lost.wait()
+
+    async def _write(self, data):
+        # Commands longer than one ATT packet (PROFILE) need a long write,
+        # which only exists with response
+        mtu = getattr(self._client, "mtu_size", DEFAULT_MTU)
+        await self._client.write_gatt_char(self.rx_uuid, data, response=len(data) > mtu - 3)
+
+    async def _close(self):
+        """
+        Fully disconnect so the Arduino releases its BLE slot and another
+        computer can connect immediately after.
+        """
+        if self._client is not None and self._client.is_connected:
+            await self._client.disconnect()
+            print("BLE disconnected cleanly.")
@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+
+# =========================
+# CONFIG
+# =========================
+DEFAULT_CALIBRATION = os.path.join(os.path.dirname(__file__), "calibration.json")
+USER_CALIBRATION = os.path.join(os.path.expanduser("~"), ".vwflow", "calibration.json")
+FORMAT = 1                  # calibration file format understood here
+METHODS = ("linear", "pchip")
+INVERSE_POINTS = 4096       # table used to invert a spline
+
+# =========================
+# RPM <-> SHEAR CALIBRATION
+# Loaded from a versioned JSON file of (RPM, shear) points. Conversions
+# take scalars or whole arrays. "linear" is piecewise linear, "pchip" a
+# monotone cubic spline; both extend the end segments beyond the points,
+# and both are monotone, so the inverse is well defined.
+# =========================
+class Calibration:
+    def __init__(self, points, method="linear", version=None, rpm_range=None):
+        """
+        Parameters:
+            - points (list) : (RPM, shear) pairs, RPM and shear strictly increasing
+            - method (str) : "linear" or "pchip"
+            - version (str | None) : Identifies the calibration in run records
+            - rpm_range (tuple | None) : Speeds the calibration is valid for,
+              the span of the points if None
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2:
+            raise ValueError("calibration needs at least two (RPM, shear) points")
+        if np.any(np.diff(points[:, 0]) <= 0) or np.any(np.diff(points[:, 1]) <= 0):
+            raise ValueError("calibration points must be strictly increasing")
+        if method not in METHODS:
+            raise ValueError(f"unknown calibration method {method!r}")
+
+        self.rpm, self.shear = points[:, 0], points[:, 1]
+        self.method = method
+        self.version = version
+        self.rpm_range = tuple(rpm_range) if rpm_range else (self.rpm[0], self.rpm[-1])
+
+        # End slopes, for extrapolation
+        self._slope_lo = (self.shear[1] - self.shear[0]) / (self.rpm[1] - self.rpm[0])
+        self._slope_hi = (self.shear[-1] - self.shear[-2]) / (self.rpm[-1] - self.rpm[-2])
+
+        if method == "pchip":
+            from scipy.interpolate import PchipInterpolator
+            self._spline = PchipInterpolator(self.rpm, self.shear, extrapolate=False)
+            # Dense monotone table, inverted by linear interpolation
+            self._grid_rpm = np.linspace(self.rpm[0], self.rpm[-1], INVERSE_POINTS)
+            self._grid_shear = self._spline(self._grid_rpm)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("format") != FORMAT:
+            raise ValueError(f"{path}: unsupported calibration format {data.get('format')}")
+        return cls(data["points"], data.get("method", "linear"),
+                   data.get("version"), data.get("rpm_range"))
+
+    def _extend(self, x, y, xs, ys, lo_slope, hi_slope):
+        below, above = x < xs[0], x > xs[-1]
+        y = np.where(below, ys[0] + (x - xs[0]) * lo_slope, y)
+        return np.where(above, ys[-1] + (x - xs[-1]) * hi_slope, y)
+
+    def rpm_to_shear(self, rpm):
+        """
+        Parameters:
+            - rpm (float | array) : Rotation speed(s)
+
+        Returns:
+            - shear (float | ndarray) : Mean shear rate(s) in s⁻¹, same shape
+        """
+        x = np.asarray(rpm, dtype=float)
+        if self.method == "pchip":
+            y = self._spline(np.clip(x, self.rpm[0], self.rpm[-1]))
+        else:
+            y = np.interp(x, self.rpm, self.shear)
+        y = self._extend(x, y, self.rpm, self.shear, self._slope_lo, self._slope_hi)
+        return y if y.ndim else float(y)
+
+    def shear_to_rpm(self, shear):
+        """
+        Parameters:
+            - shear (float | array) : Mean shear rate(s) in s⁻¹
+
+        Returns:
+            - rpm (float | ndarray) : Rotation speed(s), same shape
+        """
+        x = np.asarray(shear, dtype=float)
+        if self.method == "pchip":
+            y = np.interp(x, self._grid_shear, self._grid_rpm)
+        else:
+            y = np.interp(x, self.shear, self.rpm)
+        y = self._extend(x, y, self.shear, self.rpm, 1 / self._slope_lo, 1 / self._slope_hi)
+        return y if y.ndim else float(y)
+
+def load_calibration(path=None):
+    """
+    Parameters:
+        - path (str | None) : Calibration file. If None, the user's
+          ~/.vwflow/calibration.json when it exists, else the one shipped
+          with the UI
+
+    Returns:
+        - calibration (Calibration)
+    """
+    if path is None:
+        path = USER_CALIBRATION if os.path.exists(USER_CALIBRATION) else DEFAULT_CALIBRATION
+    calibration = Calibration.load(path)
+    print(f"Calibration {calibration.version} ({calibration.method}) loaded from {path}")
+    return calibration
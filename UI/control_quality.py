@@ -0,0 +1,201 @@
+import math
+
+import numpy as np
+
+from UI.telemetry import Sample
+
+# =========================
+# CONFIG
+# =========================
+SETPOINT_EPS_RPM = 0.5     # smaller setpoint changes are ignored
+RAMP_GAP_S = 1.0           # changes closer than this are one transition (profile ramp)
+SETTLE_BAND_RPM = 50       # settled: within this of the setpoint,
+SETTLE_BAND_PCT = 5        # or this % of it if larger (1 Hall pulse per revolution is coarse)...
+SETTLE_HOLD_S = 1.0        # ...for this long
+MIN_STEP_RPM = 100         # smaller steps get no rise time or overshoot
+MAX_GAP_S = 1.0            # longer gaps between samples add no shear exposure
+
+# Limits of an acceptable run (None: not checked)
+QUALITY_LIMITS = {
+    "settling_s": 10.0,
+    "overshoot_pct": 10.0,
+    "ss_error_rpm": 100.0,
+    "ripple_rpm": 75.0,
+}
+
+# =========================
+# CONTROL QUALITY
+# Step-response and steady-state metrics computed online, in O(1) per
+# sample, from the telemetry stream:
+#   - rise time (10 % -> 90 % of the step), settling time (from the
+#     setpoint change until the RPM stays within the settling band for
+#     SETTLE_HOLD_S) and overshoot, for the last setpoint change;
+#   - steady-state error and RPM ripple: running mean and standard
+#     deviation (Welford) of RPM - setpoint once settled;
+#   - cumulative shear exposure: integral of the shear rate over time.
+# A profile ramp counts as one setpoint change, timed from its start.
+# =========================
+class ControlQuality:
+    def __init__(self, calibration, limits=QUALITY_LIMITS):
+        """
+        Parameters:
+            - calibration (Calibration) : For the shear exposure
+            - limits (dict) : Metric -> maximum accepted value
+        """
+        self.calibration = calibration
+        self.limits = limits
+        self.reset()
+
+    def reset(self):
+        """Start over, at the beginning of a run."""
+        self.samples = 0
+        self.steps = 0
+        self.shear_exposure = 0.0        # s⁻¹ × s, dimensionless shear strain
+        self.worst_settling_s = None
+        self.worst_overshoot_pct = None
+        self._last_t = None
+        self._last_shear = None
+        self._setpoint = None
+        self._last_change_t = None
+        self._new_step(None, None, None)
+
+    def _new_step(self, t, rpm_from, rpm_to):
+        self.step_t = t
+        self.step_from = rpm_from
+        self.step_to = rpm_to
+        self.rise_s = None
+        self.settling_s = None
+        self.overshoot_pct = None
+        self._t10 = None
+        self._peak = 0.0
+        self._in_band_since = None
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    # ================= INGESTION =================
+    def update(self, events):
+        """
+        Parameters:
+            - events (list) : Telemetry events, Samples are used, in order
+        """
+        samples = [e for e in events if isinstance(e, Sample)]
+        if not samples:
+            return
+
+        # Shear exposure, vectorized over the batch
+        t = np.array([s.t if s.device_t is None else s.device_t for s in samples])
+        shear = np.asarray(self.calibration.rpm_to_shear([s.rpm for s in samples]))
+        t_prev = np.concatenate(([t[0] if self._last_t is None else self._last_t], t[:-1]))
+        shear_prev = np.concatenate(([shear[0] if self._last_shear is None
+                                      else self._last_shear], shear[:-1]))
+        dt = t - t_prev
+        dt = np.where((dt > 0) & (dt <= MAX_GAP_S), dt, 0.0)
+        self.shear_exposure += float(np.sum((shear + shear_prev) / 2 * dt))
+        self._last_t, self._last_shear = t[-1], shear[-1]
+
+        for ti, s in zip(t, samples):
+            self._update_one(ti, s.setpoint, s.rpm)
+        self.samples += len(samples)
+
+    def _update_one(self, t, setpoint, rpm):
+        # Setpoint change: a new step, or the continuation of a ramp
+        if self._setpoint is None or abs(setpoint - self._setpoint) > SETPOINT_EPS_RPM:
+            ramping = (self._last_change_t is not None
+                       and t - self._last_change_t < RAMP_GAP_S)
+            if self._setpoint is not None and not ramping:
+                self.steps += 1
+            if ramping:
+                self.step_to = setpoint
+                self._in_band_since = None
+                self.settling_s = None
+                self._n, self._mean, self._m2 = 0, 0.0, 0.0
+            else:
+                self._new_step(t, rpm, setpoint)
+            self._setpoint = setpoint
+            self._last_change_t = t
+
+        step = self.step_to - self.step_from
+        error = rpm - self.step_to
+
+        # Rise time and overshoot, on steps big enough to measure them
+        if abs(step) >= MIN_STEP_RPM:
+            progress = (rpm - self.step_from) / step
+            if self._t10 is None and progress >= 0.1:
+                self._t10 = t
+            if self.rise_s is None and self._t10 is not None and progress >= 0.9:
+                self.rise_s = t - self._t10
+            excess = error if step > 0 else -error
+            if excess > self._peak:
+                self._peak = excess
+                self.overshoot_pct = 100 * excess / abs(step)
+                self.worst_overshoot_pct = max(self.worst_overshoot_pct or 0.0,
+                                               self.overshoot_pct)
+
+        # Settling
+        if abs(error) <= max(SETTLE_BAND_RPM, SETTLE_BAND_PCT / 100 * abs(self.step_to)):
+            if self._in_band_since is None:
+                self._in_band_since = t
+            if (self.settling_s is None
+                    and t - self._in_band_since >= SETTLE_HOLD_S):
+                self.settling_s = self._in_band_since - self.step_t
+                self.worst_settling_s = max(self.worst_settling_s or 0.0, self.settling_s)
+        elif self.settling_s is None:
+            self._in_band_since = None
+
+        # Steady state (Welford)
+        if self.settling_s is not None:
+            self._n += 1
+            delta = error - self._mean
+            self._mean += delta / self._n
+            self._m2 += delta * (error - self._mean)
+
+    # ================= RESULTS =================
+    @property
+    def ss_error_rpm(self):
+        return self._mean if self._n else None
+
+    @property
+    def ripple_rpm(self):
+        return math.sqrt(self._m2 / (self._n - 1)) if self._n > 1 else None
+
+    def verdict(self):
+        """
+        Returns:
+            - verdict (str) : "PASS", "FAIL (<metrics>)" or "---" before the RPM settled
+        """
+        values = {"settling_s": self.worst_settling_s,
+                  "overshoot_pct": self.worst_overshoot_pct,
+                  "ss_error_rpm": None if self.ss_error_rpm is None else abs(self.ss_error_rpm),
+                  "ripple_rpm": self.ripple_rpm}
+        if self.worst_settling_s is None:
+            return "---"
+        failed = [name for name, limit in self.limits.items()
+                  if limit is not None and values[name] is not None and values[name] > limit]
+        return "FAIL (" + ", ".join(failed) + ")" if failed else "PASS"
+
+    def summary(self):
+        """Metrics of the run so far, attached to the run record."""
+        return {
+            "samples": self.samples,
+            "setpoint_changes": self.steps,
+            "rise_s": self.rise_s,
+            "settling_s": self.settling_s,
+            "overshoot_pct": self.overshoot_pct,
+            "worst_settling_s": self.worst_settling_s,
+            "worst_overshoot_pct": self.worst_overshoot_pct,
+            "ss_error_rpm": self.ss_error_rpm,
+            "ripple_rpm": self.ripple_rpm,
+            "shear_exposure": self.shear_exposure,
+            "verdict": self.verdict(),
+        }
+
+    def format(self):
+        """Two short lines for the stirrer tab."""
+        def f(value, unit, fmt="{:.1f}"):
+            return "---" if value is None else fmt.format(value) + unit
+        return (f"Rise {f(self.rise_s, ' s')}, settle {f(self.settling_s, ' s')}, "
+                f"overshoot {f(self.overshoot_pct, ' %')}\n"
+                f"Error {f(self.ss_error_rpm, ' RPM', '{:+.0f}')}, "
+                f"ripple {f(self.ripple_rpm, ' RPM', '{:.0f}')}, "
+                f"exposure {self.shear_exposure:.3g} – {self.verdict()}")
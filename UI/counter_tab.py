@@ -2,6 +2,7 @@ import os
 import cv2
 import tkinter as tk
 import numpy as np
+from collections import namedtuple
 from matplotlib.gridspec import GridSpec
 
 from tkinter import filedialog
@@ -10,6 +11,8 @@ from scipy.spatial.distance import cdist
 from scipy.optimize import curve_fit
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+
+from UI.perf_hud import StageTimer
     
 # =========================
 # CONFIG
@@ -23,6 +26,13 @@ CONTROL_POINTS = {
     0:   [(0, 0)]
 }
 
+# Result of one count: mean ± std platelet counts of the non activated
+# and activated images, the platelet loss (%) and the VWF activity (%)
+CountResult = namedtuple("CountResult", [
+    "stat_count", "stat_count_std", "act_count", "act_count_std",
+    "platelet_loss", "platelet_loss_std", "activity", "activity_std",
+])
+
 # =========================
 # NUMBER OF PLATELETS -> VWF ACTIVITY CONVERSION
 # =========================
@@ -104,6 +114,9 @@ class CounterUI:
         self.selected_act_image_paths = []
         self.selected_background_path = None
 
+        # Counting job progress (read by the performance HUD)
+        self.stages = StageTimer()
+
         # Build the UI
         self._build_ui()
 
@@ -301,6 +314,18 @@ class CounterUI:
 
         self.canvas.draw_idle()
     
+    def set_images(self, stat_paths, act_paths, background_path):
+        """
+        Select the images to count without the dialogs (the assay tab's
+        Show in Counter, once the operator agreed); they are shown by the next count.
+        """
+        self.selected_stat_image_paths = list(stat_paths)
+        self.selected_act_image_paths = list(act_paths)
+        self.selected_background_path = background_path
+        self.stat_img_text.set("Selected images:\n" + "\n".join(self._shorten_path(p) for p in stat_paths))
+        self.act_img_text.set("Selected images:\n" + "\n".join(self._shorten_path(p) for p in act_paths))
+        self.bckgrd_img_text.set(f"Selected image:\n{self._shorten_path(background_path)}")
+
     def open_background_image(self):
         path =  filedialog.askopenfilename(
             title="Select the background image",
@@ -354,7 +379,7 @@ class CounterUI:
 
         self.canvas.draw_idle()
 
-    def preprocess_image(self, file_path: str, bkgrd_img_path: str):
+    def preprocess_image(self, file_path: str, bkgrd_img_path: str, min_val=None):
         # Open images
         img = cv2.imread(str(file_path), cv2.IMREAD_GRAYSCALE)
         bkgrd = cv2.imread(bkgrd_img_path, cv2.IMREAD_GRAYSCALE)
@@ -374,7 +399,8 @@ class CounterUI:
         # Histogram normalization
         dimensions = img_corrected.shape
         number_of_pixels = dimensions[0] * dimensions[1]
-        min_val = float(self.min_val_var.get())
+        if min_val is None:
+            min_val = float(self.min_val_var.get())
 
         hist, _ = np.histogram(img_corrected, bins=256, range=(min_val, 255))
         normalized_cumulative_histogram = np.cumsum(hist) / number_of_pixels
@@ -428,42 +454,71 @@ class CounterUI:
         Wrapper called by the button.
         Uses stored paths to call count_platelets.
         Display results and updates count
+
+        Returns:
+            - result (CountResult | None) : None if images are missing
         """
         if not self.selected_stat_image_paths:
             print("No non activated platelet images selected.")
-            return
+            return None
         
         if not self.selected_act_image_paths:
             print("No activated platelet images selected.")
-            return
+            return None
 
         if not self.selected_background_path:
             print("No background image selected.")
-            return
+            return None
+
+        n_images = len(self.selected_stat_image_paths) + len(self.selected_act_image_paths)
+        self.stages.start_job(f"count {n_images} images")
+        try:
+            result, stat_overlays, act_overlays = self.count_images(
+                self.selected_stat_image_paths,
+                self.selected_act_image_paths,
+                self.selected_background_path,
+                debug=self.debug_mode.get()
+            )
+            self.stages.enter("display")
+            self.show_count(result, stat_overlays, act_overlays)
+            return result
+        finally:
+            self.stages.end_job()
 
+    def count_images(self, stat_paths, act_paths, bkgrd_img_path, debug=False, min_val=None):
+        """
+        Count the platelets of each image and convert the loss to a VWF
+        activity. No tkinter call when min_val is given, so it can run on
+        a worker thread (assay queue).
+
+        Returns:
+            - result (CountResult) : Counts, platelet loss and activity
+            - stat_overlays, act_overlays (list) : Labelled platelets of each image
+        """
         stat_counts = []
         stat_overlays = []
-        for file_path in self.selected_stat_image_paths:
+        for file_path in stat_paths:
             labels_filtered = self.count_platelets(
                 file_path=file_path,
-                bkgrd_img_path=self.selected_background_path,
-                debug=self.debug_mode.get()
+                bkgrd_img_path=bkgrd_img_path,
+                debug=debug,
+                min_val=min_val
             )
             stat_counts.append(np.max(labels_filtered))
             stat_overlays.append(labels_filtered)
 
         act_counts = []
         act_overlays = []
-        for file_path in self.selected_act_image_paths:
+        for file_path in act_paths:
             labels_filtered = self.count_platelets(
                 file_path=file_path,
-                bkgrd_img_path=self.selected_background_path,
-                debug=self.debug_mode.get()
+                bkgrd_img_path=bkgrd_img_path,
+                debug=debug,
+                min_val=min_val
             )
             act_counts.append(np.max(labels_filtered))
             act_overlays.append(labels_filtered)
 
-        # Show platelet counts
         stat_mean_count = np.mean(stat_counts)
         stat_std_count = np.std(stat_counts)
         act_mean_count = np.mean(act_counts)
@@ -476,10 +531,24 @@ class CounterUI:
         rel_act_std = act_std_count / (act_mean_count + epsilon)
         platelet_loss_std = abs(platelet_loss) * np.sqrt(rel_stat_std**2 + rel_act_std**2)
 
+        # Convert to activity, propagating the uncertainty through the
+        # linear calibration (y = m x + b)
+        activity = platelets_to_vwf_activity(platelet_loss)
+        activity_std = abs(m) * platelet_loss_std
+
+        result = CountResult(float(stat_mean_count), float(stat_std_count),
+                             float(act_mean_count), float(act_std_count),
+                             float(platelet_loss), float(platelet_loss_std),
+                             float(activity), float(activity_std))
+        return result, stat_overlays, act_overlays
+
+    def show_count(self, result, stat_overlays, act_overlays):
+        """Show a count of the selected images (Tk loop)."""
+        r = result
         self.platelet_count_text.set(
-            f"""Non activated platelet count : {stat_mean_count:.1f} ± {stat_std_count:.1f}
-Activated platelet count : {act_mean_count:.1f} ± {act_std_count:.1f}
-Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
+            f"""Non activated platelet count : {r.stat_count:.1f} ± {r.stat_count_std:.1f}
+Activated platelet count : {r.act_count:.1f} ± {r.act_count_std:.1f}
+Platelet loss : ({r.platelet_loss:.2f} ± {r.platelet_loss_std:.2f}) %"""
         )
 
         # Update images
@@ -487,12 +556,12 @@ Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
         act_originals = [cv2.imread(p, cv2.IMREAD_GRAYSCALE) for p in self.selected_act_image_paths]
 
         axes_images = [
-            (self.ax_im1, stat_originals[0], stat_overlays[0], f"{stat_counts[0]} platelets"),
-            (self.ax_im2, stat_originals[1], stat_overlays[1], f"{stat_counts[1]} platelets"),
-            (self.ax_im3, stat_originals[2], stat_overlays[2], f"{stat_counts[2]} platelets"),
-            (self.ax_im4, act_originals[0], act_overlays[0], f"{act_counts[0]} platelets"),
-            (self.ax_im5, act_originals[1], act_overlays[1], f"{act_counts[1]} platelets"),
-            (self.ax_im6, act_originals[2], act_overlays[2], f"{act_counts[2]} platelets"),
+            (self.ax_im1, stat_originals[0], stat_overlays[0], f"{np.max(stat_overlays[0])} platelets"),
+            (self.ax_im2, stat_originals[1], stat_overlays[1], f"{np.max(stat_overlays[1])} platelets"),
+            (self.ax_im3, stat_originals[2], stat_overlays[2], f"{np.max(stat_overlays[2])} platelets"),
+            (self.ax_im4, act_originals[0], act_overlays[0], f"{np.max(act_overlays[0])} platelets"),
+            (self.ax_im5, act_originals[1], act_overlays[1], f"{np.max(act_overlays[1])} platelets"),
+            (self.ax_im6, act_originals[2], act_overlays[2], f"{np.max(act_overlays[2])} platelets"),
         ]
 
         for ax, base_img, overlay, title in axes_images:
@@ -505,10 +574,7 @@ Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
         self.canvas.draw_idle()
 
         # Show activity
-        activity = platelets_to_vwf_activity(platelet_loss)
-        # Propagate uncertainty through linear calibration (y = m x + b)
-        activity_std = abs(m) * platelet_loss_std
-        self.activity_text.set(f"({activity:.2f} ± {activity_std:.2f}) %")
+        self.activity_text.set(f"({r.activity:.2f} ± {r.activity_std:.2f}) %")
 
         # Update calibration curve plot
         x_vals = np.linspace(0, 100, 1000)
@@ -526,9 +592,9 @@ Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
             label="Calibration points"
         )
         self.ax_cal.errorbar(
-            platelet_loss, activity,
-            xerr=platelet_loss_std,
-            yerr=activity_std,
+            r.platelet_loss, r.activity,
+            xerr=r.platelet_loss_std,
+            yerr=r.activity_std,
             fmt="o",
             color="red",
             ecolor="red",
@@ -545,32 +611,38 @@ Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
         self.ax_cal.grid(True)
         self.canvas.draw_idle()
 
-    def count_platelets(self, file_path: str, bkgrd_img_path: str, debug=False) -> np.array:
+    def count_platelets(self, file_path: str, bkgrd_img_path: str, debug=False, min_val=None) -> np.array:
         # Define file paths
         file_dir = os.path.dirname(file_path)
         file_name = os.path.basename(file_path)
         debug_file_path = os.path.join(file_dir, f"DEBUG_{file_name}")
 
+        self.stages.enter("preprocess")
         img, img_corrected, img_norm = self.preprocess_image(
             file_path,
-            bkgrd_img_path
+            bkgrd_img_path,
+            min_val
         )
 
         # Binarize the image with OTSU thresholding
+        self.stages.enter("threshold")
         _, binary = cv2.threshold(
             img_norm, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
         )
         bin_img = binary.astype(bool)
 
         # Morphological filtering
+        self.stages.enter("morphology")
         filtered_bin_img = morphology.remove_small_objects(bin_img, max_size=10)
         filtered_bin_img = morphology.remove_small_holes(filtered_bin_img, max_size=50)
 
         # Label the regions
+        self.stages.enter("label")
         labels_all = measure.label(filtered_bin_img, connectivity=2)
         regions_all = measure.regionprops(labels_all)
 
         # Filter the regions by their connectivity, their area and their solidity
+        self.stages.enter("filter")
         centroids = np.array([r.centroid for r in regions_all])
         diameters = np.array([r.equivalent_diameter_area for r in regions_all])
         D = cdist(centroids, centroids)
@@ -590,6 +662,7 @@ Platelet loss : ({platelet_loss:.2f} ± {platelet_loss_std:.2f}) %"""
         regions_filtered = measure.regionprops(labels_filtered)
 
         if debug:
+            self.stages.enter("debug figure")
 
             debug_fig = Figure(figsize=(14, 10))
             axes = [debug_fig.add_subplot(2, 4, i+1) for i in range(8)]
@@ -0,0 +1,489 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+
+from collections import deque
+
+from UI import trace
+from UI.calibration import load_calibration
+from UI.device_session import DeviceSession
+from UI.recorder import flush_recordings
+from UI.telemetry import Message, Sample, Status, TimeLeft
+from UI.transport import stop_transport_loop, transport_loop
+
+# =========================
+# CONFIG
+# =========================
+DAEMON_SOCKET = os.path.join(os.path.expanduser("~"), ".vwflow", "daemon.sock")
+DAEMON_TCP = "127.0.0.1:8765"        # where Unix sockets are not available (Windows)
+DEFAULT_ADDRESS = DAEMON_SOCKET if hasattr(socket, "AF_UNIX") else DAEMON_TCP
+MAX_CLIENT_TELEMETRY_BYTES = 1 << 20  # per client; beyond, its oldest telemetry is dropped
+MAX_REQUEST_BYTES = 64 * 1024
+IDLE_CHECK_S = 0.5                    # RunRecorder.check_idle period
+
+# Commands owning the device link: its stream settings are the daemon's,
+# whatever a client asks (one client turning the stream off would blind the others)
+LINK_COMMANDS = ("STREAM OFF", "BIN ", "RATE ", "BAUD ")
+
+# =========================
+# WIRE FORMAT
+# Newline-delimited JSON, both ways, over a Unix socket (or localhost TCP).
+# Requests, each answered by one {"ok": true, ...} or {"ok": false,
+# "error": "..."} line:
+#   {"cmd": "devices"}                           -> "devices": [{"id", "link", "status", "subscribers"}]
+#   {"cmd": "subscribe", "device": id}           -> then the device's telemetry
+#   {"cmd": "unsubscribe", "device": id}
+#   {"cmd": "send", "device": id, "text": "S 3000"}
+#   {"cmd": "stats"}                             -> "stats": per device and per client counters
+# Telemetry, one line per chunk received from the device, parsed once by
+# the daemon whatever the number of subscribers:
+#   {"device": id, "events": [event, ...]} with each event one of
+#   ["S", t, setpoint, rpm, pwm, device_t, seq]   Sample
+#   ["L", ms, t]                                  TimeLeft (ms null: INF)
+#   ["M", text]                                   Message
+#   ["C", text]                                   Status (device link)
+# Times are epoch seconds.
+# =========================
+def encode_events(device_id, events, t0):
+    """
+    Parameters:
+        - events (list) : Telemetry events, times relative to t0
+        - t0 (float) : Epoch time of the events' t = 0
+
+    Returns:
+        - line (bytes) : One telemetry line
+    """
+    items = []
+    for e in events:
+        if isinstance(e, Sample):
+            items.append(["S", e.t + t0, e.setpoint, e.rpm, e.pwm,
+                          None if e.device_t is None else e.device_t + t0, e.seq])
+        elif isinstance(e, TimeLeft):
+            items.append(["L", e.ms, None if e.t is None else e.t + t0])
+        elif isinstance(e, Message):
+            items.append(["M", e.text])
+        elif isinstance(e, Status):
+            items.append(["C", e.text])
+    return (json.dumps({"device": device_id, "events": items}, separators=(",", ":"))
+            + "\n").encode()
+
+def decode_events(items):
+    """Telemetry events from the "events" of a telemetry line, times in epoch seconds."""
+    events = []
+    for item in items:
+        kind = item[0]
+        if kind == "S":
+            events.append(Sample(*item[1:]))
+        elif kind == "L":
+            events.append(TimeLeft(item[1], item[2]))
+        elif kind == "M":
+            events.append(Message(item[1]))
+        elif kind == "C":
+            events.append(Status(item[1]))
+    return events
+
+def parse_address(address):
+    """
+    Returns:
+        - (host, port) for "host:port", or the socket path
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in address:
+        return host, int(port)
+    return address
+
+async def open_daemon_connection(address=DEFAULT_ADDRESS):
+    target = parse_address(address)
+    if isinstance(target, tuple):
+        return await asyncio.open_connection(*target, limit=MAX_REQUEST_BYTES)
+    return await asyncio.open_unix_connection(target, limit=MAX_REQUEST_BYTES)
+
+def daemon_request(request, address=DEFAULT_ADDRESS, timeout=2.0):
+    """
+    Send one request to the daemon and wait for its reply, for scripts.
+
+    Returns:
+        - reply (dict)
+
+    Raises:
+        - OSError : If the daemon is not running
+    """
+    target = parse_address(address)
+    family = socket.AF_INET if isinstance(target, tuple) else socket.AF_UNIX
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(target)
+        s.sendall((json.dumps(request) + "\n").encode())
+        with s.makefile("rb") as f:
+            # Skip telemetry of earlier subscriptions, the reply has "ok"
+            while True:
+                line = f.readline()
+                if not line:
+                    raise OSError("daemon closed the connection")
+                reply = json.loads(line)
+                if "ok" in reply:
+                    return reply
+
+# =========================
+# CLIENT
+# One per connection. Replies are never dropped; telemetry is queued up
+# to MAX_CLIENT_TELEMETRY_BYTES, then its oldest lines are dropped, so a
+# slow viewer only loses its own samples and never slows the device link
+# or the other clients.
+# =========================
+class _Client:
+    def __init__(self, writer, name, on_lost=None):
+        """
+        Parameters:
+            - writer (asyncio.StreamWriter) : The connection
+            - name (str) : For the log
+            - on_lost (callable | None) : Called with the client when a write fails
+        """
+        self.writer = writer
+        self.name = name
+        self.on_lost = on_lost
+        self.subscriptions = set()
+        self.replies = deque()
+        self.telemetry = deque()
+        self.telemetry_bytes = 0
+        self.ready = asyncio.Event()
+
+        # Counters
+        self.sent = 0
+        self.dropped = 0
+
+    def reply(self, message):
+        self.replies.append((json.dumps(message) + "\n").encode())
+        self.ready.set()
+
+    def push(self, line):
+        self.telemetry.append(line)
+        self.telemetry_bytes += len(line)
+        while self.telemetry_bytes > MAX_CLIENT_TELEMETRY_BYTES and len(self.telemetry) > 1:
+            self.telemetry_bytes -= len(self.telemetry.popleft())
+            self.dropped += 1
+        self.ready.set()
+
+    async def write_loop(self):
+        """A failed write (client gone) ends the loop and drops the client from the fan-out."""
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.replies or self.telemetry:
+                    if self.replies:
+                        data = self.replies.popleft()
+                    else:
+                        # Everything queued in one write
+                        data = b"".join(self.telemetry)
+                        self.sent += len(self.telemetry)
+                        self.telemetry.clear()
+                        self.telemetry_bytes = 0
+                    self.writer.write(data)
+                    await self.writer.drain()
+        except (ConnectionError, OSError) as e:
+            print(f"Daemon: {self.name} write error: {e}")
+            self.telemetry.clear()
+            self.telemetry_bytes = 0
+            if self.on_lost:
+                self.on_lost(self)
+
+    def stats(self):
+        return {"subscriptions": sorted(self.subscriptions), "sent": self.sent,
+                "dropped": self.dropped, "queued_bytes": self.telemetry_bytes}
+
+# =========================
+# DEVICE HUB
+# One per stirrer: owns its transport and its DeviceSession, which parses
+# and records the telemetry once (as a directly connected stirrer tab
+# does), and fans the events out to the subscribed clients. Commands from
+# every client go through it, so the run recording and the state restored
+# after a reconnection follow whoever sent them. Everything runs on the
+# transport loop.
+# =========================
+class DeviceHub:
+    def __init__(self, device_id, transport, record=True, calibration=None):
+        """
+        Parameters:
+            - device_id (str) : Stable ID of the stirrer
+            - transport (Transport) : Link to the stirrer, not started yet
+            - record (bool) : Record every run to disk (see UI/recorder.py)
+            - calibration (Calibration | None) : For the run records and quality metrics
+        """
+        self.device_id = device_id
+        self.transport = transport
+        self.session = DeviceSession(device_id, record=record, calibration=calibration)
+        self.subscribers = set()
+        self.status = None     # last link status, for the devices request
+
+        transport.on_data = self._on_data
+        transport.on_status = self._on_status
+        transport.restore_commands = self.session.restore_commands
+
+    def start(self):
+        self.transport.start()
+        self.transport.write("STREAM ON\n")
+
+    def _on_data(self, data):
+        events = self.session.feed(data)
+        if events:
+            self._broadcast(events)
+
+    def _on_status(self, text):
+        self.status = text
+        self._broadcast([Status(text)])
+
+    def _broadcast(self, events):
+        if self.subscribers:
+            with trace.span("fan-out", events=len(events), clients=len(self.subscribers)):
+                line = encode_events(self.device_id, events, self.session.start_time)
+                for client in self.subscribers:
+                    client.push(line)
+
+    def command(self, text):
+        """
+        Returns:
+            - sent (bool) : False for the link commands kept by the daemon
+        """
+        text = text.strip() + "\n"
+        if text.startswith(LINK_COMMANDS):
+            return False
+        self.session.command(text)
+        self.transport.write(text)
+        return True
+
+    def stats(self):
+        return {"link": self.transport.name, "status": self.status,
+                "subscribers": len(self.subscribers),
+                "telemetry": self.session.parser.stats(), "commands": self.transport.stats()}
+
+    def close(self):
+        """Any thread but the transport loop's: stop the motor and disconnect."""
+        self.transport.write("STOP\n")
+        self.transport.close()
+        self.session.close()
+
+# =========================
+# DAEMON
+# Serves the hubs on a local socket, on the shared transport loop: the
+# device links, the clients and the fan-out all run on one thread.
+# =========================
+class StirrerDaemon:
+    def __init__(self, hubs, address=DEFAULT_ADDRESS):
+        """
+        Parameters:
+            - hubs (list) : DeviceHub of each stirrer
+            - address (str) : Unix socket path, or "host:port" on localhost
+        """
+        self.hubs = {hub.device_id: hub for hub in hubs}
+        self.address = address
+        self.clients = set()
+        self._server = None
+        self._idle_task = None
+        self._n_clients = 0
+
+    def start(self):
+        """Start the devices and listen; returns once the socket is open."""
+        for hub in self.hubs.values():
+            hub.start()
+        asyncio.run_coroutine_threadsafe(self._listen(), transport_loop()).result()
+        print(f"Daemon listening on {self.address}")
+
+    def close(self, timeout=3.0):
+        future = asyncio.run_coroutine_threadsafe(self._stop_listening(), transport_loop())
+        future.result(timeout=timeout)
+        for hub in self.hubs.values():
+            hub.close()
+
+    async def _listen(self):
+        target = parse_address(self.address)
+        if isinstance(target, tuple):
+            self._server = await asyncio.start_server(self._serve, *target,
+                                                      limit=MAX_REQUEST_BYTES)
+        else:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            if os.path.exists(target):
+                os.remove(target)  # left by a daemon that did not exit cleanly
+            self._server = await asyncio.start_unix_server(self._serve, target,
+                                                           limit=MAX_REQUEST_BYTES)
+        self._idle_task = asyncio.ensure_future(self._check_idle())
+
+    async def _stop_listening(self):
+        self._idle_task.cancel()
+        self._server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        await self._server.wait_closed()
+        target = parse_address(self.address)
+        if not isinstance(target, tuple) and os.path.exists(target):
+            os.remove(target)
+
+    async def _check_idle(self):
+        while True:
+            await asyncio.sleep(IDLE_CHECK_S)
+            for hub in self.hubs.values():
+                hub.session.check_idle()
+
+    async def _serve(self, reader, writer):
+        self._n_clients += 1
+        client = _Client(writer, f"client {self._n_clients}", on_lost=self._drop_client)
+        self.clients.add(client)
+        write_task = asyncio.ensure_future(client.write_loop())
+        print(f"Daemon: {client.name} connected")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    client.reply(self._handle(client, request))
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    client.reply({"ok": False, "error": f"bad request: {e}"})
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            print(f"Daemon: {client.name} error: {e}")
+        finally:
+            self._drop_client(client)
+            self.clients.discard(client)
+            write_task.cancel()
+            print(f"Daemon: {client.name} disconnected, "
+                  f"{client.sent} telemetry lines sent, {client.dropped} dropped")
+
+    def _drop_client(self, client):
+        """Stop the fan-out to a client; its connection is closed by _serve."""
+        for hub in self.hubs.values():
+            hub.subscribers.discard(client)
+        client.writer.close()
+
+    def _handle(self, client, request):
+        cmd = request["cmd"]
+        if cmd == "devices":
+            return {"ok": True, "devices": [
+                {"id": hub.device_id, "link": hub.transport.name, "status": hub.status,
+                 "subscribers": len(hub.subscribers)} for hub in self.hubs.values()]}
+        if cmd == "stats":
+            return {"ok": True, "stats": {
+                "devices": {i: hub.stats() for i, hub in self.hubs.items()},
+                "clients": {c.name: c.stats() for c in self.clients}}}
+
+        hub = self.hubs.get(request.get("device"))
+        if hub is None:
+            return {"ok": False, "error": f"unknown device {request.get('device')!r}"}
+        if cmd == "subscribe":
+            hub.subscribers.add(client)
+            client.subscriptions.add(hub.device_id)
+            if hub.status is not None:
+                client.push(encode_events(hub.device_id, [Status(hub.status)], 0.0))
+            return {"ok": True}
+        if cmd == "unsubscribe":
+            hub.subscribers.discard(client)
+            client.subscriptions.discard(hub.device_id)
+            return {"ok": True}
+        if cmd == "send":
+            if not hub.command(request["text"]):
+                return {"ok": False, "error": "link commands are set by the daemon"}
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command {cmd!r}"}
+
+# =========================
+# COMMAND LINE
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GBM8970 – VWFlow stirrer daemon: owns the device links and "
+                    "serves them on a local socket")
+
+    parser.add_argument("--ble", action="store_true",
+                        help="Bluetooth stirrers instead of serial ones")
+    parser.add_argument("--scan", action="store_true",
+                        help="Look for stirrers not seen last time (all serial ports, full BLE scan)")
+    parser.add_argument("--simulate-device", action="store_true",
+                        help="Run emulated stirrers instead of the hardware")
+    parser.add_argument("--simulate-count", type=int, default=1,
+                        help="Number of emulated stirrers")
+    parser.add_argument("--simulate-rate", type=float, default=None,
+                        help="Emulated telemetry rate in Hz, overriding RATE")
+    parser.add_argument("--listen", default=DEFAULT_ADDRESS,
+                        help="Unix socket path, or host:port for localhost TCP")
+    parser.add_argument("--no-record", action="store_true",
+                        help="Do not record the runs")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Record a timing trace, written to FILE (Chrome trace JSON) on exit")
+
+    return parser.parse_args()
+
+def open_devices(args):
+    """
+    Find and open the stirrers, as the serial and bluetooth UIs do.
+
+    Returns:
+        - devices (list) : (device_id, transport) of each stirrer
+    """
+    if args.ble:
+        from functools import partial
+
+        from bleak import BleakClient
+
+        from UI.bluetooth.emulator import EmulatedBleakClient
+        from UI.bluetooth.main import find_ble_devices
+        from UI.bluetooth.transport import BLETransport
+        client_class = BleakClient
+        if args.simulate_device:
+            addresses = [f"EMULATOR-{i + 1}" for i in range(args.simulate_count)]
+            client_class = partial(EmulatedBleakClient, telemetry_hz=args.simulate_rate)
+        else:
+            addresses = find_ble_devices(args.scan)
+        return [(a, BLETransport(a, client_class=client_class)) for a in addresses]
+
+    import serial.tools.list_ports
+    from concurrent.futures import ThreadPoolExecutor
+
+    from UI.protocol import DEFAULT_BAUD
+    from UI.serial.main import find_serial_devices, open_emulated_devices, upgrade_link
+    from UI.serial.transport import SerialTransport
+    if args.simulate_device:
+        found = open_emulated_devices(args.simulate_count, args.simulate_rate)
+    else:
+        found = find_serial_devices(list(serial.tools.list_ports.comports()), DEFAULT_BAUD,
+                                    full_scan=args.scan)
+    if found:
+        with ThreadPoolExecutor(max_workers=len(found)) as pool:
+            list(pool.map(upgrade_link, [ser for _, ser in found]))
+    devices = []
+    for dev_id, ser in found:
+        ser.write_timeout = 1.0
+        devices.append((dev_id, SerialTransport(ser)))
+    return devices
+
+def main():
+    args = parse_args()
+    if args.trace:
+        trace.enable()
+    devices = open_devices(args)
+    if not devices:
+        raise RuntimeError("No stirrer found")
+
+    calibration = load_calibration()
+    hubs = [DeviceHub(dev_id, transport, record=not args.no_record, calibration=calibration)
+            for dev_id, transport in devices]
+    daemon = StirrerDaemon(hubs, args.listen)
+    daemon.start()
+    print(f"Serving {', '.join(hub.device_id for hub in hubs)}. Ctrl+C to stop.")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    daemon.close()
+    stop_transport_loop()
+    flush_recordings()
+    if args.trace:
+        trace.export(args.trace)
+    print("\nDaemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import json
+import tkinter as tk
+
+from tkinter import ttk
+
+from UI import trace
+from UI.assay_tab import AssayUI
+from UI.counter_tab import CounterUI
+from UI.daemon import DEFAULT_ADDRESS, daemon_request, decode_events, open_daemon_connection
+from UI.perf_hud import PerfHUD
+from UI.stirrer_tab import add_stirrer_tabs
+from UI.transport import Transport, stop_transport_loop
+
+# =========================
+# DAEMON TRANSPORT
+# A stirrer served by the daemon (UI/daemon.py), for a tab like any other
+# link: commands go through the daemon, telemetry arrives already parsed
+# (on_events). The daemon keeps the device link, so a lost connection to
+# it is retried, and closing the tab leaves the motor running.
+# =========================
+class DaemonTransport(Transport):
+    name = "Daemon"
+    owns_device = False
+
+    def __init__(self, device_id, address=DEFAULT_ADDRESS, **kwargs):
+        super().__init__(device_id, **kwargs)
+        self.daemon_address = address
+        self._stream_in = None
+        self._stream_out = None
+
+    async def _request(self, request):
+        self._stream_out.write((json.dumps(request) + "\n").encode())
+        await self._stream_out.drain()
+
+    async def _open(self):
+        self._stream_in, self._stream_out = await open_daemon_connection(self.daemon_address)
+        await self._request({"cmd": "subscribe", "device": self.address})
+
+    async def _receive(self):
+        while True:
+            line = await self._stream_in.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message.get("device") == self.address and "events" in message:
+                if self.on_events:
+                    with trace.span(f"read {self.name}", events=len(message["events"])):
+                        self.on_events(decode_events(message["events"]))
+            elif message.get("ok") is False:
+                print(f"{self.name} {self.address}: {message.get('error')}")
+
+    async def _write(self, data):
+        await self._request({"cmd": "send", "device": self.address, "text": data.decode()})
+
+    async def _close(self):
+        if self._stream_out is not None:
+            self._stream_out.close()
+            self._stream_out = None
+
+# =========================
+# ARGUMENT PARSING
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GBM8970 – VWFlow controller, as a client of the stirrer daemon")
+
+    parser.add_argument(
+        "--connect",
+        default=DEFAULT_ADDRESS,
+        help="Daemon socket path, or host:port"
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=None,
+        help="Record a timing trace, written to FILE (Chrome trace JSON) on exit"
+    )
+
+    return parser.parse_args()
+
+# =========================
+# MAIN
+# =========================
+def main():
+
+    # Parse command-line arguments
+    args = parse_args()
+    if args.trace:
+        trace.enable()
+
+    # Ask the daemon for its stirrers
+    try:
+        reply = daemon_request({"cmd": "devices"}, args.connect)
+    except OSError as e:
+        raise RuntimeError(f"Could not reach the stirrer daemon on {args.connect} ({e}). "
+                           "Start it with: python -m UI.daemon") from e
+    devices = [(d["id"], DaemonTransport(d["id"], args.connect)) for d in reply["devices"]]
+    print(f"Daemon on {args.connect}: {', '.join(d for d, _ in devices) or 'no stirrer'}")
+
+    # Initialize UI
+    root = tk.Tk()
+    root.title("VWFlow")
+    root.geometry("1200x800")
+
+    # Create notebook and tabs
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill="both", expand=True)
+
+    # Create one tab per stirrer, the daemon records the runs
+    stirrer_uis = add_stirrer_tabs(notebook, devices, record=False)
+
+    # Create counter tab
+    counter_frame = ttk.Frame(notebook)
+    notebook.add(counter_frame, text="Counter")
+    counter_ui = CounterUI(counter_frame)
+
+    # Create assay queue tab: timed runs on the stirrers, then the count
+    assay_frame = ttk.Frame(notebook)
+    notebook.add(assay_frame, text="Assays")
+    assay_ui = AssayUI(assay_frame, stirrer_uis, counter_ui)
+
+    # Performance overlay, toggled with F3
+    PerfHUD(root, stirrer_uis, counter_ui)
+
+    # Handle window close event
+    def on_close():
+        for stirrer_ui in stirrer_uis:
+            stirrer_ui.on_close()
+        counter_ui.on_close()
+        assay_ui.on_close()
+        stop_transport_loop()
+        if args.trace:
+            trace.export(args.trace)
+        root.destroy()
+        print("\nApplication closed with success.")
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Start the main event loop
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
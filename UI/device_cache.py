@@ -0,0 +1,38 @@
+import json
+import os
+
+# =========================
+# LAST-KNOWN DEVICE CACHE
+# Small JSON file remembering which port/address answered last time, so
+# discovery can try it first.
+# =========================
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".vwflow", "devices.json")
+
+def _load_all():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_cached_device(kind):
+    """
+    Parameters:
+        - kind (str) : "serial" or "ble"
+
+    Returns:
+        - info (dict | None) : What was saved for this kind, None if nothing
+    """
+    info = _load_all().get(kind)
+    return info if isinstance(info, dict) else None
+
+def save_cached_device(kind, info):
+    """Remember the device that answered. Failures are not fatal."""
+    cache = _load_all()
+    cache[kind] = info
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        with open(CACHE_PATH, "w") as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"Could not save device cache: {e}")
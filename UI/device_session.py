@@ -0,0 +1,163 @@
+import time
+
+from UI import trace
+from UI.archive import index_run
+from UI.calibration import load_calibration
+from UI.control_quality import ControlQuality
+from UI.recorder import STOP_GRACE_S, RunRecorder
+from UI.telemetry import ChunkParser, Message, Sample
+
+# =========================
+# CONFIG
+# =========================
+# Commands replayed after a device reconnection, last value of each, in this order
+RESTORED_PREFIXES = ("S ", "T ", "PROFILE ")
+
+# =========================
+# DEVICE SESSION
+# What the owner of a stirrer link does with it, whoever shows it: parse
+# the received bytes once, record the runs with their control quality,
+# and keep the applied settings that are restored after a reconnection
+# and saved with each run. Owned by the stirrer tab of a direct link and
+# by the daemon's DeviceHub. Fed on the transport loop.
+# =========================
+class DeviceSession:
+    def __init__(self, device_id, record=True, calibration=None):
+        """
+        Parameters:
+            - device_id (str) : Stable ID of the stirrer
+            - record (bool) : Record every run to disk (see UI/recorder.py)
+            - calibration (Calibration | None) : For the run records and quality metrics
+        """
+        self.device_id = device_id
+        self.start_time = time.time()
+        self.parser = ChunkParser()
+        self.calibration = calibration or load_calibration()
+        self.quality = ControlQuality(self.calibration)
+        self.recorder = None
+        if record:
+            self.recorder = RunRecorder(device_id, on_closed=index_run, quality=self.quality)
+        self.applied = {}      # restored prefix -> last command
+        # Run tracking when not recording (the recorder does it otherwise),
+        # to reset the quality metrics per run
+        self._running = False
+        self._ended = None     # monotonic time of the last run end
+
+    # ================= TELEMETRY =================
+    def feed(self, data):
+        """
+        Parse received bytes and record them.
+
+        Returns:
+            - events (list) : Telemetry events, times relative to start_time
+        """
+        with trace.span("parse", bytes=len(data)):
+            events = self.parser.feed(data, time.time() - self.start_time)
+        self.ingest(events)
+        return events
+
+    def ingest(self, events):
+        """Record parsed events, times relative to start_time."""
+        if not events:
+            return
+        if self.recorder is not None:
+            self.recorder.record(events, self.start_time)  # also feeds self.quality
+        else:
+            self._update_quality(events)
+        for event in events:
+            if isinstance(event, Message) and event.text == "PROFILE_ERR":
+                self.applied.pop("PROFILE ", None)  # nothing to re-upload
+
+    def _update_quality(self, events):
+        """
+        Feed the quality metrics per run, runs delimited as the recorder
+        does: START or a first sample after idle, STOPPED or STOP.
+        """
+        run_samples = []
+        for event in events:
+            if isinstance(event, Sample):
+                if not self._running:
+                    if self._ended is not None and time.monotonic() - self._ended < STOP_GRACE_S:
+                        continue
+                    self._start_run()
+                run_samples.append(event)
+            elif isinstance(event, Message) and event.text == "STOPPED":
+                self.quality.update(run_samples)
+                run_samples = []
+                self._end_run()
+        self.quality.update(run_samples)
+
+    def _start_run(self):
+        self.quality.reset()
+        self._running = True
+
+    def _end_run(self):
+        self._running = False
+        self._ended = time.monotonic()
+
+    # ================= COMMANDS =================
+    def command(self, text, **meta):
+        """
+        Track a command about to be sent: the applied settings, and the
+        recorded run on START/STOP.
+
+        Parameters:
+            - text (str) : Command, newline terminated
+            - meta : Extra metadata saved with a run started by START (e.g. the assay sample)
+        """
+        for prefix in RESTORED_PREFIXES:
+            if text.startswith(prefix):
+                self.applied[prefix] = text
+        if text == "PROFILE CLEAR\n":
+            self.applied.pop("PROFILE ", None)
+
+        if self.recorder is not None:
+            if text == "START\n":
+                profile = self.applied_profile
+                self.recorder.start_run(setpoint_rpm=self.applied_rpm,
+                                        runtime_s=self.applied_runtime,
+                                        calibration=self.calibration.version,
+                                        profile=profile and profile.strip(),
+                                        **meta)
+            elif text == "STOP\n":
+                self.recorder.end_run()
+        elif text == "START\n":
+            self._start_run()
+        elif text == "STOP\n":
+            self._end_run()
+
+    def restore_commands(self):
+        """
+        Transport loop: the applied settings, sent first on every
+        (re)connection. START is not replayed, a run interrupted by a
+        device reset must be restarted by the operator.
+        """
+        return [self.applied[prefix] for prefix in RESTORED_PREFIXES if prefix in self.applied]
+
+    @property
+    def applied_rpm(self):
+        text = self.applied.get("S ")
+        return text and float(text[2:])
+
+    @property
+    def applied_runtime(self):
+        text = self.applied.get("T ")
+        return text and float(text[2:])
+
+    @property
+    def applied_profile(self):
+        """The PROFILE command re-uploaded after a reconnection, None if none."""
+        return self.applied.get("PROFILE ")
+
+    @property
+    def run_id(self):
+        return self.recorder.run_id if self.recorder is not None else None
+
+    def check_idle(self):
+        """Call periodically: ends a recorded run whose stream stopped."""
+        if self.recorder is not None:
+            self.recorder.check_idle()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.end_run()
@@ -0,0 +1,641 @@
+import math
+import os
+import re
+import select
+import threading
+import time
+
+from collections import namedtuple
+
+from UI.protocol import DEFAULT_BAUD, encode_telemetry
+
+# =========================
+# SKETCH PARAMETERS
+# What differs between the two stirrer sketches: control period, filter,
+# feedforward, PI gains and limits, defaults and the ASCII line format.
+# =========================
+Sketch = namedtuple("Sketch", [
+    "ctrl_period_ms",   # control loop period
+    "ema_alpha",        # RPM filter
+    "kff", "ff_offset", # feedforward: pwm = ff_offset + kff * setpoint
+    "kp", "ki",         # PI gains (ki per second, as PID_v1)
+    "pi_min", "pi_max", # PI output limits
+    "pi_deadband_rpm",  # |error| below this: PI off (0 = always on)
+    "max_pi_step",      # PI slew limit per control tick
+    "setpoint", "setpoint_max", "stream_enabled",  # power-on state
+    "ascii_format",     # "setpoint,rpm,pwm" line
+    "heartbeat",        # "b" line after each ASCII sample
+    "stopped_message",  # send "STOPPED" when a run ends (STOP or timed)
+    "reset_pi_on_start",
+])
+
+# src/stirrer_control_serial (PID_v1)
+SERIAL_SKETCH = Sketch(
+    ctrl_period_ms=250, ema_alpha=0.05,
+    kff=0.0092, ff_offset=0.0,
+    kp=0.02, ki=0.0015,
+    pi_min=-50.0, pi_max=50.0, pi_deadband_rpm=80.0, max_pi_step=1.0,
+    setpoint=3000.0, setpoint_max=12000.0, stream_enabled=False,
+    ascii_format="{:.2f},{:.2f},{:.2f}", heartbeat=True,
+    stopped_message=True, reset_pi_on_start=False,
+)
+
+# src/stirrer_control_bluetooth (AutoTunePID, manual gains). The library's
+# internals are approximated by the same PI as PID_v1.
+BLE_SKETCH = Sketch(
+    ctrl_period_ms=100, ema_alpha=0.2,
+    kff=0.00398, ff_offset=42.0,
+    kp=0.0058, ki=0.00008,
+    pi_min=0.0, pi_max=255.0, pi_deadband_rpm=0.0, max_pi_step=5.0,
+    setpoint=0.0, setpoint_max=7000.0, stream_enabled=True,
+    ascii_format="{:.0f},{:.1f},{:.0f}", heartbeat=False,
+    stopped_message=True, reset_pi_on_start=True,
+)
+
+# =========================
+# CONFIG
+# =========================
+TIME_LEFT_PERIOD_MS = 500
+PROFILE_MAX_SEGMENTS = 16  # as in both sketches
+
+# Motor + Hall sensor plant
+PLANT_TAU_MS = 400.0      # first-order motor response
+PLANT_GAIN_ERROR = 0.9    # the motor reaches 90 % of what the feedforward expects
+PULSES_PER_REV = 1        # Hall pulses per revolution
+FRAME_STALL_MS = 500      # frame RPM: no Hall pulse for this long means stopped
+
+# First-order motor: speed -> gain * (pwm - offset) with time constant tau_ms
+Plant = namedtuple("Plant", ["gain", "offset", "tau_ms"])
+
+def default_plant(sketch):
+    """The emulated motor of a sketch: its feedforward is PLANT_GAIN_ERROR off."""
+    return Plant(PLANT_GAIN_ERROR / sketch.kff, sketch.ff_offset, PLANT_TAU_MS)
+
+# BLE notification packing (mirrors src/stirrer_control_bluetooth)
+BLE_PACKET_BYTES = 128    # stirrerTX characteristic size
+BLE_NOTIFY_MIN_BYTES = 20 # ATT_MTU 23 - 3, until the host sends MTU
+BLE_PACK_MAX_DELAY_MS = 100
+
+# Arduino String.toFloat()/toInt(): the leading number, 0 if there is none
+_NUMBER = re.compile(r"\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+_INTEGER = re.compile(r"\s*[+-]?\d+")
+
+def _to_float(text):
+    match = _NUMBER.match(text)
+    return float(match.group()) if match else 0.0
+
+def _to_int(text):
+    match = _INTEGER.match(text)
+    return int(match.group()) if match else 0
+
+# =========================
+# STIRRER EMULATOR
+# Host-side stand-in for a stirrer sketch: same commands, same replies,
+# same ASCII lines and binary frames, driven by an explicit clock so it
+# can run faster than real time. The motor is a first-order plant whose
+# Hall pulses are counted per control tick, filtered and fed to the
+# sketch's feedforward + PI loop. With packet_bytes set, output is cut
+# into BLE notifications the way the BLE sketch packs them.
+# =========================
+class StirrerEmulator:
+    def __init__(self, sketch=SERIAL_SKETCH, packet_bytes=None, telemetry_hz=None,
+                 plant=None):
+        """
+        Parameters:
+            - sketch (Sketch) : SERIAL_SKETCH or BLE_SKETCH
+            - packet_bytes (int | None) : BLE characteristic size, the largest
+              notification, None for a serial byte stream
+            - telemetry_hz (float | None) : Binary telemetry rate overriding
+              RATE (up to kHz, to load-test the host), None to obey RATE
+            - plant (Plant | None) : Emulated motor, default_plant(sketch) if None
+        """
+        self.sketch = sketch
+        self.plant = plant or default_plant(sketch)
+        self.ctrl_period_ms = sketch.ctrl_period_ms
+        self.packet_bytes = packet_bytes
+        self.notify_bytes = BLE_NOTIFY_MIN_BYTES  # BLE: until the host sends MTU
+        self.forced_period_ms = None if not telemetry_hz else 1000.0 / telemetry_hz
+
+        # Link state
+        self.baud = DEFAULT_BAUD
+        self.binary = False
+        self.telemetry_period_ms = self.forced_period_ms or sketch.ctrl_period_ms
+        self.seq = 0
+
+        # Device state
+        self.now_ms = 0.0
+        self.setpoint = sketch.setpoint
+        self.kp = sketch.kp
+        self.ki = sketch.ki
+        self.kff = sketch.kff
+        self.ff_offset = sketch.ff_offset
+        self.motor_enabled = False
+        self.stream_enabled = sketch.stream_enabled
+        self.run_time_ms = 0       # set by T, kept across profile runs
+        self.run_length_ms = 0     # this run: run_time_ms, or the profile's length
+        self.run_start_ms = 0.0
+        self.timed_run = False
+
+        # Uploaded profile (PROFILE command)
+        self.profile_rpm = []
+        self.profile_end_ms = []   # from the start of the run
+        self.profile_segment = -1  # -1 = no profile running
+        self.profile_start_rpm = 0.0
+        self.profile_spec = ""     # accepted PROFILE argument
+
+        # Plant
+        self.motor_rpm = 0.0       # true shaft speed
+        self.revolutions = 0.0
+        self._pulses_counted = 0   # by the control ticks
+        self._pulse_total = 0      # Hall pulses since power-on, and the time of the last
+        self._last_pulse_ms = 0.0
+
+        # Controller
+        self.rpm = 0.0             # filtered RPM, as reported in ASCII
+        self.frame_rpm = 0.0       # RPM over the last frame period, as in binary frames
+        self._frame_pulse_total = 0
+        self._frame_pulse_ms = 0.0
+        self._frame_ref_valid = False
+        self.pwm = 0
+        self.pi_out = 0.0
+        self._pi_sum = 0.0
+        self._pi_auto = False
+        self._last_pi = 0.0
+
+        self._rx = bytearray()
+        self._tx = bytearray()
+        self._notifications = []
+        self._pack = bytearray()
+        self._pack_start_ms = 0.0
+        self._plant_ms = 0.0
+        self._last_ctrl_ms = 0.0
+        self._last_telemetry_ms = 0.0
+        self._last_time_msg_ms = 0.0
+
+    # ================= HOST SIDE =================
+    def write(self, data):
+        """Bytes sent by the host. Complete lines are handled immediately."""
+        self._rx += data
+        while b"\n" in self._rx:
+            line, _, rest = bytes(self._rx).partition(b"\n")
+            self._rx = bytearray(rest)
+            self.handle_command(line.decode(errors="ignore").strip())
+
+    def read(self):
+        """Bytes sent by the device since the last call."""
+        data = bytes(self._tx)
+        self._tx.clear()
+        return data
+
+    def central_connected(self):
+        """BLE mode: a new connection, notifications are small until MTU is sent."""
+        self._flush_pack()
+        self._notifications = []
+        self._pack.clear()
+        self.notify_bytes = BLE_NOTIFY_MIN_BYTES
+
+    def read_notifications(self):
+        """BLE mode: notifications sent since the last call, one bytes object each."""
+        notifications = self._notifications
+        self._notifications = []
+        return notifications
+
+    def next_event_ms(self):
+        """Device time of the next control tick or telemetry frame."""
+        next_ctrl = self._last_ctrl_ms + self.ctrl_period_ms
+        if self.binary:
+            return min(next_ctrl, self._last_telemetry_ms + self.telemetry_period_ms)
+        return next_ctrl
+
+    def run_until(self, now_ms):
+        """Advance the device clock, running every control/telemetry tick on the way."""
+        while True:
+            next_ctrl = self._last_ctrl_ms + self.ctrl_period_ms
+            next_telemetry = self._last_telemetry_ms + self.telemetry_period_ms
+            next_tick = min(next_ctrl, next_telemetry) if self.binary else next_ctrl
+            if next_tick > now_ms:
+                break
+            self._advance_plant(next_tick)
+            self._check_timed_run()
+            if self.binary and next_telemetry <= next_ctrl:
+                self._send_binary_telemetry()
+            else:
+                self._control_tick()
+            self._flush_pack_if_due()
+        self._advance_plant(now_ms)
+        self._check_timed_run()
+
+    # ================= PLANT =================
+    def _advance_plant(self, t_ms):
+        """
+        Integrate the motor exactly up to t_ms (the PWM is constant between
+        ticks) and accumulate the revolutions the Hall sensor sees.
+        """
+        dt = t_ms - self._plant_ms
+        if dt <= 0:
+            return
+        t0_ms, revolutions0 = self._plant_ms, self.revolutions
+        self._plant_ms = t_ms
+        self.now_ms = t_ms
+
+        p = self.plant
+        drive = max(self.pwm - p.offset, 0.0) if self.motor_enabled else 0.0
+        target = p.gain * drive
+        decay = math.exp(-dt / p.tau_ms)
+        # Revolutions = integral of the speed over dt (rpm -> rev/ms)
+        area = target * dt + (self.motor_rpm - target) * p.tau_ms * (1.0 - decay)
+        self.revolutions += area / 60000.0
+        self.motor_rpm = target + (self.motor_rpm - target) * decay
+
+        # Time of the last Hall pulse, interpolated within the step
+        total = int(self.revolutions * PULSES_PER_REV)
+        if total > self._pulse_total:
+            f = (total / PULSES_PER_REV - revolutions0) / (self.revolutions - revolutions0)
+            self._last_pulse_ms = t0_ms + f * dt
+            self._pulse_total = total
+
+    def _hall_pulses(self):
+        total = int(self.revolutions * PULSES_PER_REV)
+        pulses = total - self._pulses_counted
+        self._pulses_counted = total
+        return pulses
+
+    # ================= SKETCH =================
+    def handle_command(self, cmd):
+        s = self.sketch
+        if cmd == "WHO":
+            self._println("DEVICE:STIRRER")
+            return
+
+        if cmd.startswith("BAUD "):
+            baud = _to_int(cmd[5:])
+            if 9600 <= baud <= 1000000:
+                self._println(f"BAUD_OK {baud}")
+                self.baud = baud
+            else:
+                self._println("BAUD_ERR")
+            return
+
+        if cmd == "START":
+            self.motor_enabled = True
+            self.timed_run = True
+            self.run_start_ms = self.now_ms
+            self.run_length_ms = self.run_time_ms
+            if s.reset_pi_on_start:
+                self._pi_sum = 0.0
+            if self.profile_rpm:
+                self.profile_segment = 0
+                self.profile_start_rpm = self.setpoint
+                self.run_length_ms = self.profile_end_ms[-1]
+                if self.stream_enabled:
+                    self._println("PROFILE,0")
+        elif cmd == "STOP":
+            self.motor_enabled = False
+            self.timed_run = False
+            self.profile_segment = -1
+            self.pwm = 0
+            if s.stopped_message:
+                self._println("STOPPED")
+
+        if cmd == "PROFILE CLEAR":
+            self.profile_rpm, self.profile_end_ms = [], []
+            self.profile_segment = -1
+            self.profile_spec = ""
+            self._println("PROFILE_OK 0 0")
+            return
+        if cmd.startswith("PROFILE "):
+            spec = cmd[8:]
+            if self.profile_segment >= 0 and spec == self.profile_spec:
+                # Re-upload of the running profile (host reconnecting): keep running it
+                self._println(f"PROFILE_OK {len(self.profile_rpm)} {self.profile_end_ms[-1]}")
+                return
+            self.profile_segment = -1
+            if self._parse_profile(spec):
+                self.profile_spec = spec
+                self._println(f"PROFILE_OK {len(self.profile_rpm)} {self.profile_end_ms[-1]}")
+            else:
+                self.profile_spec = ""
+                self._println("PROFILE_ERR")
+            return
+
+        if cmd.startswith("S "):
+            if self.profile_segment < 0:  # a running profile owns the setpoint
+                self.setpoint = min(max(_to_float(cmd[2:]), 0), s.setpoint_max)
+        elif cmd.startswith(("KP ", "KI ", "KFF ", "FFO ")):
+            name, _, value = cmd.partition(" ")
+            attribute = {"KP": "kp", "KI": "ki", "KFF": "kff", "FFO": "ff_offset"}[name]
+            setattr(self, attribute, _to_float(value))
+            self._print_gains()
+        elif cmd == "PID":
+            self._print_gains()
+        elif cmd.startswith("T "):
+            seconds = _to_float(cmd[2:])
+            self.run_time_ms = 0 if seconds <= 0 else int(seconds * 1000)
+            if self.profile_segment < 0:
+                self.run_length_ms = self.run_time_ms  # also the current run, unless a profile
+        elif cmd == "STREAM ON":
+            self.stream_enabled = True
+        elif cmd == "STREAM OFF":
+            self.stream_enabled = False
+        elif cmd == "BIN ON":
+            self.binary = True
+        elif cmd == "BIN OFF":
+            self.binary = False
+        elif cmd.startswith("RATE ") and self.forced_period_ms is None:
+            self.telemetry_period_ms = min(max(_to_int(cmd[5:]), 5), 1000)
+        elif cmd.startswith("MTU ") and self.packet_bytes is not None:
+            self._flush_pack()
+            self.notify_bytes = min(max(_to_int(cmd[4:]) - 3, BLE_NOTIFY_MIN_BYTES), self.packet_bytes)
+
+    def _parse_profile(self, spec):
+        """Same parsing and limits as the sketches' parseProfile."""
+        self.profile_rpm, self.profile_end_ms = [], []
+        rpms, ends, total = [], [], 0
+        for segment in filter(None, spec.split(",")):
+            if len(rpms) >= PROFILE_MAX_SEGMENTS or ":" not in segment:
+                return False
+            rpm, _, seconds = segment.partition(":")
+            try:
+                rpm, seconds = float(rpm), float(seconds)
+            except ValueError:
+                return False
+            if not 0 <= rpm <= self.sketch.setpoint_max or seconds < 0:
+                return False
+            total += int(seconds * 1000 + 0.5)
+            rpms.append(rpm)
+            ends.append(total)
+        if not rpms or total == 0:
+            return False
+        self.profile_rpm, self.profile_end_ms = rpms, ends
+        return True
+
+    def _update_profile(self):
+        """Setpoint of the running profile at this control tick."""
+        if self.profile_segment < 0 or not self.motor_enabled:
+            return
+        elapsed = self.now_ms - self.run_start_ms
+        ends = self.profile_end_ms
+        while self.profile_segment < len(ends) - 1 and elapsed >= ends[self.profile_segment]:
+            self.profile_segment += 1
+            if self.stream_enabled:
+                self._println(f"PROFILE,{self.profile_segment}")
+
+        i = self.profile_segment
+        seg_start = ends[i - 1] if i else 0
+        start_rpm = self.profile_rpm[i - 1] if i else self.profile_start_rpm
+        f = 1.0 if elapsed >= ends[i] else (elapsed - seg_start) / (ends[i] - seg_start)
+        self.setpoint = start_rpm + (self.profile_rpm[i] - start_rpm) * f
+
+    def _check_timed_run(self):
+        if (self.timed_run and self.run_length_ms > 0
+                and self.now_ms - self.run_start_ms >= self.run_length_ms):
+            self.motor_enabled = False
+            self.timed_run = False
+            self.pwm = 0
+            if self.profile_segment >= 0:
+                self.profile_segment = -1
+                if self.stream_enabled:
+                    self._println("PROFILE,DONE")
+            if self.stream_enabled:
+                self._println("TIME_LEFT,0")  # the periodic TIME_LEFT stops with the motor
+            if self.sketch.stopped_message:
+                self._println("STOPPED")
+
+    def _control_tick(self):
+        s = self.sketch
+        self._last_ctrl_ms = self.now_ms
+
+        # RPM from the Hall pulses of the last period, EMA filtered
+        raw_rpm = self._hall_pulses() * 60000.0 / (self.ctrl_period_ms * PULSES_PER_REV)
+        self.rpm = s.ema_alpha * raw_rpm + (1.0 - s.ema_alpha) * self.rpm
+
+        if (self.stream_enabled and self.motor_enabled
+                and self.now_ms - self._last_time_msg_ms > TIME_LEFT_PERIOD_MS):
+            self._last_time_msg_ms = self.now_ms
+            if self.run_length_ms == 0:
+                self._println("TIME_LEFT,INF")
+            else:
+                remaining = max(0, self.run_length_ms - int(self.now_ms - self.run_start_ms))
+                self._println(f"TIME_LEFT,{remaining}")
+
+        self._update_profile()
+
+        if not self.motor_enabled:
+            self.pwm = 0
+            return
+
+        # Feedforward + PI with slew limit
+        pwm_ff = self.ff_offset + self.kff * self.setpoint
+        self._compute_pi()
+        step = s.max_pi_step
+        self.pi_out = min(max(self.pi_out, self._last_pi - step), self._last_pi + step)
+        self._last_pi = self.pi_out
+        self.pwm = int(min(max(pwm_ff + self.pi_out, 0), 255))
+
+        if self.stream_enabled and not self.binary:
+            self._println(s.ascii_format.format(self.setpoint, self.rpm, self.pwm))
+            if s.heartbeat:
+                self._println("b")
+
+    def _compute_pi(self):
+        """PID_v1 style: integral clamped to the output limits, PI off inside the deadband."""
+        s = self.sketch
+        error = self.setpoint - self.rpm
+        if abs(error) < s.pi_deadband_rpm:
+            self._pi_auto = False
+            self.pi_out = 0.0
+            return
+        if not self._pi_auto:
+            # Switching to automatic starts the integral from the current output
+            self._pi_auto = True
+            self._pi_sum = min(max(self.pi_out, s.pi_min), s.pi_max)
+        dt_s = self.ctrl_period_ms / 1000.0
+        self._pi_sum = min(max(self._pi_sum + self.ki * dt_s * error, s.pi_min), s.pi_max)
+        self.pi_out = min(max(self.kp * error + self._pi_sum, s.pi_min), s.pi_max)
+
+    def _print_gains(self):
+        self._println(f"PID,{self.kp:.6f},{self.ki:.6f},{self.kff:.6f},{self.ff_offset:.2f}")
+
+    def _measure_frame_rpm(self):
+        """As the sketches' measureFrameRpm: pulses since the last frame over their time span."""
+        pulses = self._pulse_total - self._frame_pulse_total
+        if pulses > 0:
+            span_ms = self._last_pulse_ms - self._frame_pulse_ms
+            if self._frame_ref_valid and span_ms > 0:
+                self.frame_rpm = pulses * 60000.0 / (span_ms * PULSES_PER_REV)
+            self._frame_pulse_total = self._pulse_total
+            self._frame_pulse_ms = self._last_pulse_ms
+            self._frame_ref_valid = True
+        elif self.now_ms - self._last_pulse_ms > FRAME_STALL_MS:
+            self.frame_rpm = 0.0
+            self._frame_ref_valid = False
+        return self.frame_rpm
+
+    def _send_binary_telemetry(self):
+        self._last_telemetry_ms = self.now_ms
+        if not (self.stream_enabled and self.motor_enabled):
+            return
+        frame = encode_telemetry(self.seq, int(self.now_ms), self.setpoint,
+                                 self._measure_frame_rpm(), self.pwm)
+        self.seq = (self.seq + 1) & 0xFFFF
+
+        if self.packet_bytes is None:
+            self._tx += frame
+            return
+
+        # Pack frames into one notification until the next would not fit
+        if len(self._pack) + len(frame) > self.notify_bytes:
+            self._flush_pack()
+        if not self._pack:
+            self._pack_start_ms = self.now_ms
+        self._pack += frame
+
+    def _flush_pack_if_due(self):
+        if self._pack and self.now_ms - self._pack_start_ms >= BLE_PACK_MAX_DELAY_MS:
+            self._flush_pack()
+
+    def _flush_pack(self):
+        if self._pack:
+            self._notifications.append(bytes(self._pack))
+            self._pack.clear()
+
+    def _println(self, text):
+        if self.packet_bytes is None:
+            self._tx += text.encode() + b"\r\n"
+        else:
+            # Lines go out after pending frames, cut to the notification size
+            self._flush_pack()
+            data = text.encode() + b"\n"
+            for i in range(0, len(data), self.notify_bytes):
+                self._notifications.append(data[i:i + self.notify_bytes])
+
+
+# =========================
+# EMULATED SERIAL PORT
+# pyserial-like wrapper running the emulator on the wall clock. Reads
+# return garbage while the host and device baud rates differ.
+# =========================
+class EmulatedSerial:
+    def __init__(self, emulator=None, baudrate=DEFAULT_BAUD, timeout=0.1,
+                 port="EMULATOR"):
+        self.emulator = emulator or StirrerEmulator()
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.port = port
+        self.is_open = True
+        self._t0 = time.monotonic()
+        self._buf = bytearray()
+        self._lock = threading.Lock()  # UI thread writes, reader thread reads
+
+    def _pump(self):
+        with self._lock:
+            self.emulator.run_until((time.monotonic() - self._t0) * 1000)
+            self._receive(self.emulator.baud)
+
+    def _receive(self, device_baud):
+        data = self.emulator.read()
+        if self.baudrate != device_baud:
+            data = bytes(0xFF for _ in data)
+        self._buf += data
+
+    @property
+    def in_waiting(self):
+        self._pump()
+        return len(self._buf)
+
+    def read(self, size=1):
+        deadline = time.monotonic() + (self.timeout or 0)
+        while True:
+            self._pump()
+            if len(self._buf) >= size or time.monotonic() >= deadline:
+                break
+            time.sleep(0.001)
+        with self._lock:
+            data = bytes(self._buf[:size])
+            del self._buf[:size]
+        return data
+
+    def readline(self):
+        deadline = time.monotonic() + (self.timeout or 0)
+        while True:
+            self._pump()
+            if b"\n" in self._buf or time.monotonic() >= deadline:
+                break
+            time.sleep(0.001)
+        with self._lock:
+            end = self._buf.find(b"\n") + 1 or len(self._buf)
+            data = bytes(self._buf[:end])
+            del self._buf[:end]
+        return data
+
+    def write(self, data):
+        if self.baudrate == self.emulator.baud:
+            self._pump()
+            with self._lock:
+                # Replies go out before a BAUD command switches the device
+                device_baud = self.emulator.baud
+                self.emulator.write(data)
+                self._receive(device_baud)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def reset_input_buffer(self):
+        self._pump()
+        with self._lock:
+            self._buf.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+# =========================
+# VIRTUAL SERIAL PORT (POSIX)
+# Serves an emulator on a pseudo-terminal: the serial UI opens .port
+# with pyserial exactly like a real Arduino, so discovery, the link
+# upgrade and the transport's file descriptor reader are all exercised.
+# =========================
+class PtySerialDevice:
+    def __init__(self, emulator=None):
+        import pty
+        import tty
+
+        self.emulator = emulator or StirrerEmulator()
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)  # no echo, no newline translation
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self.overflow_bytes = 0  # output dropped while the host was not reading
+
+        self._stop = threading.Event()
+        self._t0 = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f"emulator {self.port}")
+        self._thread.start()
+
+    def _run(self):
+        emulator = self.emulator
+        while not self._stop.is_set():
+            now_ms = (time.monotonic() - self._t0) * 1000
+            wait_s = min(max(emulator.next_event_ms() - now_ms, 0) / 1000, 0.01)
+            readable, _, _ = select.select([self._master], [], [], wait_s)
+            if readable:
+                try:
+                    emulator.write(os.read(self._master, 4096))
+                except OSError:
+                    pass  # no process has the port open
+            emulator.run_until((time.monotonic() - self._t0) * 1000)
+            data = emulator.read()
+            if data:
+                try:
+                    written = os.write(self._master, data)
+                except (BlockingIOError, OSError):
+                    written = 0
+                self.overflow_bytes += len(data) - written
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        os.close(self._master)
+        os.close(self._slave)
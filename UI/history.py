@@ -0,0 +1,204 @@
+import threading
+import numpy as np
+
+# =========================
+# CONFIG
+# =========================
+HISTORY_CAPACITY = 16384   # entries kept per level
+HISTORY_FACTOR = 4         # samples merged per bucket between two levels
+
+# =========================
+# HISTORY LEVEL
+# Fixed-capacity buffer of (t_first, t_last, v_min, v_max) buckets.
+# Level 0 stores raw samples (t_first == t_last, v_min == v_max).
+# =========================
+class _Level:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.t_first = np.empty(2 * capacity)
+        self.t_last = np.empty(2 * capacity)
+        self.v_min = np.empty(2 * capacity)
+        self.v_max = np.empty(2 * capacity)
+        self.start = 0
+        self.end = 0
+
+        # Only the coarsest level keeps everything, finer levels drop old entries
+        self.bounded = False
+        self.dropped = False
+
+        # Bucket being filled from the finer level
+        self.pending = None
+
+    def __len__(self):
+        return self.end - self.start
+
+    def append(self, t_first, t_last, v_min, v_max):
+        # Shift live entries back to the front once the spare half is used
+        if self.end == len(self.t_first):
+            n = len(self)
+            for arr in (self.t_first, self.t_last, self.v_min, self.v_max):
+                arr[:n] = arr[self.start:self.end]
+            self.start, self.end = 0, n
+
+        i = self.end
+        self.t_first[i] = t_first
+        self.t_last[i] = t_last
+        self.v_min[i] = v_min
+        self.v_max[i] = v_max
+        self.end += 1
+
+        if self.bounded and len(self) > self.capacity:
+            self.start += 1
+            self.dropped = True
+
+    def oldest_time(self):
+        return self.t_first[self.start] if len(self) else None
+
+    def arrays(self):
+        s = slice(self.start, self.end)
+        return self.t_first[s], self.t_last[s], self.v_min[s], self.v_max[s]
+
+
+# =========================
+# MULTI-RESOLUTION HISTORY
+# Keeps the whole run with bounded memory: raw samples for recent data and
+# min/max decimated buckets for older data. Level k holds buckets of
+# HISTORY_FACTOR**k raw samples, and a new coarser level is created each
+# time the coarsest one fills up.
+# =========================
+class MultiResolutionHistory:
+    def __init__(self, capacity=HISTORY_CAPACITY, factor=HISTORY_FACTOR):
+        self.capacity = capacity
+        self.factor = factor
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.levels = [_Level(self.capacity)]
+            self.count = 0
+            self.last_time = None
+            self.last_value = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, t, value):
+        """Add one raw sample. Amortized O(1)."""
+        with self._lock:
+            self._push(0, t, t, value, value)
+            self.count += 1
+            self.last_time = t
+            self.last_value = value
+
+    def _push(self, k, t_first, t_last, v_min, v_max):
+        level = self.levels[k]
+
+        # The coarsest level is full: build the next one from its content
+        if not level.bounded and len(level) >= self.capacity:
+            self._add_level()
+
+        level.append(t_first, t_last, v_min, v_max)
+
+        if k + 1 < len(self.levels):
+            self._accumulate(k + 1, t_first, t_last, v_min, v_max)
+
+    def _accumulate(self, k, t_first, t_last, v_min, v_max):
+        level = self.levels[k]
+        self._add_to_pending(level, t_first, t_last, v_min, v_max)
+
+        if level.pending[0] == self.factor:
+            _, b_first, b_last, b_min, b_max = level.pending
+            level.pending = None
+            self._push(k, b_first, b_last, b_min, b_max)
+
+    def _add_level(self):
+        coarsest = self.levels[-1]
+        coarsest.bounded = True
+
+        new = _Level(self.capacity)
+        t_first, t_last, v_min, v_max = coarsest.arrays()
+        n = (len(t_first) // self.factor) * self.factor
+        if n:
+            idx = np.arange(0, n, self.factor)
+            m = len(idx)
+            new.t_first[:m] = t_first[idx]
+            new.t_last[:m] = t_last[idx + self.factor - 1]
+            new.v_min[:m] = np.minimum.reduceat(v_min[:n], idx)
+            new.v_max[:m] = np.maximum.reduceat(v_max[:n], idx)
+            new.end = m
+        # Entries left over (fewer than one bucket) start the pending bucket
+        for i in range(n, len(t_first)):
+            self._add_to_pending(new, t_first[i], t_last[i], v_min[i], v_max[i])
+        self.levels.append(new)
+
+    def _add_to_pending(self, level, t_first, t_last, v_min, v_max):
+        if level.pending is None:
+            level.pending = [1, t_first, t_last, v_min, v_max]
+        else:
+            p = level.pending
+            p[0] += 1
+            p[2] = t_last
+            p[3] = min(p[3], v_min)
+            p[4] = max(p[4], v_max)
+
+    def query(self, t_start=None, max_points=1000):
+        """
+        Return (times, values) covering [t_start, now] with at most
+        about 2 * max_points points, whatever the run length.
+
+        Parameters:
+            - t_start (float) : Start of the range, None for the whole run
+            - max_points (int) : Number of buckets rendered
+
+        Returns:
+            - times (np.ndarray) : Sample or bucket edge times
+            - values (np.ndarray) : Values (min/max pairs for decimated data)
+        """
+        with self._lock:
+            if not self.count:
+                return np.empty(0), np.empty(0)
+
+            # Finest level that still covers the range with few enough entries
+            chosen = None
+            for k, level in enumerate(self.levels):
+                if level.dropped and (t_start is None or level.oldest_time() > t_start):
+                    continue
+                i0 = self._first_index(level, t_start)
+                chosen = (k, level, i0)
+                if len(level) - i0 <= max_points:
+                    break
+
+            k, level, i0 = chosen
+            # Copy under the lock, the reader thread may compact the level
+            t_first, t_last, v_min, v_max = (a[i0:].copy() for a in level.arrays())
+
+            # Append the pending buckets of levels 1..k, newest last
+            tail = [self.levels[j].pending for j in range(k, 0, -1)
+                    if self.levels[j].pending is not None]
+            if tail:
+                t_first = np.concatenate([t_first, [p[1] for p in tail]])
+                t_last = np.concatenate([t_last, [p[2] for p in tail]])
+                v_min = np.concatenate([v_min, [p[3] for p in tail]])
+                v_max = np.concatenate([v_max, [p[4] for p in tail]])
+
+        # Merge down to max_points buckets if the chosen level is still too dense
+        n = len(t_first)
+        if n > max_points:
+            idx = np.linspace(0, n, max_points, endpoint=False).astype(int)
+            last = np.append(idx[1:] - 1, n - 1)
+            t_first, t_last = t_first[idx], t_last[last]
+            v_min = np.minimum.reduceat(v_min, idx)
+            v_max = np.maximum.reduceat(v_max, idx)
+        elif k == 0:
+            return t_first, v_min
+
+        times = np.column_stack((t_first, t_last)).ravel()
+        values = np.column_stack((v_min, v_max)).ravel()
+        return times, values
+
+    def _first_index(self, level, t_start):
+        if t_start is None:
+            return 0
+        t_last = level.arrays()[1]
+        return int(np.searchsorted(t_last, t_start))
@@ -0,0 +1,130 @@
+import math
+
+from UI.telemetry import Sample, TimeLeft
+
+# =========================
+# CONFIG
+# =========================
+HIST_MIN_MS = 1.0          # histogram range, log-spaced bins
+HIST_MAX_MS = 10000.0
+HIST_BINS_PER_DECADE = 20
+MATCH_TIMEOUT_S = 5.0      # a command not reflected by then is given up
+STREAM_IDLE_S = 2.0        # only time commands while telemetry is flowing
+TIME_LEFT_JUMP_MS = 250    # TIME_LEFT off its countdown by more than this reflects a new T
+
+# =========================
+# LATENCY HISTOGRAM
+# Fixed log-spaced bins: O(1) to record, percentiles from the cumulative counts.
+# =========================
+class LatencyHistogram:
+    def __init__(self):
+        self._log_min = math.log10(HIST_MIN_MS)
+        n = int(round((math.log10(HIST_MAX_MS) - self._log_min) * HIST_BINS_PER_DECADE))
+        self.counts = [0] * (n + 2)  # + underflow and overflow bins
+        self.total = 0
+
+    def add(self, ms):
+        if ms < HIST_MIN_MS:
+            i = 0
+        else:
+            i = 1 + int((math.log10(ms) - self._log_min) * HIST_BINS_PER_DECADE)
+            i = min(i, len(self.counts) - 1)
+        self.counts[i] += 1
+        self.total += 1
+
+    def _bin_upper_ms(self, i):
+        return 10 ** (self._log_min + i / HIST_BINS_PER_DECADE)
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile (ms), None if empty."""
+        if not self.total:
+            return None
+        rank = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self._bin_upper_ms(i)
+        return self._bin_upper_ms(len(self.counts) - 1)
+
+# =========================
+# ROUND-TRIP LATENCY TRACKER
+# Matches each S/T command to the first telemetry reflecting it:
+#   S <rpm> -> first sample whose setpoint field equals <rpm>, not timed
+#              if the setpoint already is <rpm> (nothing would reflect it)
+#   T <s>   -> first TIME_LEFT off the previous countdown (INF for T 0)
+# All times are host times in seconds, on the telemetry timeline.
+# =========================
+class LatencyTracker:
+    def __init__(self, transport):
+        self.transport = transport
+        self.histogram = LatencyHistogram()
+        self.timeouts = 0
+
+        self._pending_setpoint = None   # (rpm, t_sent)
+        self._pending_runtime = None    # (total_ms or None, t_sent)
+        self._last_sample_t = None
+        self._last_setpoint = None
+        self._last_time_left = None     # (ms, t)
+
+    def command_sent(self, text, t):
+        """Call when a command is issued (e.g. the button click)."""
+        if text.startswith("S ") and self._streaming(self._last_sample_t, t):
+            rpm = float(text[2:])
+            unchanged = abs(self._last_setpoint - rpm) < 0.5
+            self._pending_setpoint = None if unchanged else (rpm, t)
+        elif text.startswith("T ") and self._last_time_left is not None \
+                and self._streaming(self._last_time_left[1], t):
+            seconds = float(text[2:])
+            total = None if seconds <= 0 else seconds * 1000
+            self._pending_runtime = (total, t)
+
+    def observe(self, event):
+        """Call for every telemetry event, in arrival order."""
+        if isinstance(event, Sample):
+            self._last_sample_t = event.t
+            self._last_setpoint = event.setpoint
+            if self._pending_setpoint is not None:
+                rpm, t_sent = self._pending_setpoint
+                if abs(event.setpoint - rpm) < 0.5:
+                    self._record(event.t - t_sent)
+                    self._pending_setpoint = None
+                elif event.t - t_sent > MATCH_TIMEOUT_S:
+                    self.timeouts += 1
+                    self._pending_setpoint = None
+
+        elif isinstance(event, TimeLeft):
+            if self._pending_runtime is not None:
+                total, t_sent = self._pending_runtime
+                if self._reflects_runtime(event, total):
+                    self._record(event.t - t_sent)
+                    self._pending_runtime = None
+                elif event.t - t_sent > MATCH_TIMEOUT_S:
+                    self.timeouts += 1
+                    self._pending_runtime = None
+            self._last_time_left = (event.ms, event.t)
+
+    def _reflects_runtime(self, event, total):
+        if total is None:
+            return event.ms is None
+        if event.ms is None or event.ms > total:
+            return False
+        prev_ms, prev_t = self._last_time_left
+        if prev_ms is None:
+            return True
+        predicted = prev_ms - (event.t - prev_t) * 1000
+        return abs(event.ms - predicted) > TIME_LEFT_JUMP_MS
+
+    def _streaming(self, last_t, t):
+        return last_t is not None and t - last_t < STREAM_IDLE_S
+
+    def _record(self, seconds):
+        self.histogram.add(1000 * seconds)
+
+    def summary(self):
+        """Text for the UI, e.g. 'USB round trip: p50 120 ms, p95 260 ms (n=12)'."""
+        h = self.histogram
+        if not h.total:
+            return f"{self.transport} round trip: ---"
+        return (f"{self.transport} round trip: p50 {h.percentile(50):.0f} ms, "
+                f"p95 {h.percentile(95):.0f} ms (n={h.total})")
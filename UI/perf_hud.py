@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import tkinter as tk
+
+from UI import trace
+
+# =========================
+# CONFIG
+# =========================
+HUD_REFRESH_MS = 500      # overlay refresh, and the window the rates are computed on
+LAG_PROBE_MS = 50         # Tk event-loop lag: how late a timer of this period fires
+HUD_KEY = "<F3>"          # shows / hides the overlay
+
+# =========================
+# STAGE TIMER
+# Lightweight counters for a multi-stage job (platelet counting): the
+# stage running now and how long each stage of the last job took.
+# Stages are set from whatever thread runs the job, read by the HUD.
+# =========================
+class StageTimer:
+    def __init__(self):
+        self.job = None            # running job, None when idle
+        self.stage = None          # its current stage
+        self.last_job = None
+        self.last_job_s = None
+        self.last_stages = {}      # stage -> total seconds in the last job
+        self.jobs = 0
+        self._stages = {}
+        self._job_t0 = None
+        self._stage_t0 = None
+
+    def start_job(self, name):
+        self.job, self.stage = name, None
+        self._stages = {}
+        self._job_t0 = self._stage_t0 = time.perf_counter()
+
+    def enter(self, stage):
+        """End the current stage (if any) and start the next one."""
+        now = time.perf_counter()
+        self._close_stage(now)
+        self.stage, self._stage_t0 = stage, now
+
+    def end_job(self):
+        if self.job is None:
+            return
+        now = time.perf_counter()
+        self._close_stage(now)
+        self.last_job, self.last_job_s = self.job, now - self._job_t0
+        trace.complete(self.job, self._job_t0, self.last_job_s)
+        self.last_stages = self._stages
+        self.job = self.stage = None
+        self.jobs += 1
+
+    def _close_stage(self, now):
+        if self.stage is not None:
+            self._stages[self.stage] = self._stages.get(self.stage, 0.0) + now - self._stage_t0
+            trace.complete(self.stage, self._stage_t0, now - self._stage_t0)
+
+    def format(self):
+        if self.job is not None:
+            return f"Counter: {self.job}, stage {self.stage or '-'}"
+        if self.last_job is None:
+            return "Counter: idle"
+        slowest = sorted(self.last_stages.items(), key=lambda kv: -kv[1])[:3]
+        stages = ", ".join(f"{name} {s:.2f} s" for name, s in slowest)
+        return f"Counter: idle, last {self.last_job} in {self.last_job_s:.2f} s ({stages})"
+
+# =========================
+# PROCESS USAGE
+# CPU from the process time (any platform); RSS from psutil when it is
+# installed, else /proc (Linux), else the peak RSS from resource (macOS).
+# =========================
+def process_rss_mb():
+    """
+    Returns:
+        - rss (float | None) : Resident memory in MB, None if unknown
+        - peak (bool) : True if only the peak is known
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20, False
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, False
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10), True
+    except ImportError:
+        return None, False
+
+# =========================
+# PERFORMANCE HUD
+# Overlay in the top-right corner of the window, over every tab, toggled
+# with HUD_KEY. It only reads the counters kept by the stirrer tabs (see
+# StirrerUI), their render scheduler, the transports' parsers and the
+# counter's StageTimer; nothing is measured while it is hidden except
+# those counters.
+# =========================
+class PerfHUD:
+    def __init__(self, root, stirrer_uis, counter_ui=None, visible=False):
+        """
+        Parameters:
+            - root (tk.Tk) : Main window
+            - stirrer_uis (list) : StirrerUI of each stirrer tab
+            - counter_ui (CounterUI | None) : For its counting job stage
+            - visible (bool) : Show the overlay at start
+        """
+        self.root = root
+        self.stirrer_uis = stirrer_uis
+        self.counter_ui = counter_ui
+        self.text = tk.StringVar(value="")
+        self.label = tk.Label(root, textvariable=self.text, justify=tk.LEFT, anchor="nw",
+                              font=("Courier", 9), bg="#202020", fg="#e0e0e0",
+                              padx=6, pady=4)
+        self.visible = False
+        self._after_id = None
+        self._probe_id = None
+        self._probe_due = None
+        self._max_lag = 0.0
+        root.bind_all(HUD_KEY, lambda event: self.toggle())
+        if visible:
+            self.toggle()
+
+    def toggle(self):
+        if self.visible:
+            self.visible = False
+            self.label.place_forget()
+            for after_id in (self._after_id, self._probe_id):
+                if after_id is not None:
+                    self.root.after_cancel(after_id)
+            self._after_id = self._probe_id = None
+            return
+
+        self.visible = True
+        self.label.place(relx=1.0, rely=0.0, anchor="ne", x=-4, y=28)
+        self.label.lift()
+        self._reset_window()
+        self._probe_due = None
+        self._probe()
+        self._after_id = self.root.after(HUD_REFRESH_MS, self._refresh)
+
+    # ================= MEASURES =================
+    def _probe(self):
+        """Tk event-loop lag: a timer that fires late means the loop was busy."""
+        now = time.perf_counter()
+        if self._probe_due is not None:
+            lag = max(0.0, now - self._probe_due)
+            self._max_lag = max(self._max_lag, lag)
+        self._probe_due = now + LAG_PROBE_MS / 1000
+        self._probe_id = self.root.after(LAG_PROBE_MS, self._probe)
+
+    def _snapshot(self):
+        scheduler = self.stirrer_uis[0].scheduler if self.stirrer_uis else None
+        return {
+            "t": time.perf_counter(),
+            "cpu": time.process_time(),
+            "ticks": scheduler.ticks if scheduler else 0,
+            "busy": scheduler.busy_s if scheduler else 0.0,
+            "tabs": [(ui.ingested, ui.parser.lines, ui.parser.frames, ui.frames_drawn)
+                     for ui in self.stirrer_uis],
+        }
+
+    def _reset_window(self):
+        self._last = self._snapshot()
+        self._max_lag = 0.0
+        for ui in self.stirrer_uis:
+            ui.max_queue_depth = 0
+        if self.stirrer_uis:
+            self.stirrer_uis[0].scheduler.max_tick_s = 0.0
+
+    # ================= DISPLAY =================
+    def _refresh(self):
+        now = self._snapshot()
+        last = self._last
+        dt = max(now["t"] - last["t"], 1e-6)
+        lines = []
+
+        # Process and Tk loop
+        rss, peak = process_rss_mb()
+        rss_text = "?" if rss is None else f"{rss:.0f} MB" + (" peak" if peak else "")
+        cpu = 100 * (now["cpu"] - last["cpu"]) / dt
+        lines.append(f"CPU {cpu:5.1f} %   RSS {rss_text}   Tk lag max {1000 * self._max_lag:.0f} ms")
+
+        # Plot refresh, shared by the stirrer tabs
+        if self.stirrer_uis:
+            scheduler = self.stirrer_uis[0].scheduler
+            ticks = now["ticks"] - last["ticks"]
+            frame_ms = 1000 * (now["busy"] - last["busy"]) / ticks if ticks else 0.0
+            lines.append(f"Plot {ticks / dt:4.1f} Hz (target {1000 / scheduler.period_ms:.0f} Hz)"
+                         f"   frame {frame_ms:.1f} ms, max {1000 * scheduler.max_tick_s:.1f} ms")
+
+        # Each stirrer
+        for i, ui in enumerate(self.stirrer_uis):
+            events, n_lines, frames, drawn = (b - a for a, b in zip(last["tabs"][i], now["tabs"][i]))
+            name = ui.transport.address if ui.transport else "simulation"
+            lines.append(f"[{i + 1}] {name}: {events / dt:6.0f} ev/s "
+                         f"({n_lines / dt:.0f} lines/s, {frames / dt:.0f} frames/s), "
+                         f"queue max {ui.max_queue_depth}, drawn {drawn / dt:.1f}/s, "
+                         f"parse errors {ui.parser.parse_errors}, lost frames {ui.parser.lost_frames}")
+
+        # Counting job
+        if self.counter_ui is not None:
+            lines.append(self.counter_ui.stages.format())
+
+        self.text.set("\n".join(lines))
+        self._reset_window()
+        self._after_id = self.root.after(HUD_REFRESH_MS, self._refresh)
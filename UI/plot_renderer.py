@@ -0,0 +1,137 @@
+import time
+
+from UI import trace
+
+# =========================
+# BLITTED PLOT RENDERER
+# Keeps a cached copy of each axes background (ticks, grid, titles) and
+# only redraws the line artists on top of it. A full redraw only happens
+# when the axes limits change or the canvas is resized.
+# =========================
+class BlitRenderer:
+    def __init__(self, canvas, axes, artists):
+        """
+        Parameters:
+            - canvas (FigureCanvasTkAgg) : Canvas holding the figure
+            - axes (list) : Axes whose background is cached
+            - artists (list) : Line artists redrawn on every frame
+        """
+        self.canvas = canvas
+        self.axes = list(axes)
+        self.artists = list(artists)
+
+        self._backgrounds = None
+        self._limits = None
+        self._dirty = True
+
+        # Animated artists are skipped by a full draw, so the cached
+        # background never contains them
+        for artist in self.artists:
+            artist.set_animated(True)
+
+        # A full draw (first show, resize, limit change) refreshes the cache
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def mark_dirty(self):
+        """Flag that new data is available for the next frame."""
+        self._dirty = True
+
+    def is_visible(self):
+        """False while the canvas is unmapped (e.g. its notebook tab is hidden)."""
+        try:
+            return bool(self.canvas.get_tk_widget().winfo_ismapped())
+        except Exception:
+            return False
+
+    def render(self):
+        """
+        Draw one frame if needed.
+
+        Returns:
+            - drawn (bool) : True if something was drawn
+        """
+        if not self._dirty or not self.is_visible():
+            return False
+
+        limits = self._current_limits()
+        if self._backgrounds is None or limits != self._limits:
+            # Axes changed: full redraw, the draw_event recaptures the background
+            self._limits = limits
+            with trace.span("full redraw"):
+                self.canvas.draw()
+        else:
+            for background in self._backgrounds:
+                self.canvas.restore_region(background)
+            self._draw_artists()
+            for ax in self.axes:
+                self.canvas.blit(ax.bbox)
+
+        self._dirty = False
+        return True
+
+    def _current_limits(self):
+        return tuple((ax.get_xlim(), ax.get_ylim()) for ax in self.axes)
+
+    def _draw_artists(self):
+        for artist in self.artists:
+            artist.axes.draw_artist(artist)
+
+    def _on_draw(self, event):
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        self._limits = self._current_limits()
+        self._draw_artists()
+
+# =========================
+# RENDER SCHEDULER
+# One Tk timer for every plotted view, instead of one per tab. Views are
+# updated in turn on each frame; hidden views skip their drawing (see
+# BlitRenderer.is_visible), so only the shown tab costs a redraw.
+# =========================
+class RenderScheduler:
+    def __init__(self, root, period_ms=100):
+        """
+        Parameters:
+            - root (tk widget) : Any widget, used for its after() timer
+            - period_ms (int) : Frame period
+        """
+        self.root = root
+        self.period_ms = period_ms
+        self.views = []
+        self._after_id = None
+
+        # Counters (read by the performance HUD)
+        self.ticks = 0
+        self.busy_s = 0.0        # time spent updating the views
+        self.max_tick_s = 0.0
+
+    def add(self, view):
+        """Register a view (anything with an update_plot() method) and start ticking."""
+        self.views.append(view)
+        if self._after_id is None:
+            self._tick()
+
+    def remove(self, view):
+        if view in self.views:
+            self.views.remove(view)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self):
+        t0 = time.perf_counter()
+        for view in list(self.views):
+            try:
+                view.update_plot()
+            except Exception as e:
+                print(f"Plot update error: {e}")
+        elapsed = time.perf_counter() - t0
+        trace.complete("frame", t0, elapsed)
+        self.ticks += 1
+        self.busy_s += elapsed
+        self.max_tick_s = max(self.max_tick_s, elapsed)
+        self._after_id = self.root.after(self.period_ms, self._tick)
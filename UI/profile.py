@@ -0,0 +1,238 @@
+import argparse
+import json
+
+from collections import namedtuple
+
+import numpy as np
+
+from UI.calibration import load_calibration
+from UI.emulator import BLE_SKETCH, PROFILE_MAX_SEGMENTS, SERIAL_SKETCH, StirrerEmulator
+
+# =========================
+# CONFIG
+# =========================
+PROFILE_MAX_CHARS = 240   # whole command, fits the BLE sketch's 244-byte RX characteristic
+RPM_MIN = 0
+RPM_MAX = 7000            # the BLE sketch's SP_MAX, the lower of the two sketches
+
+# =========================
+# PROFILES
+# A profile is a list of steps, each ramping linearly to its target over
+# duration_s (0 = step). A hold repeats the previous target. Files are JSON:
+#   {"name": "...", "unit": "RPM" or "SHEAR",
+#    "steps": [[target, duration_s], ...]}
+# The device runs the profile on its control tick from one PROFILE
+# command (see the sketches), the host only uploads it and follows.
+# =========================
+ProfileStep = namedtuple("ProfileStep", ["target", "duration_s"])
+
+class Profile:
+    def __init__(self, steps, unit="RPM", name="profile"):
+        """
+        Parameters:
+            - steps (list) : (target, duration_s) pairs
+            - unit (str) : "RPM" or "SHEAR" (mean shear rate, s⁻¹)
+            - name (str) : Shown in the UI
+        """
+        if unit not in ("RPM", "SHEAR"):
+            raise ValueError(f"unknown profile unit {unit!r}")
+        self.steps = [ProfileStep(float(t), float(d)) for t, d in steps]
+        if not self.steps:
+            raise ValueError("empty profile")
+        if any(s.duration_s < 0 for s in self.steps):
+            raise ValueError("negative step duration")
+        self.unit = unit
+        self.name = name
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["steps"], data.get("unit", "RPM"), data.get("name", path))
+
+    @property
+    def duration_s(self):
+        return sum(s.duration_s for s in self.steps)
+
+    def to_rpm(self, calibration):
+        """
+        The profile in RPM. A shear ramp is split at the calibration points
+        it crosses, so the device's linear RPM ramps follow the calibration
+        (exactly for a piecewise-linear calibration).
+
+        Returns:
+            - steps (list) : ProfileStep in RPM
+        """
+        if self.unit == "RPM":
+            return list(self.steps)
+
+        steps, previous = [], None
+        for target, duration in self.steps:
+            if previous is not None and duration > 0 and target != previous:
+                lo, hi = sorted((previous, target))
+                knots = calibration.shear[(calibration.shear > lo) & (calibration.shear < hi)]
+                if target < previous:
+                    knots = knots[::-1]
+                point = previous
+                for knot in list(knots) + [target]:
+                    steps.append((knot, duration * abs(knot - point) / abs(target - previous)))
+                    point = knot
+            else:
+                steps.append((target, duration))
+            previous = target
+        return [ProfileStep(calibration.shear_to_rpm(t), d) for t, d in steps]
+
+def encode_profile(rpm_steps):
+    """
+    Build the PROFILE command uploading rpm_steps in one go.
+
+    Returns:
+        - command (str) : "PROFILE <rpm>:<s>,...\\n"
+
+    Raises:
+        - ValueError : If the device would reject the profile
+    """
+    if len(rpm_steps) > PROFILE_MAX_SEGMENTS:
+        raise ValueError(f"{len(rpm_steps)} steps, the device takes {PROFILE_MAX_SEGMENTS}")
+    if sum(s.duration_s for s in rpm_steps) <= 0:
+        raise ValueError("the profile has no duration")
+    for s in rpm_steps:
+        if not RPM_MIN <= s.target <= RPM_MAX:
+            raise ValueError(f"{s.target:.0f} RPM is outside {RPM_MIN}-{RPM_MAX} RPM")
+    body = ",".join(f"{s.target:.0f}:{s.duration_s:.3f}".rstrip("0").rstrip(".")
+                    for s in rpm_steps)
+    command = f"PROFILE {body}\n"
+    if len(command) > PROFILE_MAX_CHARS:
+        raise ValueError(f"profile command is {len(command)} characters, "
+                         f"the device takes {PROFILE_MAX_CHARS}")
+    return command
+
+def expected_setpoint(rpm_steps, start_rpm, t_s):
+    """
+    Setpoint the device should follow, vectorized.
+
+    Parameters:
+        - rpm_steps (list) : ProfileStep in RPM
+        - start_rpm (float) : Setpoint when START was sent
+        - t_s (array) : Times from START, in s
+
+    Returns:
+        - setpoint (ndarray) : RPM at each time
+    """
+    ends = np.cumsum([s.duration_s for s in rpm_steps])
+    starts = np.concatenate(([0.0], ends[:-1]))
+    begin = np.array([start_rpm] + [s.target for s in rpm_steps[:-1]])
+    target = np.array([s.target for s in rpm_steps])
+
+    t = np.asarray(t_s, dtype=float)
+    i = np.minimum(np.searchsorted(ends, t, side="right"), len(rpm_steps) - 1)
+    duration = ends[i] - starts[i]
+    f = np.where(duration > 0, np.clip((t - starts[i]) / np.where(duration > 0, duration, 1), 0, 1), 1)
+    return begin[i] + (target[i] - begin[i]) * f
+
+# =========================
+# EMULATOR VALIDATION
+# =========================
+def simulate_profile(command, sketch=SERIAL_SKETCH, start_rpm=1000):
+    """
+    Upload and run a profile on the host-side emulator, as the UI would.
+
+    Returns:
+        - trace (dict) : t (s from START), setpoint and rpm at each control
+          tick, the device's PROFILE replies and progress lines with their time
+    """
+    emulator = StirrerEmulator(sketch)
+    period = sketch.ctrl_period_ms
+    for cmd in ("STREAM ON", f"S {start_rpm}", command.strip()):
+        emulator.handle_command(cmd)
+    emulator.run_until(period)
+    emulator.read()
+    emulator.read_notifications()
+    emulator.handle_command("START")
+    t0 = emulator.now_ms
+
+    t, setpoint, rpm, lines = [], [], [], []
+    while emulator.motor_enabled or not t:
+        emulator.run_until(emulator.now_ms + period)
+        t.append((emulator.now_ms - t0) / 1000)
+        setpoint.append(emulator.setpoint)
+        rpm.append(emulator.rpm)
+        for line in emulator.read().decode().splitlines():
+            if line.startswith("PROFILE"):
+                lines.append((t[-1], line))
+    return {"t": np.array(t), "setpoint": np.array(setpoint), "rpm": np.array(rpm),
+            "lines": lines}
+
+def check_profile(rpm_steps, sketch=SERIAL_SKETCH, start_rpm=1000):
+    """
+    Validate a profile against the emulator: the device setpoint must
+    follow expected_setpoint to within one control tick, and the run must
+    last as long as the profile.
+
+    Returns:
+        - report (dict) : max setpoint error (RPM), run length error and
+          largest step-change delay (s), PROFILE lines, and ok
+    """
+    command = encode_profile(rpm_steps)
+    trace = simulate_profile(command, sketch, start_rpm)
+    period_s = sketch.ctrl_period_ms / 1000
+
+    # The device updates its setpoint once per tick, compare at the tick
+    # times and allow for the one-tick sampling of the ramps and steps
+    t = trace["t"][:-1]   # the last tick is the stop
+    expected_now = expected_setpoint(rpm_steps, start_rpm, t)
+    expected_before = expected_setpoint(rpm_steps, start_rpm, np.maximum(t - period_s, 0))
+    error = np.minimum(abs(trace["setpoint"][:-1] - expected_now),
+                       abs(trace["setpoint"][:-1] - expected_before))
+    max_error = float(error.max()) if len(error) else 0.0
+
+    progress = {line: t for t, line in trace["lines"]}
+    ends = np.cumsum([s.duration_s for s in rpm_steps])
+    delays = [progress[f"PROFILE,{i + 1}"] - ends[i] for i in range(len(rpm_steps) - 1)
+              if f"PROFILE,{i + 1}" in progress and rpm_steps[i + 1].duration_s > 0]
+    length_error = trace["t"][-1] - ends[-1]
+    return {
+        "command": command.strip(),
+        "max_setpoint_error_rpm": max_error,
+        "max_step_delay_s": max(delays, default=0.0),
+        "length_error_s": float(length_error),
+        "lines": [line for _, line in trace["lines"]],
+        "ok": (max_error < 1.0 and 0 <= length_error <= period_s
+               and "PROFILE,DONE" in progress),
+    }
+
+# =========================
+# COMMAND LINE
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GBM8970 – VWFlow profile check: convert, encode and run a "
+                    "profile on the emulated stirrer")
+
+    parser.add_argument("profile", help="Profile JSON file")
+    parser.add_argument("--sketch", choices=("serial", "ble"), default="serial",
+                        help="Emulated sketch")
+    parser.add_argument("--start-rpm", type=float, default=1000,
+                        help="Setpoint when START is sent")
+    parser.add_argument("--calibration", default=None, help="Calibration file")
+
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    profile = Profile.load(args.profile)
+    steps = profile.to_rpm(load_calibration(args.calibration))
+    sketch = SERIAL_SKETCH if args.sketch == "serial" else BLE_SKETCH
+
+    print(f"{profile.name}: {len(profile.steps)} steps in {profile.unit}, "
+          f"{len(steps)} device segments, {profile.duration_s:.1f} s")
+    report = check_profile(steps, sketch, args.start_rpm)
+    print(report["command"])
+    print(f"Setpoint error: {report['max_setpoint_error_rpm']:.2f} RPM, "
+          f"run length error: {report['length_error_s']:+.3f} s, "
+          f"progress lines: {', '.join(report['lines'])}")
+    print("OK" if report["ok"] else "FAILED")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import struct
+
+# =========================
+# BINARY TELEMETRY PROTOCOL (must match the Arduino sketches)
+#
+#   offset  size  field
+#   0       2     sync        0xA5 0x5A
+#   2       1     type        0x01 = telemetry
+#   3       2     seq         uint16, wraps
+#   5       4     t_ms        uint32, device millis()
+#   9       2     setpoint    uint16, RPM
+#   11      4     rpm         float32, RPM measured over the frame period
+#                                (the ASCII stream sends the filtered RPM)
+#   15      1     pwm         uint8, applied PWM
+#   16      1     crc         CRC-8 (poly 0x07) of bytes 2..15
+#
+# All fields little-endian. ASCII lines (WHO reply, TIME_LEFT, ...) can
+# still be interleaved with frames: they never contain the 0xA5 byte.
+# =========================
+SYNC = b"\xA5\x5A"
+FRAME_TELEMETRY = 0x01
+
+_BODY = struct.Struct("<BHIHfB")
+FRAME_LEN = len(SYNC) + _BODY.size + 1
+
+# Link negotiation, sent after the WHO handshake
+DEFAULT_BAUD = 9600
+FAST_BAUD = 115200
+FAST_TELEMETRY_MS = 25   # 10x the 250 ms ASCII stream
+
+def _crc8_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+_CRC8 = _crc8_table()
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = _CRC8[crc ^ byte]
+    return crc
+
+def encode_telemetry(seq, t_ms, setpoint, rpm, pwm):
+    """
+    Build one telemetry frame, byte for byte what the sketch sends.
+
+    Parameters:
+        - seq (int) : Frame counter, wraps at 65536
+        - t_ms (int) : Device time in ms, wraps at 2**32
+        - setpoint (float) : Target RPM
+        - rpm (float) : Filtered RPM
+        - pwm (float) : Applied PWM (0-255)
+
+    Returns:
+        - frame (bytes) : FRAME_LEN bytes
+    """
+    body = _BODY.pack(
+        FRAME_TELEMETRY,
+        seq & 0xFFFF,
+        int(t_ms) & 0xFFFFFFFF,
+        max(0, min(0xFFFF, int(round(setpoint)))),
+        rpm,
+        max(0, min(255, int(pwm))),
+    )
+    return SYNC + body + bytes([crc8(body)])
+
+def decode_telemetry(frame):
+    """
+    Decode one frame starting at frame[0].
+
+    Returns:
+        - fields (tuple) : (seq, t_ms, setpoint, rpm, pwm)
+
+    Raises:
+        - ValueError : Bad sync, type, length or checksum
+    """
+    if len(frame) < FRAME_LEN or bytes(frame[:2]) != SYNC:
+        raise ValueError("not a telemetry frame")
+    body = frame[2:FRAME_LEN - 1]
+    if crc8(body) != frame[FRAME_LEN - 1]:
+        raise ValueError("bad checksum")
+    kind, seq, t_ms, setpoint, rpm, pwm = _BODY.unpack(body)
+    if kind != FRAME_TELEMETRY:
+        raise ValueError(f"unknown frame type {kind}")
+    return seq, t_ms, setpoint, rpm, pwm
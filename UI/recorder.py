@@ -0,0 +1,382 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from UI import trace
+from UI.telemetry import Message, Sample, TimeLeft
+
+# =========================
+# CONFIG
+# =========================
+RUNS_DIR = os.path.join(os.path.expanduser("~"), ".vwflow", "runs")
+CHUNK_ROWS = 4096        # a chunk is written when full...
+CHUNK_MAX_S = 1.0        # ...or this old, so a crash loses at most one chunk
+RUN_IDLE_S = 2.0         # no sample for this long ends the run
+STOP_GRACE_S = 1.0       # samples still in flight after STOP do not start a new run
+MAX_PENDING_CHUNKS = 64  # chunks waiting for the writer, newer ones are dropped beyond
+COMPRESS_LEVEL = 6
+
+# =========================
+# FILE FORMAT (.vwr)
+#   header : b"VWFR" | version u16 | meta_len u32 | meta (JSON)
+#   chunk  : b"CHNK" | n_rows u32 | payload_len u32 | crc32 u32 | payload
+#   footer : b"END!" | summary_len u32 | summary (JSON), absent after a crash
+# A payload is the zlib-compressed concatenation of every column, each
+# byte-shuffled (all first bytes, then all second bytes...) so that slowly
+# changing values compress well. Little-endian throughout.
+# =========================
+MAGIC = b"VWFR"
+VERSION = 1
+CHUNK_TAG = b"CHNK"
+FOOTER_TAG = b"END!"
+CHUNK_HEADER = struct.Struct("<4sIII")
+
+TIME_LEFT_INF = -1       # time_left_ms for "run forever"
+TIME_LEFT_UNKNOWN = -2   # no TIME_LEFT seen yet
+
+COLUMNS = [
+    ("host_t", "<f8"),        # host arrival time, s since epoch
+    ("device_t", "<f8"),      # device clock on the host timeline, NaN for ASCII lines
+    ("setpoint", "<f4"),
+    ("rpm", "<f4"),
+    ("pwm", "<f4"),
+    ("time_left_ms", "<i4"),  # last TIME_LEFT, see TIME_LEFT_INF/UNKNOWN
+]
+
+def encode_chunk(columns):
+    """
+    Parameters:
+        - columns (dict) : Column name -> 1-D array, all the same length
+
+    Returns:
+        - chunk (bytes) : Header and compressed payload
+    """
+    parts = []
+    for name, dtype in COLUMNS:
+        a = np.ascontiguousarray(columns[name], dtype=dtype)
+        parts.append(a.view(np.uint8).reshape(-1, a.itemsize).T.tobytes())
+    payload = zlib.compress(b"".join(parts), COMPRESS_LEVEL)
+    n_rows = len(columns[COLUMNS[0][0]])
+    return CHUNK_HEADER.pack(CHUNK_TAG, n_rows, len(payload), zlib.crc32(payload)) + payload
+
+def decode_payload(payload, n_rows):
+    raw = zlib.decompress(payload)
+    columns, offset = {}, 0
+    for name, dtype in COLUMNS:
+        size = np.dtype(dtype).itemsize
+        shuffled = np.frombuffer(raw, np.uint8, n_rows * size, offset)
+        columns[name] = shuffled.reshape(size, n_rows).T.copy().view(dtype).ravel()
+        offset += n_rows * size
+    return columns
+
+def read_header(data):
+    """
+    Parameters:
+        - data (bytes-like) : The file content (bytes or mmap)
+
+    Returns:
+        - meta (dict) : Header metadata
+        - offset (int) : Where the first chunk starts
+    """
+    if data[:4] != MAGIC:
+        raise ValueError("not a run file")
+    _, meta_len = struct.unpack_from("<HI", data, 4)
+    return json.loads(data[10:10 + meta_len]), 10 + meta_len
+
+def iter_chunks(data, offset):
+    """
+    Walk the chunks from offset. Stops at the footer, or at a truncated or
+    corrupt chunk (crash).
+
+    Yields:
+        - (offset, n_rows, payload) of each chunk, then
+          (None, 0, summary dict) if the file has a footer
+    """
+    while offset + 8 <= len(data):
+        tag = bytes(data[offset:offset + 4])
+        if tag == FOOTER_TAG:
+            (summary_len,) = struct.unpack_from("<I", data, offset + 4)
+            yield None, 0, json.loads(data[offset + 8:offset + 8 + summary_len])
+            return
+        if tag != CHUNK_TAG or offset + CHUNK_HEADER.size > len(data):
+            return
+        _, n_rows, payload_len, crc = CHUNK_HEADER.unpack_from(data, offset)
+        start = offset + CHUNK_HEADER.size
+        payload = data[start:start + payload_len]
+        if len(payload) < payload_len or zlib.crc32(payload) != crc:
+            return
+        yield offset, n_rows, payload
+        offset = start + payload_len
+
+def concat_columns(chunks):
+    """Decoded chunks -> one array per column."""
+    return {name: np.concatenate([c[name] for c in chunks]) if chunks
+            else np.empty(0, dtype) for name, dtype in COLUMNS}
+
+def read_run(path):
+    """
+    Read a whole .vwr file. A truncated or corrupt last chunk (crash) is
+    skipped. See UI/archive.py to find runs and load parts of them.
+
+    Returns:
+        - meta (dict) : Header metadata
+        - columns (dict) : Column name -> NumPy array
+        - summary (dict | None) : Footer, None if the run was not closed
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    meta, offset = read_header(data)
+    chunks, summary = [], None
+    for chunk_offset, n_rows, payload in iter_chunks(data, offset):
+        if chunk_offset is None:
+            summary = payload
+        else:
+            chunks.append(decode_payload(payload, n_rows))
+    return meta, concat_columns(chunks), summary
+
+# =========================
+# BACKGROUND WRITER
+# One thread for every recorder: compresses chunks, appends them and
+# syncs each to disk. The ingestion path only hands over column arrays.
+# =========================
+class _Writer:
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._files = {}
+        self._lock = threading.Lock()
+        self.pending_chunks = 0
+        self.dropped_chunks = 0
+        self._thread = threading.Thread(target=self._run, daemon=True, name="recorder")
+        self._thread.start()
+
+    def open(self, path, header):
+        self._jobs.put(("open", path, header))
+
+    def write_chunk(self, path, columns):
+        """Never blocks: the chunk is dropped if the writer is too far behind."""
+        with self._lock:
+            if self.pending_chunks >= MAX_PENDING_CHUNKS:
+                self.dropped_chunks += 1
+                return False
+            self.pending_chunks += 1
+        self._jobs.put(("chunk", path, columns))
+        return True
+
+    def close(self, path, footer, on_closed=None):
+        self._jobs.put(("close", path, (footer, on_closed)))
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued job is written."""
+        done = threading.Event()
+        self._jobs.put(("flush", None, done))
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            kind, path, arg = self._jobs.get()
+            try:
+                if kind == "open":
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    self._files[path] = open(path, "xb")  # never truncate an earlier run
+                    self._append(path, arg)
+                elif kind == "chunk":
+                    with self._lock:
+                        self.pending_chunks -= 1
+                    self._append(path, encode_chunk(arg))
+                elif kind == "close":
+                    footer, on_closed = arg
+                    self._append(path, footer)
+                    self._files.pop(path).close()
+                    if on_closed is not None:
+                        on_closed(path)
+                elif kind == "flush":
+                    arg.set()
+            except Exception as e:
+                print(f"Recorder write error ({path}): {e}")
+
+    def _append(self, path, data):
+        f = self._files[path]
+        with trace.span("record write", bytes=len(data)):
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def recorder_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _Writer()
+        return _writer
+
+def flush_recordings(timeout=5.0):
+    """Wait for every closed run to be on disk, call before exiting."""
+    if _writer is not None:
+        _writer.flush(timeout)
+
+# =========================
+# RUN RECORDER
+# One per stirrer. Fed from the ingestion path (transport loop thread):
+# rows go into preallocated column buffers and full chunks are handed to
+# the background writer. One file per run; a run starts with START or the
+# first sample streamed outside a run, and ends with STOP, a STOPPED
+# message or RUN_IDLE_S without samples.
+# =========================
+class RunRecorder:
+    def __init__(self, device_id, runs_dir=RUNS_DIR, on_closed=None, quality=None):
+        """
+        Parameters:
+            - device_id (str) : Stable ID of the stirrer, names the run files
+            - runs_dir (str) : Root directory of the recordings
+            - on_closed (callable | None) : Called with the path of each
+              finished run file, on the writer thread
+            - quality (ControlQuality | None) : Fed with each run's samples,
+              reset per run, its summary is saved in the run's footer
+        """
+        self.device_id = device_id
+        self.runs_dir = runs_dir
+        self.on_closed = on_closed
+        self.quality = quality
+        self.path = None
+        self.rows = 0
+
+        self._lock = threading.Lock()
+        self._writer = recorder_writer()
+        self._buffers = {name: np.empty(CHUNK_ROWS, dtype) for name, dtype in COLUMNS}
+        self._n = 0
+        self._chunk_t0 = None
+        self._time_left = TIME_LEFT_UNKNOWN
+        self._last_sample = None
+        self._ended = None
+        self._meta = None
+        self._run_ids = set()   # issued by this recorder, their files may not exist yet
+
+    @property
+    def run_id(self):
+        """ID of the run being recorded, None between runs."""
+        with self._lock:
+            return self._meta["run_id"] if self.path is not None else None
+
+    # ================= RUN BOUNDARIES =================
+    def start_run(self, **meta):
+        """Close the current run (if any) and start a new file."""
+        with self._lock:
+            self._end_locked()
+            self._start_locked(meta)
+
+    def end_run(self):
+        with self._lock:
+            self._end_locked()
+
+    def check_idle(self):
+        """Call periodically: ends a run whose stream stopped."""
+        with self._lock:
+            if (self.path is not None and self._last_sample is not None
+                    and time.monotonic() - self._last_sample > RUN_IDLE_S):
+                self._end_locked()
+
+    def _start_locked(self, meta):
+        started = time.time()
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.device_id)
+        # Millisecond stamp; runs started within the same millisecond (or a
+        # file left by another recorder) get a suffix instead of overwriting
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(started)) + f"{int(started * 1000) % 1000:03d}"
+        run_id = f"{stamp}_{safe_id}"
+        n = 1
+        while run_id in self._run_ids or os.path.exists(self._run_path(safe_id, run_id)):
+            n += 1
+            run_id = f"{stamp}-{n}_{safe_id}"
+        self._run_ids.add(run_id)
+        self.path = self._run_path(safe_id, run_id)
+        self._meta = {"run_id": run_id, "device_id": self.device_id,
+                      "started": started, "columns": COLUMNS, **meta}
+        header = json.dumps(self._meta).encode()
+        self._writer.open(self.path, MAGIC + struct.pack("<HI", VERSION, len(header)) + header)
+        self.rows = 0
+        self._n = 0
+        self._chunk_t0 = time.monotonic()
+        self._last_sample = None
+        if self.quality is not None:
+            self.quality.reset()
+        print(f"Recording run to {self.path}")
+
+    def _run_path(self, safe_id, run_id):
+        return os.path.join(self.runs_dir, safe_id, run_id + ".vwr")
+
+    def _end_locked(self):
+        if self.path is None:
+            return
+        self._flush_chunk()
+        summary = {"rows": self.rows, "stopped": time.time(),
+                   "dropped_chunks": self._writer.dropped_chunks}
+        if self.quality is not None:
+            summary["quality"] = self.quality.summary()
+        summary = json.dumps(summary).encode()
+        self._writer.close(self.path, FOOTER_TAG + struct.pack("<I", len(summary)) + summary,
+                           self.on_closed)
+        print(f"Run recorded: {self.rows} samples in {self.path}")
+        self.path = None
+        self._ended = time.monotonic()
+
+    # ================= INGESTION =================
+    def record(self, events, t0):
+        """
+        Parameters:
+            - events (list) : Parsed telemetry events, in arrival order
+            - t0 (float) : Epoch time of the events' t = 0 (StirrerUI.start_time)
+        """
+        with self._lock:
+            run_samples = []  # for the quality metrics, per run
+            for event in events:
+                if isinstance(event, Sample):
+                    if self.path is None:
+                        if (self._ended is not None
+                                and time.monotonic() - self._ended < STOP_GRACE_S):
+                            continue
+                        self._start_locked({})
+                    self._add_row(event, t0)
+                    run_samples.append(event)
+                elif isinstance(event, TimeLeft):
+                    self._time_left = TIME_LEFT_INF if event.ms is None else event.ms
+                elif isinstance(event, Message) and event.text == "STOPPED":
+                    self._update_quality(run_samples)
+                    run_samples = []
+                    self._end_locked()
+            self._update_quality(run_samples)
+
+            if self._n and time.monotonic() - self._chunk_t0 >= CHUNK_MAX_S:
+                self._flush_chunk()
+
+    def _update_quality(self, samples):
+        if self.quality is not None and samples:
+            self.quality.update(samples)
+
+    def _add_row(self, sample, t0):
+        i = self._n
+        b = self._buffers
+        b["host_t"][i] = t0 + sample.t
+        b["device_t"][i] = np.nan if sample.device_t is None else t0 + sample.device_t
+        b["setpoint"][i] = sample.setpoint
+        b["rpm"][i] = sample.rpm
+        b["pwm"][i] = sample.pwm
+        b["time_left_ms"][i] = self._time_left
+        self._n += 1
+        self.rows += 1
+        self._last_sample = time.monotonic()
+        if self._n == CHUNK_ROWS:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self._n:
+            self._writer.write_chunk(
+                self.path, {name: b[:self._n].copy() for name, b in self._buffers.items()})
+        self._n = 0
+        self._chunk_t0 = time.monotonic()
@@ -4,10 +4,20 @@ import serial
 import serial.tools.list_ports
 import tkinter as tk
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import ttk
 
-from UI.serial.stirrer_tab import StirrerUI
+from UI import trace
+from UI.assay_tab import AssayUI
 from UI.counter_tab import CounterUI
+from UI.device_cache import load_cached_device, save_cached_device
+from UI.emulator import SERIAL_SKETCH, EmulatedSerial, PtySerialDevice, StirrerEmulator
+from UI.perf_hud import PerfHUD
+from UI.protocol import DEFAULT_BAUD, FAST_BAUD, FAST_TELEMETRY_MS
+from UI.serial.transport import SerialTransport
+from UI.recorder import flush_recordings
+from UI.stirrer_tab import add_stirrer_tabs
+from UI.transport import stop_transport_loop
 
 # =========================
 # ARGUMENT PARSING
@@ -18,7 +28,34 @@ def parse_args():
     parser.add_argument(
         "--simulate-device",
         action="store_true",
-        help="Run the device in simulation mode"
+        help="Run emulated stirrers (on virtual serial ports) instead of the hardware"
+    )
+
+    parser.add_argument(
+        "--simulate-count",
+        type=int,
+        default=1,
+        help="Number of emulated stirrers"
+    )
+
+    parser.add_argument(
+        "--simulate-rate",
+        type=float,
+        default=None,
+        help="Emulated telemetry rate in Hz (up to kHz), overriding the UI's RATE"
+    )
+
+    parser.add_argument(
+        "--scan",
+        action="store_true",
+        help="Probe every port, to pick up stirrers not seen last time"
+    )
+
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        default=None,
+        help="Record a timing trace, written to FILE (Chrome trace JSON) on exit"
     )
 
     return parser.parse_args()
@@ -27,37 +64,156 @@ def parse_args():
 # =========================
 # FIND SERIAL DEVICE
 # =========================
-def find_serial_device(ports, baud=9600, simulation=False):
+RESET_DELAY_S = 1.0     # the Arduino resets when its port is opened
+WHO_TIMEOUT_S = 1.0
 
-     # Skip serial discovery if simulation mode is enabled
-    if simulation:
-        print("Simulation mode enabled. Skipping serial device scan.\nLaunching UI...")
-        return "SIMULATION"
+def device_id(p):
+    """Stable ID of a port's device: USB serial number, else VID:PID@port, else port name."""
+    if p.serial_number:
+        return p.serial_number
+    if p.vid is not None:
+        return f"{p.vid:04X}:{p.pid:04X}@{p.device}"
+    return p.device
 
-    print("Identifying Arduino...")
+def _port_info(p):
+    return {"id": device_id(p), "port": p.device, "vid": p.vid, "pid": p.pid,
+            "serial_number": p.serial_number}
 
-    for p in ports:
-        try:
-            print(f"Testing {p.device}...")
+def _cached_ids():
+    """IDs of the stirrers found last time, in tab order."""
+    cached = load_cached_device("serial") or {}
+    devices = cached.get("devices") or [cached]  # single-device cache format
+    return [d["id"] for d in devices if d.get("id")]
 
-            with serial.Serial(p.device, baud, timeout=0.5) as ser:
-                time.sleep(1)  # allow reset
-                ser.write(b"WHO\n")
-                time.sleep(0.1)
+def probe_port(p, baud):
+    """
+    Open one port and ask who is there.
 
-                t0 = time.time()
-                while time.time() - t0 < 1:
-                    line = ser.readline().decode(errors="ignore").strip()
-                    if line == "DEVICE:STIRRER":
-                        print(f"Found Arduino on {p.device}.\nLaunching UI...")
-                        return p.device
+    Returns:
+        - ser (serial.Serial | None) : The open port if it answered DEVICE:STIRRER
+    """
+    try:
+        ser = serial.Serial(p.device, baud, timeout=0.1)
+    except Exception as e:
+        print(f"Error on {p.device}: {e}")
+        return None
 
-        except Exception as e:
-            print(f"Error on {p.device}: {e}")
+    try:
+        time.sleep(RESET_DELAY_S)  # allow reset
+        ser.write(b"WHO\n")
 
-    print("No Arduino found.")
+        t0 = time.time()
+        while time.time() - t0 < WHO_TIMEOUT_S:
+            line = ser.readline().decode(errors="ignore").strip()
+            if line == "DEVICE:STIRRER":
+                return ser
+    except Exception as e:
+        print(f"Error on {p.device}: {e}")
+
+    ser.close()
     return None
 
+def probe_ports(ports, baud):
+    """Probe all ports concurrently, return [(port, ser)] of every one that answers."""
+    if not ports:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        futures = {pool.submit(probe_port, p, baud): p for p in ports}
+        return [(futures[f], f.result()) for f in as_completed(futures)
+                if f.result() is not None]
+
+def find_serial_devices(ports, baud=DEFAULT_BAUD, full_scan=False):
+    """
+    Find the stirrers among the serial ports. The ports of the stirrers
+    seen last time are probed first, alone: if they all answer, the other
+    ports are left alone (and not reset). Otherwise, or with full_scan,
+    the other ports are probed too, concurrently.
+    Stirrers seen last time keep their order, new ones follow.
+
+    Returns:
+        - devices (list) : (device_id, serial.Serial) of each open,
+          identified port, empty if nothing answered
+    """
+    order = _cached_ids()
+    first = [p for p in ports if device_id(p) in order]
+    others = [p for p in ports if p not in first]
+
+    found = []
+    if first:
+        print(f"Identifying the last Arduinos on {', '.join(p.device for p in first)}...")
+        found = probe_ports(first, baud)
+    if full_scan or len(found) < len(order):
+        if others:
+            print(f"Identifying Arduinos on {', '.join(p.device for p in others)}...")
+        found += probe_ports(others, baud)
+    if not found:
+        print("No Arduino found.")
+        return []
+
+    found.sort(key=lambda f: (order.index(device_id(f[0])) if device_id(f[0]) in order
+                              else len(order), f[0].device))
+    for p, _ in found:
+        print(f"Found Arduino {device_id(p)} on {p.device}.")
+    print("Launching UI...")
+    save_cached_device("serial", {"devices": [_port_info(p) for p, _ in found]})
+    return [(device_id(p), ser) for p, ser in found]
+
+# =========================
+# EMULATED DEVICES
+# =========================
+def open_emulated_devices(count=1, telemetry_hz=None):
+    """
+    Start emulated stirrers and open them like real ones: on a virtual
+    serial port where the OS has pseudo-terminals, in-process otherwise.
+
+    Returns:
+        - devices (list) : (device_id, serial port) of each emulated stirrer
+    """
+    devices = []
+    for i in range(count):
+        emulator = StirrerEmulator(SERIAL_SKETCH, telemetry_hz=telemetry_hz)
+        try:
+            ser = serial.Serial(PtySerialDevice(emulator).port, DEFAULT_BAUD, timeout=0.1)
+        except (ImportError, OSError, serial.SerialException):
+            ser = EmulatedSerial(emulator, DEFAULT_BAUD, port=f"EMULATOR-{i + 1}")
+        print(f"Emulated stirrer {i + 1} on {ser.port}.")
+        devices.append((f"EMULATOR-{i + 1}", ser))
+    print("Launching UI...")
+    return devices
+
+# =========================
+# LINK UPGRADE
+# =========================
+def upgrade_link(ser, baud=FAST_BAUD, telemetry_ms=FAST_TELEMETRY_MS):
+    """
+    Negotiate a faster baud rate and binary telemetry with the sketch.
+    Sketches without BAUD support never answer, and the link stays at
+    the default baud rate with ASCII telemetry.
+
+    Returns:
+        - upgraded (bool) : True if the device switched
+    """
+    ser.reset_input_buffer()
+    ser.write(f"BAUD {baud}\n".encode())
+
+    t0 = time.time()
+    while time.time() - t0 < 1:
+        line = ser.readline().decode(errors="ignore").strip()
+        if line == f"BAUD_OK {baud}":
+            break
+    else:
+        print(f"Device did not accept {baud} baud, keeping {ser.baudrate} baud ASCII telemetry.")
+        return False
+
+    ser.baudrate = baud
+    time.sleep(0.05)  # let the device reopen its port
+    ser.reset_input_buffer()
+    ser.write(b"BIN ON\n")
+    ser.write(f"RATE {telemetry_ms}\n".encode())
+    print(f"Link upgraded to {baud} baud, binary telemetry every {telemetry_ms} ms.")
+    return True
+
 # =========================
 # MAIN
 # =========================
@@ -65,18 +221,25 @@ def main():
 
     # Parse command-line arguments
     args = parse_args()
+    if args.trace:
+        trace.enable()
 
-    # Set global simulation flag
-    global SIMULATION
-    SIMULATION = args.simulate_device
-
-    # Set serial connection
-    BAUD = 9600
-    ports = list(serial.tools.list_ports.comports())
-    port = find_serial_device(ports, BAUD, SIMULATION)
-    if not SIMULATION and port is None:
+    # Set serial connections
+    # The identified ports stay open (short read timeout) so the Arduinos
+    # are not reset a second time
+    if args.simulate_device:
+        found = open_emulated_devices(args.simulate_count, args.simulate_rate)
+    else:
+        ports = list(serial.tools.list_ports.comports())
+        found = find_serial_devices(ports, DEFAULT_BAUD, full_scan=args.scan)
+    if not found:
         raise RuntimeError("Could not identify Arduino")
-    ser = None if SIMULATION else serial.Serial(port, BAUD, timeout=2)
+    with ThreadPoolExecutor(max_workers=len(found)) as pool:
+        list(pool.map(upgrade_link, [ser for _, ser in found]))
+    devices = []
+    for dev_id, ser in found:
+        ser.write_timeout = 1.0  # a stalled link fails the write instead of hanging
+        devices.append((dev_id, SerialTransport(ser)))
 
     # Initialize UI
     root = tk.Tk()
@@ -87,20 +250,32 @@ def main():
     notebook = ttk.Notebook(root)
     notebook.pack(fill="both", expand=True)
 
-    # Create stirrer tab
-    stirrer_frame = ttk.Frame(notebook)
-    notebook.add(stirrer_frame, text="Stirrer")
-    stirrer_ui = StirrerUI(stirrer_frame, ser, simulation_mode=SIMULATION)
+    # Create one tab per stirrer
+    stirrer_uis = add_stirrer_tabs(notebook, devices)
 
     # Create counter tab
     counter_frame = ttk.Frame(notebook)
     notebook.add(counter_frame, text="Counter")
     counter_ui = CounterUI(counter_frame)
 
+    # Create assay queue tab: timed runs on the stirrers, then the count
+    assay_frame = ttk.Frame(notebook)
+    notebook.add(assay_frame, text="Assays")
+    assay_ui = AssayUI(assay_frame, stirrer_uis, counter_ui)
+
+    # Performance overlay, toggled with F3
+    PerfHUD(root, stirrer_uis, counter_ui)
+
     # Handle window close event
     def on_close():
-        stirrer_ui.on_close()
+        for stirrer_ui in stirrer_uis:
+            stirrer_ui.on_close()
         counter_ui.on_close()
+        assay_ui.on_close()
+        stop_transport_loop()
+        flush_recordings()
+        if args.trace:
+            trace.export(args.trace)
         root.destroy()
         print("\nApplication closed with success.")
     root.protocol("WM_DELETE_WINDOW", on_close)
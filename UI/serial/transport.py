@@ -0,0 +1,74 @@
+import asyncio
+
+from UI.transport import Transport
+
+# =========================
+# CONFIG
+# =========================
+POLL_S = 0.005   # read period when the port has no selectable file descriptor
+
+# =========================
+# SERIAL TRANSPORT
+# Uses the port opened (and upgraded) by discovery. Reads are driven by
+# the loop: a reader callback on the port's file descriptor where the
+# platform supports it, otherwise a short non-blocking poll. Writes run
+# in the loop's executor so a stalled USB link never blocks other devices.
+# The Arduino resets when its port is reopened, so a lost link is
+# reported rather than reconnected.
+# =========================
+class SerialTransport(Transport):
+    name = "USB"
+    reconnect = False
+
+    def __init__(self, ser, **kwargs):
+        super().__init__(ser.port, **kwargs)
+        self.ser = ser
+
+    async def _open(self):
+        if not self.ser.is_open:
+            raise RuntimeError(f"{self.ser.port} is closed")
+
+    def _fileno(self):
+        try:
+            return self.ser.fileno()
+        except (AttributeError, OSError):
+            return None
+
+    def _read_waiting(self):
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if data:
+            self._deliver(data)
+
+    async def _receive(self):
+        loop = asyncio.get_running_loop()
+        fd = self._fileno()
+        if fd is not None:
+            readable = asyncio.Event()
+            try:
+                loop.add_reader(fd, readable.set)
+            except NotImplementedError:
+                fd = None  # e.g. the Windows proactor loop
+
+        if fd is None:
+            while True:
+                if self.ser.in_waiting:
+                    self._read_waiting()
+                await asyncio.sleep(POLL_S)
+
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                self._read_waiting()
+        finally:
+            loop.remove_reader(fd)
+
+    async def _write(self, data):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.ser.write, data)
+
+    async def _close(self):
+        try:
+            self.ser.close()
+        except Exception:
+            pass
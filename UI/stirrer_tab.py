@@ -0,0 +1,530 @@
+import math
+import tkinter as tk
+import time
+import matplotlib
+matplotlib.use("TkAgg")
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from tkinter import filedialog, ttk
+
+from UI import trace
+from UI.calibration import load_calibration
+from UI.device_session import DeviceSession
+from UI.history import MultiResolutionHistory
+from UI.latency import LatencyTracker
+from UI.plot_renderer import BlitRenderer, RenderScheduler
+from UI.profile import Profile, encode_profile
+from UI.telemetry import (Message, Sample, Status, TimeLeft, TelemetryQueue,
+                          format_time_left, rebase_events)
+
+# =========================
+# CONFIG
+# =========================
+RPM_MIN = 1000
+RPM_MAX = 7500
+SHEAR_STEP = 50          # shear slider resolution, its limits come from the calibration
+
+PLOT_WINDOW_SEC = 10
+PLOT_REFRESH_MS = 100
+PLOT_SCROLL_SEC = 2      # time axis scrolls by whole steps
+PLOT_ZOOM_RPM = 200      # half-height of the zoomed band, in RPM...
+PLOT_ZOOM_SHEAR = 100    # ...or in s⁻¹ in shear mode
+PLOT_MAX_POINTS = 1000   # buckets drawn per line, whatever the run length
+
+# =========================
+# UI
+# One tab per stirrer, whatever the link: the transport (serial or BLE,
+# see UI/transport.py) delivers raw bytes on the shared transport loop,
+# they are parsed and recorded there by the tab's DeviceSession and
+# handed to the Tk loop as telemetry events.
+# =========================
+class StirrerUI:
+    def __init__(self, parent, transport=None, simulation_mode=False, scheduler=None,
+                 device_id=None, record=True, calibration=None):
+        """
+        Parameters:
+            - parent (tk widget) : Frame holding the tab
+            - transport (Transport | None) : Link to the stirrer, None for UI-only simulation
+            - simulation_mode (bool) : Ignore the transport
+            - scheduler (RenderScheduler | None) : Shared by all tabs of a
+              multi-stirrer window, a private one is created if None
+            - device_id (str | None) : Stable ID of the stirrer, the transport address if None
+            - record (bool) : Record every run to disk (see UI/recorder.py)
+            - calibration (Calibration | None) : RPM <-> shear conversion,
+              the default calibration file is loaded if None
+        """
+        # Initialize tab UI
+        self.root = parent
+        self.transport = None if simulation_mode else transport
+        self.simulation_mode = simulation_mode or transport is None
+        self.device_id = device_id or (transport.address if transport else "SIMULATION")
+
+        # RPM <-> shear calibration, the shear slider stays within the RPM limits
+        self.calibration = calibration or load_calibration()
+        self.shear_min = math.ceil(self.calibration.rpm_to_shear(RPM_MIN) / SHEAR_STEP) * SHEAR_STEP
+        self.shear_max = math.floor(self.calibration.rpm_to_shear(RPM_MAX) / SHEAR_STEP) * SHEAR_STEP
+
+        # Parsing, run recording, control-quality metrics and the applied
+        # settings, fed on the transport loop
+        self.session = DeviceSession(self.device_id, record=self.transport is not None and record,
+                                     calibration=self.calibration)
+        self.start_time = self.session.start_time
+        self.parser = self.session.parser
+        self.quality = self.session.quality
+
+        # Initialize data buffers and state
+        self.history = MultiResolutionHistory()
+        self.telemetry = TelemetryQueue()
+        self.latency = LatencyTracker(transport.name if self.transport else "Simulated")
+
+        # Counters (read by the performance HUD)
+        self.ingested = 0          # events received, parsed here or by the daemon
+        self.max_queue_depth = 0   # deepest telemetry queue at a drain
+        self.frames_drawn = 0
+
+        # Control state
+        self.target_var = tk.IntVar(value=RPM_MIN)
+        self.control_mode = tk.StringVar(value="RPM")
+        self.previous_mode = "RPM"
+        self.last_rpm_value = RPM_MIN
+        self.last_shear_value = self.shear_min
+        self.profile_segments = 0
+        self.run_listeners = []       # callables(event) on the Tk loop, for TimeLeft and STOPPED
+
+        # Status variables
+        self.shear_text = tk.StringVar(value="Mean shear rate: ---")
+        self.rpm_text = tk.StringVar(value="Rotation speed: ---")
+        self.pwm_text = tk.StringVar(value="PWM: ---\n")
+        self.runtime_var = tk.IntVar(value=0)
+        self.time_left_text = tk.StringVar(value="Time left: ∞")
+        self.profile_text = tk.StringVar(value="Profile: none")
+        self.status_text = tk.StringVar(value="SIMULATION (UI only)")
+        self.link_text = tk.StringVar(value="")
+        self.latency_text = tk.StringVar(value=self.latency.summary())
+        self.quality_text = tk.StringVar(value=self.quality.format())
+        self._transport_sent = 0
+
+        # Build the UI
+        self._build_ui()
+        self.update_slider_mode()
+        self.scheduler = scheduler or RenderScheduler(self.root, PLOT_REFRESH_MS)
+        self.scheduler.add(self)
+
+        # Connect (and keep the link up) on the transport loop
+        if self.transport is not None:
+            self.status_text.set(f"Connecting to {self.transport.address}...")
+            self.transport.on_data = self._on_data_received
+            self.transport.on_events = self._on_remote_events
+            self.transport.on_status = lambda text: self.telemetry.put(Status(text))
+            self.transport.restore_commands = self.session.restore_commands
+            self.transport.start()
+
+    # ================= TRANSPORT CALLBACKS =================
+    def _on_data_received(self, data):
+        """
+        Transport loop thread: parsed events are queued for the Tk loop;
+        never touch tkinter from here.
+        """
+        self._queue_events(self.session.feed(data))
+
+    def _on_remote_events(self, events):
+        """Transport loop thread: events parsed by the daemon, with epoch times."""
+        events = rebase_events(events, self.start_time)
+        self.session.ingest(events)
+        self._queue_events(events)
+
+    def _queue_events(self, events):
+        if events:
+            self.ingested += len(events)
+            self.telemetry.put_many(events)
+
+    # ================= UI =================
+    def _build_ui(self):
+        # Initialize left side bar
+        left = tk.Frame(self.root)
+        left.pack(side=tk.LEFT, padx=10, pady=10)
+
+        # Rotation speed control
+        tk.Label(left, text="Control Mode",
+                 font=("Helvetica", 16)).pack(pady=5)
+        tk.Radiobutton(left, text="Rotation speed (RPM)",
+                       variable=self.control_mode, value="RPM",
+                       command=self.update_slider_mode).pack(anchor="w")
+        tk.Radiobutton(left, text="Mean shear rate (s⁻¹)",
+                       variable=self.control_mode, value="SHEAR",
+                       command=self.update_slider_mode).pack(anchor="w")
+        self.rpm_slider = tk.Scale(left, orient=tk.HORIZONTAL,
+                                   length=220,
+                                   variable=self.target_var)
+        self.rpm_slider.pack(pady=10)
+
+        # Action buttons
+        tk.Button(left, text="Apply Speed/Shear", width=12,
+                  command=self.apply_target).pack(pady=2)
+        tk.Button(left, text="START", width=12,
+                  command=self.start_motor).pack(pady=2)
+        tk.Button(left, text="STOP", width=12,
+                  command=self.stop_motor).pack(pady=2)
+
+        # Runtime control
+        tk.Label(left, text="Run time (seconds)",
+                 font=("Helvetica", 12)).pack(pady=(10, 2))
+        tk.Label(left, text="0 = run forever",
+                 font=("Helvetica", 9)).pack()
+        tk.Entry(left, textvariable=self.runtime_var,
+                 width=10, justify="center").pack()
+        tk.Button(left, text="Apply Time", width=12,
+                  command=self.apply_runtime).pack(pady=5)
+        tk.Label(left, textvariable=self.time_left_text,
+                 font=("Helvetica", 12, "bold")).pack(pady=5)
+
+        # Profile run by the device on START
+        profile_buttons = tk.Frame(left)
+        profile_buttons.pack(pady=(5, 0))
+        tk.Button(profile_buttons, text="Load Profile", width=10,
+                  command=self.load_profile).pack(side=tk.LEFT, padx=2)
+        tk.Button(profile_buttons, text="Clear", width=5,
+                  command=self.clear_profile).pack(side=tk.LEFT, padx=2)
+        tk.Label(left, textvariable=self.profile_text,
+                 font=("Helvetica", 9)).pack()
+
+        # Status display
+        tk.Label(left, textvariable=self.rpm_text,
+                 font=("Helvetica", 12)).pack(pady=5)
+        tk.Label(left, textvariable=self.shear_text,
+                 font=("Helvetica", 12)).pack()
+        tk.Label(left, textvariable=self.pwm_text,
+                 font=("Helvetica", 12)).pack()
+        tk.Label(left, textvariable=self.quality_text,
+                 font=("Helvetica", 9)).pack()
+        
+        # Connection status
+        tk.Label(left, textvariable=self.status_text,
+                 font=("Helvetica", 9)).pack(pady=(10, 0))
+        tk.Label(left, textvariable=self.link_text,
+                 font=("Helvetica", 9)).pack()
+        tk.Label(left, textvariable=self.latency_text,
+                 font=("Helvetica", 9)).pack()
+
+        # Initialize right side plots
+        self.fig = Figure(figsize=(6.5, 6.5), dpi=100)
+        self.ax_full = self.fig.add_subplot(211)
+        self.ax_zoom = self.fig.add_subplot(212)
+        self.fig.subplots_adjust(hspace=0.35)
+
+        self.ax_full.set_title("RPM vs Time (Full Scale)")
+        self.ax_full.set_xlabel("Time (s)")
+        self.ax_full.set_ylabel("RPM")
+        self.ax_full.set_ylim(RPM_MIN, RPM_MAX)
+        self.ax_full.grid(True)
+
+        self.ax_zoom.set_title("RPM vs Time (Zoomed)")
+        self.ax_zoom.set_xlabel("Time (s)")
+        self.ax_zoom.set_ylabel("RPM")
+        self.ax_zoom.grid(True)
+
+        self.line_full, = self.ax_full.plot([], [], lw=2)
+        self.line_zoom, = self.ax_zoom.plot([], [], lw=2)
+
+        # Graph widget
+        canvas = FigureCanvasTkAgg(self.fig, master=self.root)
+        canvas.get_tk_widget().pack(side=tk.RIGHT,
+                                    fill=tk.BOTH, expand=True,
+                                    padx=10, pady=10)
+        self.canvas = canvas
+        self.renderer = BlitRenderer(canvas,
+                                     [self.ax_full, self.ax_zoom],
+                                     [self.line_full, self.line_zoom])
+        self._plotted_time = None
+
+    # ================= LOGIC =================
+    def update_slider_mode(self):
+        if self.previous_mode == "RPM":
+            self.last_rpm_value = self.target_var.get()
+            self.last_shear_value = self.calibration.rpm_to_shear(self.last_rpm_value)
+        else:
+            self.last_shear_value = self.target_var.get()
+            self.last_rpm_value = self.calibration.shear_to_rpm(self.last_shear_value)
+
+        if self.control_mode.get() == "RPM":
+            self.rpm_slider.config(from_=RPM_MIN, to=RPM_MAX,
+                                   resolution=100,
+                                   tickinterval=1500,
+                                   label="Rotation speed (RPM)")
+            self.target_var.set(int(self.last_rpm_value))
+        else:
+            self.rpm_slider.config(from_=self.shear_min, to=self.shear_max,
+                                   resolution=SHEAR_STEP,
+                                   tickinterval=750,
+                                   label="Mean shear rate (s⁻¹)")
+            self.target_var.set(int(self.last_shear_value))
+
+        self.previous_mode = self.control_mode.get()
+        self._set_plot_units()
+
+    def _set_plot_units(self):
+        """Plot RPM or shear rate, following the control mode."""
+        if self.control_mode.get() == "RPM":
+            quantity, unit = "RPM", "RPM"
+            y_min, y_max = RPM_MIN, RPM_MAX
+        else:
+            quantity, unit = "Shear rate", "Shear rate (s⁻¹)"
+            y_min, y_max = self.shear_min, self.shear_max
+        self.ax_full.set_title(f"{quantity} vs Time (Full Scale)")
+        self.ax_full.set_ylabel(unit)
+        self.ax_full.set_ylim(y_min, y_max)
+        self.ax_zoom.set_title(f"{quantity} vs Time (Zoomed)")
+        self.ax_zoom.set_ylabel(unit)
+        self.ax_zoom.set_ylim(y_min, y_max)  # re-centred on the next sample
+
+        # Redraw the lines in the new unit; the limit change redraws the axes
+        self._plotted_time = None
+        self.renderer.mark_dirty()
+
+    def _plot_values(self, rpms):
+        """Whole plotted buffer in the current unit, converted in one call."""
+        if self.control_mode.get() == "RPM":
+            return rpms
+        return self.calibration.rpm_to_shear(rpms)
+
+    def _send(self, text, **meta):
+        """
+        Parameters:
+            - meta : Extra metadata saved with a run started by START (see DeviceSession.command)
+        """
+        if self.transport is not None:
+            self.session.command(text, **meta)
+            self.latency.command_sent(text, time.time() - self.start_time)
+            trace.instant("command", text=text.strip())
+            self.transport.write(text)
+
+    def apply_target(self):
+        if self.simulation_mode:
+            return
+        if self.control_mode.get() == "RPM":
+            rpm = int(self.target_var.get())
+        else:
+            rpm = int(self.calibration.shear_to_rpm(self.target_var.get()))
+        rpm = max(RPM_MIN, min(RPM_MAX, rpm))
+        self._send(f"S {rpm}\n")
+
+    def start_motor(self, **meta):
+        """
+        Parameters:
+            - meta : Extra metadata saved with the recorded run (e.g. the assay sample)
+        """
+        self._send("STREAM ON\n")
+        self._send("START\n", **meta)
+
+    def start_timed_run(self, rpm, runtime_s, **meta):
+        """
+        Run at rpm for runtime_s seconds, the device stops the motor: as
+        Apply Speed/Shear, Apply Time then START.
+
+        Returns:
+            - run_id (str | None) : ID of the recorded run, None if this tab does not record
+        """
+        if self.session.applied_profile is not None:
+            self.clear_profile()  # START would run the profile instead
+        runtime_s = int(runtime_s)
+        self.runtime_var.set(runtime_s)
+        self._send(f"S {max(RPM_MIN, min(RPM_MAX, int(rpm)))}\n")
+        self._send(f"T {runtime_s}\n")
+        self.start_motor(**meta)
+        return self.session.run_id
+
+    def stop_motor(self):
+        self._send("STOP\n")
+
+    def apply_runtime(self):
+        self._send(f"T {self.runtime_var.get()}\n")
+
+    def load_profile(self):
+        """Upload a profile file; the device runs it on the next START."""
+        path = filedialog.askopenfilename(
+            title="Select a stirrer profile",
+            filetypes=(("Profiles", "*.json"), ("All files", "*.*"))
+        )
+        if not path:
+            return
+        try:
+            profile = Profile.load(path)
+            steps = profile.to_rpm(self.calibration)
+            command = encode_profile(steps)
+        except (OSError, ValueError, KeyError) as e:
+            self.profile_text.set(f"Profile error: {e}")
+            return
+        self.profile_segments = len(steps)
+        self.profile_text.set(f"Profile: {profile.name} ({profile.duration_s:.0f} s), uploading...")
+        self._send(command)
+
+    def clear_profile(self):
+        self.profile_segments = 0
+        self.profile_text.set("Profile: none")
+        self._send("PROFILE CLEAR\n")
+
+    def _on_profile_message(self, text):
+        if text == "PROFILE_ERR":
+            self.profile_text.set("Profile rejected by the device")  # dropped by the session
+        elif text.startswith("PROFILE_OK") and self.session.applied_profile is not None:
+            self.profile_text.set(self.profile_text.get().replace("uploading...", "ready"))
+        elif text == "PROFILE,DONE":
+            self.profile_text.set("Profile: done")
+        elif text.startswith("PROFILE,"):
+            segment = int(text.split(",")[1]) + 1
+            self.profile_text.set(f"Profile: segment {segment}/{self.profile_segments}")
+
+    def _drain_telemetry(self):
+        """
+        Apply the events queued by the transport. Runs on the Tk loop
+        once per frame; labels only get the latest values.
+        """
+        last_sample = None
+        last_time_left = None
+        last_status = None
+        n_latency = self.latency.histogram.total
+        self.max_queue_depth = max(self.max_queue_depth, len(self.telemetry))
+        for event in self.telemetry.drain():
+            self.latency.observe(event)
+            if isinstance(event, Sample):
+                # Binary frames carry the exact device time
+                t = event.t if event.device_t is None else event.device_t
+                self.history.append(t, event.rpm)
+                last_sample = event
+            elif isinstance(event, TimeLeft):
+                last_time_left = event
+                for listener in self.run_listeners:
+                    listener(event)
+            elif isinstance(event, Status):
+                last_status = event
+            elif isinstance(event, Message) and event.text == "STOPPED":
+                for listener in self.run_listeners:
+                    listener(event)
+            elif isinstance(event, Message) and event.text.startswith("PID"):
+                print("\n=== NEW PID GAINS ===")
+                print(event.text)
+                print("=====================\n")
+            elif isinstance(event, Message) and event.text.startswith("PROFILE"):
+                self._on_profile_message(event.text)
+
+        if last_sample is not None:
+            rpm = last_sample.rpm
+            self.rpm_text.set(f"Rotation speed: {rpm:.0f} RPM")
+            self.shear_text.set(f"Mean shear rate: {self.calibration.rpm_to_shear(rpm):.1f} s⁻¹")
+            self.pwm_text.set(f"PWM: {last_sample.pwm:.0f}\n")
+            self.quality_text.set(self.quality.format())
+        if last_time_left is not None:
+            self.time_left_text.set(format_time_left(last_time_left.ms))
+        if last_status is not None:
+            self.status_text.set(last_status.text)
+        if self.latency.histogram.total != n_latency:
+            self.latency_text.set(self.latency.summary())
+        self.session.check_idle()
+
+        # Write latency, refreshed only when a command went out
+        if self.transport is not None and self.transport.sent != self._transport_sent:
+            self._transport_sent = self.transport.sent
+            stats = self.transport.stats()
+            self.link_text.set(f"Write: {stats['last_latency_ms']:.1f} ms "
+                               f"(max {stats['max_latency_ms']:.1f} ms), "
+                               f"{stats['failures']} failed")
+
+    def update_plot(self):
+        """One frame, called by the render scheduler."""
+        with trace.span("drain", queued=len(self.telemetry)):
+            self._drain_telemetry()
+
+        # Only touch the artists when a new sample arrived and the tab is shown
+        t_last = self.history.last_time
+        if (t_last is not None and self.renderer.is_visible()
+                and t_last != self._plotted_time):
+
+            # Zoomed plot: last PLOT_WINDOW_SEC, the time axis scrolls by
+            # whole steps so the ticks are not redrawn on every frame
+            t_max = math.ceil(t_last / PLOT_SCROLL_SEC) * PLOT_SCROLL_SEC
+            t0 = max(0, t_max - PLOT_WINDOW_SEC)
+            times, rpms = self.history.query(t0, PLOT_MAX_POINTS)
+            self.line_zoom.set_data(times, self._plot_values(rpms))
+            self.ax_zoom.set_xlim(t0, t_max)
+
+            # Re-centre the zoomed band only when the last sample leaves its middle half
+            c = self._plot_values(self.history.last_value)
+            band = PLOT_ZOOM_RPM if self.control_mode.get() == "RPM" else PLOT_ZOOM_SHEAR
+            y_min, y_max = self.ax_zoom.get_ylim()
+            if abs(c - (y_min + y_max) / 2) > band / 2:
+                self.ax_zoom.set_ylim(c - band, c + band)
+
+            # Full scale plot: whole run, the time axis doubles when filled
+            times, rpms = self.history.query(None, PLOT_MAX_POINTS)
+            self.line_full.set_data(times, self._plot_values(rpms))
+            full_max = PLOT_WINDOW_SEC
+            while full_max < t_last:
+                full_max *= 2
+            self.ax_full.set_xlim(0, full_max)
+
+            self._plotted_time = t_last
+            self.renderer.mark_dirty()
+
+        with trace.span("render"):
+            drawn = self.renderer.render()
+        if drawn:
+            self.frames_drawn += 1
+
+    def on_close(self):
+        """
+        Stop the motor and disconnect. A daemon client leaves the motor to
+        the daemon. The window is destroyed by main.
+        """
+        self.scheduler.remove(self)
+        if self.transport is None:
+            return
+        if self.transport.owns_device:
+            self._send("STREAM OFF\n")
+            self._send("STOP\n")
+        self.transport.close()
+        self.session.close()
+
+        name = self.transport.name
+        stats = self.transport.stats()
+        print(f"{name} commands: {stats['sent']} sent, {stats['coalesced']} coalesced, "
+              f"{stats['dropped']} dropped, {stats['failures']} failed")
+        stats = self.parser.stats()
+        print(f"{name} telemetry: {stats['lines']} lines, "
+              f"{stats['frames']} frames ({stats['lost_frames']} lost), "
+              f"{stats['parse_errors']} parse errors, "
+              f"{stats['dropped_bytes']} dropped bytes")
+        print(f"{self.latency.summary()}, {self.latency.timeouts} unmatched")
+
+
+# =========================
+# STIRRER TABS
+# =========================
+def add_stirrer_tabs(notebook, devices, simulation_mode=False, record=True):
+    """
+    Add one tab per stirrer to the notebook, all sharing one render scheduler.
+
+    Parameters:
+        - notebook (ttk.Notebook) : Main window notebook
+        - devices (list) : (device_id, transport) pairs, in tab order
+        - simulation_mode (bool) : Add a single UI-only tab instead
+        - record (bool) : Record the runs, False when the daemon records them
+
+    Returns:
+        - uis (list) : The StirrerUI of each tab
+    """
+    if simulation_mode or not devices:
+        devices = [("SIMULATION", None)]
+        simulation_mode = True
+
+    scheduler = RenderScheduler(notebook, PLOT_REFRESH_MS)
+    calibration = load_calibration()
+    uis = []
+    for i, (device_id, transport) in enumerate(devices):
+        frame = ttk.Frame(notebook)
+        text = "Stirrer" if len(devices) == 1 else f"Stirrer {i + 1} ({device_id[-6:]})"
+        notebook.add(frame, text=text)
+        uis.append(StirrerUI(frame, transport, simulation_mode=simulation_mode,
+                             scheduler=scheduler, device_id=device_id,
+                             record=record, calibration=calibration))
+    return uis
@@ -0,0 +1,227 @@
+from collections import deque, namedtuple
+
+from UI.protocol import FRAME_LEN, SYNC, decode_telemetry
+
+# =========================
+# CONFIG
+# =========================
+MAX_LINE_BYTES = 256   # longer partial lines are discarded as garbage
+
+# =========================
+# TELEMETRY EVENTS
+# =========================
+# One "setpoint,rpm,pwm" line or binary frame. t is the host arrival time
+# (s since start); binary frames also carry the device time, mapped onto
+# the same timeline (device_t), and their sequence number.
+Sample = namedtuple("Sample", ["t", "setpoint", "rpm", "pwm", "device_t", "seq"],
+                    defaults=(None, None))
+
+# One "TIME_LEFT,<ms>" line, ms is None for "TIME_LEFT,INF", t as for Sample
+TimeLeft = namedtuple("TimeLeft", ["ms", "t"], defaults=(None,))
+
+# Connection status change reported by a transport, shown in the status label
+Status = namedtuple("Status", ["text"])
+
+# Any other device line (PID gains, STOPPED, SETPOINT,<rpm>, WHO/BAUD replies,
+# PROFILE_OK/PROFILE_ERR and PROFILE,<segment> progress)
+Message = namedtuple("Message", ["text"])
+MESSAGE_PREFIXES = ("PID", "STOPPED", "SETPOINT", "DEVICE:", "BAUD_", "PROFILE")
+
+def parse_line(line, t):
+    """
+    Parse one telemetry line sent by the stirrer sketch.
+
+    Parameters:
+        - line (str) : Stripped line, without the newline
+        - t (float) : Host arrival time of the line
+
+    Returns:
+        - event (Sample | TimeLeft | Message | None) : None for lines carrying no data (heartbeat)
+
+    Raises:
+        - ValueError : If the line is malformed
+    """
+    if line == "b":
+        return None
+
+    if line.startswith("TIME_LEFT"):
+        _, v = line.split(",")
+        return TimeLeft(None if v == "INF" else int(v), t)
+
+    if line.startswith(MESSAGE_PREFIXES):
+        return Message(line)
+
+    setpoint, rpm, pwm = line.split(",")
+    return Sample(t, float(setpoint), float(rpm), float(pwm))
+
+def rebase_events(events, t0):
+    """Events with epoch times (UI/daemon.py) moved to a timeline starting at epoch t0."""
+    rebased = []
+    for e in events:
+        if isinstance(e, Sample):
+            e = e._replace(t=e.t - t0, device_t=None if e.device_t is None else e.device_t - t0)
+        elif isinstance(e, TimeLeft) and e.t is not None:
+            e = e._replace(t=e.t - t0)
+        rebased.append(e)
+    return rebased
+
+def format_time_left(ms):
+    if ms is None:
+        return "Time left: ∞"
+    s = ms // 1000
+    return f"Time left: {s//60:02d}:{s%60:02d}"
+
+# =========================
+# CHUNKED PARSER
+# Takes raw bytes in whatever chunks the transport delivers, splits them
+# into ASCII lines and binary telemetry frames (UI/protocol.py) inside one
+# reusable buffer and parses the whole batch.
+# =========================
+class ChunkParser:
+    def __init__(self, max_line=MAX_LINE_BYTES):
+        self.max_line = max_line
+        self._buf = bytearray()
+
+        # Device clock anchoring for binary frames
+        self._device_offset = None
+        self._last_device_ms = None
+        self._last_seq = None
+
+        # Counters
+        self.lines = 0
+        self.frames = 0
+        self.parse_errors = 0
+        self.dropped_bytes = 0
+        self.lost_frames = 0
+
+    def feed(self, data, t):
+        """
+        Parse every complete line or binary frame contained in the buffered bytes.
+
+        Parameters:
+            - data (bytes) : Newly received bytes
+            - t (float) : Host arrival time of the chunk
+
+        Returns:
+            - events (list) : Parsed Sample/TimeLeft/Message events, oldest first
+        """
+        buf = self._buf
+        buf += data
+        events = []
+
+        start = 0
+        n = len(buf)
+        # Frames and lines are decoded straight from the buffer, without
+        # slicing copies; the view must be released before the buffer shrinks
+        with memoryview(buf) as view:
+            while start < n:
+                # Binary telemetry frame
+                if buf[start] == SYNC[0]:
+                    if n - start < FRAME_LEN:
+                        break
+                    try:
+                        fields = decode_telemetry(view[start:start + FRAME_LEN])
+                    except ValueError:
+                        # Not a frame after all: resync on the next byte
+                        self.parse_errors += 1
+                        self.dropped_bytes += 1
+                        start += 1
+                        continue
+                    events.append(self._frame_to_sample(fields, t))
+                    start += FRAME_LEN
+                    continue
+
+                # ASCII line, anything before a sync byte inside it is garbage
+                end = buf.find(b"\n", start)
+                sync = buf.find(SYNC[0], start, n if end < 0 else end)
+                if sync >= 0:
+                    self.dropped_bytes += sync - start
+                    start = sync
+                    continue
+                if end < 0:
+                    break
+                line_start, start = start, end + 1
+
+                try:
+                    line = str(view[line_start:end], "ascii").strip()
+                except UnicodeDecodeError:
+                    line = None
+                if line == "":
+                    continue
+                self.lines += 1
+                try:
+                    if line is None:
+                        raise ValueError("not ASCII")
+                    event = parse_line(line, t)
+                except ValueError:
+                    self.parse_errors += 1
+                    self.dropped_bytes += end + 1 - line_start
+                    continue
+                if event is not None:
+                    events.append(event)
+
+        # Drop the consumed bytes in one go, keep the partial tail
+        del buf[:start]
+        if len(buf) > self.max_line:
+            self.dropped_bytes += len(buf)
+            buf.clear()
+
+        return events
+
+    def _frame_to_sample(self, fields, t):
+        seq, t_ms, setpoint, rpm, pwm = fields
+        self.frames += 1
+
+        if self._last_seq is not None:
+            self.lost_frames += (seq - self._last_seq - 1) & 0xFFFF
+        self._last_seq = seq
+
+        # Anchor the device clock on the host timeline at the first frame,
+        # and again if the device reset (its clock went backwards)
+        if self._device_offset is None or t_ms < self._last_device_ms:
+            self._device_offset = t - t_ms / 1000
+        self._last_device_ms = t_ms
+
+        return Sample(t, float(setpoint), rpm, float(pwm),
+                      self._device_offset + t_ms / 1000, seq)
+
+    def stats(self):
+        return {
+            "lines": self.lines,
+            "frames": self.frames,
+            "parse_errors": self.parse_errors,
+            "dropped_bytes": self.dropped_bytes,
+            "lost_frames": self.lost_frames,
+        }
+
+# =========================
+# TELEMETRY QUEUE
+# Handoff from the reader threads to the Tk loop. deque.append and
+# deque.popleft are atomic, so producers never take a lock and never
+# touch Tk; the Tk loop drains everything once per frame.
+# =========================
+class TelemetryQueue:
+    def __init__(self):
+        self._events = deque()
+
+    def __len__(self):
+        return len(self._events)
+
+    def put(self, event):
+        """Called from a reader thread."""
+        self._events.append(event)
+
+    def put_many(self, events):
+        """Called from a reader thread with a parsed batch."""
+        self._events.extend(events)
+
+    def drain(self):
+        """Called from the Tk loop. Returns all pending events, oldest first."""
+        events = []
+        popleft = self._events.popleft
+        try:
+            for _ in range(len(self._events)):
+                events.append(popleft())
+        except IndexError:
+            pass
+        return events
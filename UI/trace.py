@@ -0,0 +1,173 @@
+import itertools
+import json
+import os
+import threading
+import time
+
+from collections import deque
+
+# =========================
+# CONFIG
+# =========================
+TRACE_CAPACITY = 200_000   # events kept, the oldest are overwritten
+
+# =========================
+# TRACE RECORDER
+# Opt-in span/event recorder for seeing how the Tk loop, the transport
+# loop, the recorder writer and the counting work interleave. Events go
+# into a ring buffer (deque appends are atomic, so any thread records
+# without a lock) with the recording thread's ID, and export to the
+# Chrome trace format: open the file in chrome://tracing or
+# https://ui.perfetto.dev.
+#
+# Disabled (the default), span() returns a shared no-op and the other
+# calls return at once, so the instrumentation can stay in hot paths.
+# =========================
+_events = None              # deque of events while enabled, None otherwise
+_t0_ns = 0
+_threads = {}               # thread ident -> (tid, name)
+_threads_lock = threading.Lock()
+_async_ids = itertools.count(1)
+_pid = os.getpid()
+
+def enable(capacity=TRACE_CAPACITY):
+    """Start recording (again, from an empty buffer)."""
+    global _events, _t0_ns
+    _threads.clear()
+    _t0_ns = time.perf_counter_ns()
+    _events = deque(maxlen=capacity)
+
+def disable():
+    global _events
+    _events = None
+
+def enabled():
+    return _events is not None
+
+def _now_us():
+    return (time.perf_counter_ns() - _t0_ns) / 1000
+
+def _tid():
+    ident = threading.get_ident()
+    thread = _threads.get(ident)
+    if thread is None:
+        with _threads_lock:   # first event of this thread only
+            thread = _threads[ident] = (len(_threads) + 1, threading.current_thread().name)
+    return thread[0]
+
+class _Span:
+    __slots__ = ("name", "args", "t0")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.t0 = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        events = _events
+        if events is not None:
+            t1 = _now_us()
+            events.append(("X", self.name, self.t0, t1 - self.t0, _tid(), self.args))
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def span(name, **args):
+    """
+    Time a block on the current thread: with trace.span("parse", bytes=n): ...
+    Spans of one thread must nest; use async_span across an await.
+    """
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def complete(name, start_s, duration_s, **args):
+    """Record a span timed elsewhere, start_s from time.perf_counter()."""
+    events = _events
+    if events is not None:
+        start_us = start_s * 1e6 - _t0_ns / 1000
+        events.append(("X", name, start_us, duration_s * 1e6, _tid(), args))
+
+def instant(name, **args):
+    events = _events
+    if events is not None:
+        events.append(("i", name, _now_us(), None, _tid(), args))
+
+def counter(name, **values):
+    """Counter track, e.g. trace.counter("queue", depth=12)."""
+    events = _events
+    if events is not None:
+        events.append(("C", name, _now_us(), None, _tid(), values))
+
+class async_span:
+    """
+    Span of an operation spanning awaits (a write on the transport loop),
+    shown on its own track instead of nesting with the loop's other spans.
+    """
+    __slots__ = ("name", "args", "id")
+
+    def __init__(self, name, **args):
+        self.name = name
+        self.args = args
+        self.id = None
+
+    def __enter__(self):
+        events = _events
+        if events is not None:
+            self.id = next(_async_ids)
+            events.append(("b", self.name, _now_us(), self.id, _tid(), self.args))
+        return self
+
+    def __exit__(self, *exc):
+        events = _events
+        if events is not None and self.id is not None:
+            events.append(("e", self.name, _now_us(), self.id, _tid(), {}))
+        return False
+
+# =========================
+# EXPORT
+# =========================
+def export(path):
+    """
+    Write the recorded events as a Chrome trace JSON file.
+
+    Returns:
+        - n_events (int)
+    """
+    while True:
+        try:
+            events = list(_events or ())
+            break
+        except RuntimeError:   # appended to by another thread while copying
+            pass
+    trace_events = [{"ph": "M", "name": "thread_name", "pid": _pid, "tid": tid,
+                     "args": {"name": name}} for tid, name in list(_threads.values())]
+    for ph, name, ts, extra, tid, args in events:
+        event = {"ph": ph, "name": name, "ts": round(ts, 1), "pid": _pid, "tid": tid}
+        if ph == "X":
+            event["dur"] = round(extra, 1)
+        elif ph in ("b", "e"):
+            event["cat"] = "async"
+            event["id"] = extra
+        elif ph == "i":
+            event["s"] = "t"
+        if args:
+            event["args"] = args
+        trace_events.append(event)
+
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+    print(f"Trace: {len(events)} events written to {path}")
+    return len(events)
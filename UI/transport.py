@@ -0,0 +1,324 @@
+import asyncio
+import threading
+import time
+
+from collections import deque
+
+from UI import trace
+
+# =========================
+# CONFIG
+# =========================
+RECONNECT_MIN_S = 0.5    # first retry delay, doubled up to RECONNECT_MAX_S
+RECONNECT_MAX_S = 8.0
+COMMAND_QUEUE_MAX = 32   # commands kept while the link is busy or down
+CLOSE_FLUSH_S = 1.0      # time given to queued commands on close
+
+# Commands whose newer value supersedes a queued one ("S 3000" then
+# "S 4000" only sends "S 4000"). Everything else (START, STOP, STREAM ...)
+# is always sent, in order. A setting queued after START or STOP is meant
+# for what follows it and never replaces one queued before.
+COALESCED_PREFIXES = ("S ", "T ", "KP ", "KI ", "KFF ", "FFO ", "RATE ", "PROFILE ")
+BARRIER_COMMANDS = ("START", "STOP")
+
+def coalesce_key(text):
+    if text.strip() == "PROFILE CLEAR":
+        return "PROFILE CLEAR"  # not an upload: both are kept, in order
+    for prefix in COALESCED_PREFIXES:
+        if text.startswith(prefix):
+            return prefix
+    return None
+
+def splits_queue(text, key):
+    """
+    Whether a queued command stops a later one with this key from
+    replacing those queued before it: START/STOP, or another command of
+    the same family (PROFILE CLEAR between two uploads).
+    """
+    other = coalesce_key(text)
+    return text.strip() in BARRIER_COMMANDS or (
+        other is not None and other != key and other.split()[0] == key.split()[0])
+
+# =========================
+# SHARED EVENT LOOP
+# One asyncio loop in one background thread for every device link. Each
+# connected device costs a coroutine, not a thread.
+# =========================
+_loop = None
+_thread = None
+_loop_lock = threading.Lock()
+
+def transport_loop():
+    """Return the shared loop, starting its thread on first use."""
+    global _loop, _thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, daemon=True,
+                                       name="transport-loop")
+            _thread.start()
+        return _loop
+
+def stop_transport_loop(timeout=1.0):
+    """Stop the shared loop once every transport is closed."""
+    global _loop, _thread
+    with _loop_lock:
+        if _loop is None:
+            return
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join(timeout=timeout)
+        _loop, _thread = None, None
+
+# =========================
+# TRANSPORT
+# Base class for a stirrer link. A supervisor coroutine opens the link,
+# replays the restore commands, receives until the link drops and
+# reconnects with exponential backoff (if the transport supports it).
+# A writer coroutine sends queued commands in order. Subclasses only
+# implement the I/O: _open, _receive, _write and _close.
+#
+# Callbacks run on the transport loop thread, never touch Tk from them.
+# =========================
+class Transport:
+    name = "?"          # shown in status and latency labels
+    reconnect = True    # False: report the loss and stop
+    owns_device = True  # False: one of several clients of a shared device (UI/daemon.py)
+
+    def __init__(self, address, on_data=None, on_status=None, restore_commands=None):
+        self.address = address
+        self.on_data = on_data                    # callback(bytes)
+        self.on_events = None                     # callback([event]), links delivering parsed telemetry
+        self.on_status = on_status                # callback(str)
+        self.restore_commands = restore_commands  # callable -> [str], sent first on each connection
+
+        self._loop = None
+        self._task = None
+        self._connected = False
+        self._closing = False
+
+        # Outgoing [key, text] entries, only touched on the loop thread
+        self._outbox = deque()
+        self._outbox_ready = None
+
+        # Stats
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_latency = None
+        self.max_latency = 0.0
+        self._latency_sum = 0.0
+
+    # ================= PUBLIC (any thread) =================
+    def start(self):
+        self._loop = transport_loop()
+        asyncio.run_coroutine_threadsafe(self._supervise(), self._loop)
+
+    def write(self, text):
+        """Queue a command, kept while the link is down."""
+        self._loop.call_soon_threadsafe(self._enqueue, text)
+
+    def close(self, timeout=3.0):
+        """Send what is still queued (up to CLOSE_FLUSH_S), then disconnect."""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            print(f"{self.name} close error: {e}")
+
+    def pending(self):
+        return len(self._outbox)
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "pending": len(self._outbox),
+            "last_latency_ms": None if self.last_latency is None else 1000 * self.last_latency,
+            "mean_latency_ms": 1000 * self._latency_sum / self.sent if self.sent else None,
+            "max_latency_ms": 1000 * self.max_latency,
+        }
+
+    def link_commands(self):
+        """Commands setting up the link on each connection, before restore_commands."""
+        return []
+
+    # ================= I/O (subclasses, on the loop) =================
+    async def _open(self):
+        raise NotImplementedError
+
+    async def _receive(self):
+        """Deliver incoming bytes to on_data, return or raise when the link is lost."""
+        raise NotImplementedError
+
+    async def _write(self, data):
+        raise NotImplementedError
+
+    async def _close(self):
+        pass
+
+    def _deliver(self, data):
+        """Hand received bytes to on_data (subclasses, from _receive)."""
+        if self.on_data:
+            with trace.span(f"read {self.name}", bytes=len(data)):
+                self.on_data(data)
+
+    # ================= SUPERVISOR =================
+    def _status(self, text):
+        if self.on_status:
+            self.on_status(text)
+
+    async def _supervise(self):
+        self._task = asyncio.current_task()
+        self._outbox_ready = asyncio.Event()
+        writer = asyncio.ensure_future(self._writer())
+        delay = RECONNECT_MIN_S
+        try:
+            while not self._closing:
+                try:
+                    await self._open()
+                except Exception as e:
+                    if not self.reconnect:
+                        print(f"{self.name} connection error: {e}")
+                        self._status(f"{self.name} connection failed: {e}")
+                        return
+                    print(f"{self.name} connection error: {e} (retrying in {delay:.1f} s)")
+                    self._status(f"{self.name} connection failed: {e} (retrying in {delay:.1f} s)")
+                    await asyncio.sleep(delay)
+                    delay = min(2 * delay, RECONNECT_MAX_S)
+                    continue
+
+                delay = RECONNECT_MIN_S
+                self._connected = True
+
+                # Restore stream and run state before replaying queued commands
+                commands = self.link_commands()
+                if self.restore_commands:
+                    commands += self.restore_commands()
+                for text in reversed(self._merge_queued(commands)):
+                    self._outbox.appendleft([coalesce_key(text), text])
+                self._outbox_ready.set()
+                self._status(f"{self.name} connected to {self.address}")
+
+                try:
+                    await self._receive()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if not self._closing:
+                        print(f"{self.name} read error: {e}")
+                self._connected = False
+
+                if self._closing:
+                    break
+                if not self.reconnect:
+                    self._status(f"{self.name} link lost")
+                    break
+                print(f"{self.name} link lost, reconnecting...")
+                self._status(f"{self.name} link lost, reconnecting…")
+        finally:
+            self._connected = False
+            writer.cancel()
+            try:
+                await self._close()
+            except Exception as e:
+                print(f"{self.name} disconnect error: {e}")
+
+    async def _shutdown(self):
+        deadline = time.monotonic() + CLOSE_FLUSH_S
+        while self._connected and self._outbox and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # ================= COMMANDS =================
+    def _enqueue(self, text):
+        """
+        A queued command with the same coalescing key, after the last
+        START/STOP, is updated in place.
+        """
+        key = coalesce_key(text)
+        if key is not None:
+            for entry in reversed(self._outbox):
+                if entry[0] == key:
+                    entry[1] = text
+                    self.coalesced += 1
+                    return
+                if splits_queue(entry[1], key):
+                    break
+        if len(self._outbox) >= COMMAND_QUEUE_MAX and not self._make_room(text):
+            self.dropped += 1
+            print(f"{self.name} command queue full, dropped {text.strip()!r}")
+            return
+        self._outbox.append([key, text])
+        if self._outbox_ready is not None:
+            self._outbox_ready.set()
+
+    def _make_room(self, text):
+        """
+        Full queue: drop the oldest setting, else the oldest other command.
+        START/STOP are never dropped: with only those queued, a new one
+        grows the queue and any other command is refused (False).
+        """
+        droppable = [entry for entry in self._outbox if entry[1].strip() not in BARRIER_COMMANDS]
+        settings = [entry for entry in droppable if entry[0] is not None]
+        victim = (settings or droppable or [None])[0]
+        if victim is None:
+            return text.strip() in BARRIER_COMMANDS
+        self._outbox.remove(victim)
+        self.dropped += 1
+        print(f"{self.name} command queue full, dropped {victim[1].strip()!r}")
+        return True
+
+    def _merge_queued(self, commands):
+        """
+        Commands sent first on a connection (link and restored state) take
+        the value of a newer one still queued before any START/STOP, which
+        is then dropped, so a setting is not sent twice.
+        """
+        merged = []
+        for text in commands:
+            key = coalesce_key(text)
+            for entry in list(self._outbox) if key is not None else ():
+                if entry[0] == key:
+                    text = entry[1]
+                    self._outbox.remove(entry)
+                    self.coalesced += 1
+                    break
+                if splits_queue(entry[1], key):
+                    break
+            merged.append(text)
+        return merged
+
+    async def _writer(self):
+        """Send queued commands in order; a failed command is kept for the next connection."""
+        while True:
+            await self._outbox_ready.wait()
+            self._outbox_ready.clear()
+            while self._connected and self._outbox:
+                entry = self._outbox.popleft()
+                t0 = time.perf_counter()
+                try:
+                    with trace.async_span(f"write {self.name}", command=entry[1].strip()):
+                        await self._write(entry[1].encode())
+                except Exception as e:
+                    self._outbox.appendleft(entry)
+                    self.failures += 1
+                    print(f"{self.name} write error ({entry[1].strip()!r}): {e}")
+                    self._status(f"{self.name} write failed: {e}")
+                    break
+
+                latency = time.perf_counter() - t0
+                self.sent += 1
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self._latency_sum += latency
@@ -0,0 +1,372 @@
+import argparse
+import threading
+import time
+
+from collections import namedtuple
+
+import numpy as np
+
+from UI.calibration import load_calibration
+from UI.control_quality import ControlQuality
+from UI.emulator import BLE_SKETCH, SERIAL_SKETCH, Plant, StirrerEmulator, default_plant
+from UI.telemetry import ChunkParser, Message, Sample
+
+# =========================
+# CONFIG
+# =========================
+STEP_RPMS = (2000, 3500, 5000, 3000, 1500)   # step test: first setpoint at START, then steps
+STEP_HOLD_S = 15.0                           # time at each setpoint
+TAU_GRID_S = np.geomspace(0.05, 5.0, 48)     # plant time constants tried by the fit
+MAX_DELAY_TICKS = 3                          # plant dead times tried, in control ticks
+KP_SCALES = (1, 1 / 2, 1 / 4, 1 / 8, 1 / 16)   # candidates: SIMC gains scaled down...
+KI_SCALES = (1, 1 / 4, 1 / 16, 1 / 64, 0)      # ...the sketches' slew limit and windup punish high gains
+MIN_IMPROVEMENT = 0.10                       # proposed gains must settle this much faster
+REPLY_TIMEOUT_S = 2.0                        # wait for the device's PID line
+
+# Controller gains, as the sketches' PID line: PID,<kp>,<ki>,<kff>,<ff_offset>
+Gains = namedtuple("Gains", ["kp", "ki", "kff", "ff_offset"])
+
+# First-order plant fitted to a step test. delay_s is the dead time on top
+# of the one-tick measurement, rms_rpm the fit residual on the reported RPM.
+PlantFit = namedtuple("PlantFit", ["gain", "offset", "tau_s", "delay_s", "rms_rpm"])
+
+# Step responses of a set of gains on the emulated plant
+Evaluation = namedtuple("Evaluation", ["gains", "settling_s", "total_settling_s",
+                                       "overshoot_pct", "verdict"])
+
+def sketch_gains(sketch):
+    return Gains(sketch.kp, sketch.ki, sketch.kff, sketch.ff_offset)
+
+def parse_gains(text):
+    """
+    Returns:
+        - gains (Gains | None) : From a "PID,<kp>,<ki>,<kff>,<ff_offset>" line,
+          None for other lines (older sketches print fewer fields)
+    """
+    fields = text.split(",")
+    if fields[0] != "PID" or len(fields) != 5:
+        return None
+    try:
+        return Gains(*(float(f) for f in fields[1:]))
+    except ValueError:
+        return None
+
+def gain_commands(gains):
+    return [f"KP {gains.kp:.6f}\n", f"KI {gains.ki:.6f}\n",
+            f"KFF {gains.kff:.6f}\n", f"FFO {gains.ff_offset:.2f}\n"]
+
+# =========================
+# STEP TEST
+# The motor is started at the first setpoint, then stepped through the
+# others with S commands, with the gains in use. The PI keeps running,
+# the fit uses the PWM actually applied.
+# =========================
+def step_test(transport, steps=STEP_RPMS, hold_s=STEP_HOLD_S):
+    """
+    Run a step test on a device, in real time.
+
+    Parameters:
+        - transport (Transport) : Link to the stirrer, not started yet
+
+    Returns:
+        - samples (list) : Sample events while the motor ran
+        - gains (Gains | None) : Gains reported by the device, None if it did not
+    """
+    parser = ChunkParser()
+    lock = threading.Lock()
+    events = []
+
+    def on_data(data):
+        batch = parser.feed(data, time.perf_counter())
+        with lock:
+            events.extend(batch)
+
+    transport.on_data = on_data
+    transport.start()
+    for cmd in ("STREAM ON", "PROFILE CLEAR", "T 0", "PID", f"S {steps[0]}", "START"):
+        transport.write(cmd + "\n")
+    print(f"Step test: {' -> '.join(str(s) for s in steps)} RPM, {hold_s:.0f} s each...")
+    time.sleep(hold_s)
+    for rpm in steps[1:]:
+        transport.write(f"S {rpm}\n")
+        time.sleep(hold_s)
+    transport.write("STOP\n")
+    time.sleep(0.5)
+
+    with lock:
+        events = list(events)
+    gains = [g for g in (parse_gains(e.text) for e in events if isinstance(e, Message)) if g]
+    samples = [e for e in events if isinstance(e, Sample) and e.pwm > 0]
+    return samples, gains[-1] if gains else None
+
+def simulate_steps(sketch, plant, gains, steps=STEP_RPMS, hold_s=STEP_HOLD_S):
+    """
+    Run the step test on the emulator, in emulated time.
+
+    Returns:
+        - samples (list) : Sample at each control tick while the motor ran,
+          t in s from START
+    """
+    emulator = StirrerEmulator(sketch, plant=plant)
+    for cmd in [c.strip() for c in gain_commands(gains)] + [f"S {steps[0]}", "START"]:
+        emulator.handle_command(cmd)
+    emulator.read()
+    t0 = emulator.now_ms
+    period = sketch.ctrl_period_ms
+
+    samples = []
+    for i, rpm in enumerate(steps):
+        if i:
+            emulator.handle_command(f"S {rpm}")
+        end = t0 + (i + 1) * hold_s * 1000
+        while emulator.now_ms + period <= end:
+            emulator.run_until(emulator.now_ms + period)
+            samples.append(Sample((emulator.now_ms - t0) / 1000, emulator.setpoint,
+                                  emulator.rpm, emulator.pwm))
+        emulator.read()
+    return samples
+
+# =========================
+# PLANT FIT
+# Model of the loop as the sketch sees it, one step per control tick:
+#   motor     v[k] = a v[k-1] + (1 - a) gain (pwm[k-1-d] - offset)   (0 while pwm = 0)
+#   EMA       rpm[k] = alpha v[k] + (1 - alpha) rpm[k-1]
+# with a = exp(-dt / tau). For each (tau, d) of the grid the response is
+# linear in gain and gain × offset, solved by least squares; the pair
+# with the smallest residual wins. The EMA is fitted through, not
+# inverted: inverting it would amplify the Hall quantization noise.
+# Binary frames carry the raw RPM measured over each frame, not the EMA
+# output: they are fitted without the EMA stage (alpha = 1).
+# =========================
+def _cascade(u, a, alpha, d):
+    """Filtered RPM for the input u, from rest (u = 0 before the test)."""
+    v = y = 0.0
+    out = np.empty(len(u))
+    for k in range(len(u)):
+        j = k - 1 - d
+        v = a * v + (1 - a) * (u[j] if j >= 0 else 0.0)
+        y = alpha * v + (1 - alpha) * y
+        out[k] = y
+    return out
+
+def _is_binary(samples):
+    return all(s.device_t is not None for s in samples)
+
+def _uniform(samples, period_s):
+    """(rpm, pwm) arrays at the control ticks."""
+    if _is_binary(samples):
+        t = np.array([s.device_t for s in samples])
+        grid = np.arange(t[0], t[-1], period_s)
+        return (np.interp(grid, t, [s.rpm for s in samples]),
+                np.interp(grid, t, [s.pwm for s in samples]))
+    # ASCII telemetry: one line per control tick
+    return (np.array([s.rpm for s in samples], dtype=float),
+            np.array([s.pwm for s in samples], dtype=float))
+
+def fit_plant(samples, sketch):
+    """
+    Parameters:
+        - samples (list) : Sample events of a step test, from START, ASCII
+          lines or binary frames
+        - sketch (Sketch) : For the control period and the RPM filter
+
+    Returns:
+        - fit (PlantFit)
+    """
+    dt = sketch.ctrl_period_ms / 1000
+    alpha = 1.0 if _is_binary(samples) else sketch.ema_alpha
+    rpm, pwm = _uniform(samples, dt)
+    running = (pwm > 0).astype(float)
+
+    best = None
+    for tau in TAU_GRID_S:
+        a = np.exp(-dt / tau)
+        for d in range(MAX_DELAY_TICKS + 1):
+            x = np.column_stack((_cascade(pwm, a, alpha, d), _cascade(running, a, alpha, d)))
+            coef, *_ = np.linalg.lstsq(x, rpm, rcond=None)
+            rms = float(np.sqrt(np.mean((x @ coef - rpm) ** 2)))
+            if best is None or rms < best[0]:
+                best = (rms, tau, d, coef)
+
+    rms, tau, d, (gain, gain_offset) = best
+    if gain <= 0:
+        raise ValueError("the step test shows no response to the PWM")
+    return PlantFit(float(gain), float(-gain_offset / gain), float(tau), d * dt, rms)
+
+# =========================
+# GAINS
+# Feedforward from the static gain: pwm = offset + setpoint / gain.
+# PI by the SIMC rules on the loop seen by the controller: the motor
+# lag, the EMA filter lag (dt (1 - alpha) / alpha), half a tick of
+# zero-order hold and the dead time. The half rule keeps the larger lag
+# and splits the smaller one between it and the delay. PID_v1 takes
+# ki per second: ki = kp / Ti.
+# SIMC ignores what the sketches add to a PI (slew limit, integral
+# clamp, deadband, 1-pulse RPM quantization), so it only seeds a grid of
+# softer gains, each run on the emulator with the fitted plant.
+# =========================
+def propose_gains(fit, sketch, tau_c_factor=1.0):
+    dt = sketch.ctrl_period_ms / 1000
+    tau_filter = dt * (1 - sketch.ema_alpha) / sketch.ema_alpha
+    tau1, tau2 = max(fit.tau_s, tau_filter), min(fit.tau_s, tau_filter)
+    tau1 += tau2 / 2
+    theta = fit.delay_s + dt / 2 + tau2 / 2
+
+    tau_c = tau_c_factor * theta
+    kp = tau1 / (fit.gain * (tau_c + theta))
+    ti = min(tau1, 4 * (tau_c + theta))
+    return Gains(kp, kp / ti, 1 / fit.gain, fit.offset)
+
+def evaluate(sketch, plant, gains, calibration, steps=STEP_RPMS, hold_s=STEP_HOLD_S):
+    """
+    Step responses of gains on the emulated plant, scored by ControlQuality.
+    A step that does not settle counts as settling in hold_s.
+
+    Returns:
+        - evaluation (Evaluation)
+    """
+    quality = ControlQuality(calibration)
+    settling = []
+    samples = simulate_steps(sketch, plant, gains, steps, hold_s)
+    per_step = len(samples) // len(steps)
+    for i in range(len(steps)):
+        quality.update(samples[i * per_step:(i + 1) * per_step])
+        settling.append(hold_s if quality.settling_s is None else float(quality.settling_s))
+    return Evaluation(gains, settling, sum(settling), quality.worst_overshoot_pct or 0.0,
+                      quality.verdict())
+
+def choose_gains(fit, sketch, current, calibration):
+    """
+    Evaluate the current gains and the candidates around the SIMC gains
+    on the fitted plant.
+
+    Returns:
+        - current (Evaluation)
+        - best (Evaluation) : Fastest passing candidate, current if none beats
+          it by MIN_IMPROVEMENT
+    """
+    plant = Plant(fit.gain, fit.offset, fit.tau_s * 1000)
+    baseline = evaluate(sketch, plant, current, calibration)
+    simc = propose_gains(fit, sketch)
+    candidates = [evaluate(sketch, plant, simc._replace(kp=simc.kp * p, ki=simc.ki * i),
+                           calibration)
+                  for p in KP_SCALES for i in KI_SCALES]
+    passing = [c for c in candidates if c.verdict == "PASS"]
+    best = min(passing, key=lambda c: c.total_settling_s, default=None)
+    if (best is None or best.total_settling_s
+            > (1 - MIN_IMPROVEMENT) * baseline.total_settling_s):
+        return baseline, baseline
+    return baseline, best
+
+def push_gains(transport, gains, timeout=REPLY_TIMEOUT_S):
+    """
+    Send the gains and wait for the device to report them.
+
+    Returns:
+        - confirmed (bool) : True if the device's PID line matches
+    """
+    replies = []
+    parser = ChunkParser()
+    transport.on_data = lambda data: replies.extend(parser.feed(data, time.perf_counter()))
+    for cmd in gain_commands(gains):
+        transport.write(cmd)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        reported = [g for g in (parse_gains(e.text) for e in list(replies)
+                                if isinstance(e, Message)) if g]
+        if reported and np.allclose(reported[-1], gains, rtol=1e-3, atol=1e-2):
+            return True
+        time.sleep(0.05)
+    return False
+
+# =========================
+# COMMAND LINE
+# =========================
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="GBM8970 – VWFlow gain tuning: step test, plant fit, feedforward "
+                    "and PI gains validated on the emulator")
+
+    link = parser.add_mutually_exclusive_group(required=True)
+    link.add_argument("--port", help="Serial port of the stirrer")
+    link.add_argument("--ble", metavar="ADDRESS", help="BLE address of the stirrer")
+    link.add_argument("--simulate-device", action="store_true",
+                      help="Step test on the emulated stirrer")
+    parser.add_argument("--sketch", choices=("serial", "ble"), default=None,
+                        help="Sketch on the device (default: from the link)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Propose gains without sending them")
+
+    return parser.parse_args()
+
+def open_transport(args):
+    if args.port:
+        import serial
+
+        from UI.protocol import DEFAULT_BAUD
+        from UI.serial.main import RESET_DELAY_S
+        from UI.serial.transport import SerialTransport
+        ser = serial.Serial(args.port, DEFAULT_BAUD, timeout=0.1, write_timeout=1.0)
+        time.sleep(RESET_DELAY_S)
+        return SerialTransport(ser)
+    from UI.bluetooth.transport import BLETransport
+    return BLETransport(args.ble)
+
+def _print_gains(label, gains):
+    print(f"{label}: Kp {gains.kp:.6f}, Ki {gains.ki:.6f}/s, "
+          f"kFF {gains.kff:.6f} PWM/RPM, offset {gains.ff_offset:.2f} PWM")
+
+def _print_evaluation(label, evaluation):
+    steps = ", ".join(f"{s:.1f}" for s in evaluation.settling_s)
+    print(f"{label}: settling {steps} s (total {evaluation.total_settling_s:.1f} s), "
+          f"overshoot {evaluation.overshoot_pct:.1f} %, {evaluation.verdict}")
+
+def main():
+    args = parse_args()
+    sketch_name = args.sketch or ("ble" if args.ble else "serial")
+    sketch = SERIAL_SKETCH if sketch_name == "serial" else BLE_SKETCH
+    calibration = load_calibration()
+
+    transport = None
+    if args.simulate_device:
+        current = sketch_gains(sketch)
+        samples = simulate_steps(sketch, default_plant(sketch), current)
+    else:
+        transport = open_transport(args)
+        samples, current = step_test(transport)
+        if current is None:
+            print("The device did not report its gains (sketch without KFF/FFO?), "
+                  "assuming the sketch defaults.")
+            current = sketch_gains(sketch)
+    if len(samples) < 10:
+        raise RuntimeError("The step test returned no telemetry")
+
+    fit = fit_plant(samples, sketch)
+    print(f"Plant: {fit.gain:.2f} RPM/PWM above {fit.offset:.1f} PWM, "
+          f"tau {fit.tau_s * 1000:.0f} ms, dead time {fit.delay_s * 1000:.0f} ms, "
+          f"fit residual {fit.rms_rpm:.1f} RPM")
+
+    baseline, best = choose_gains(fit, sketch, current, calibration)
+    _print_gains("Current", current)
+    _print_evaluation("Current", baseline)
+    if best is baseline:
+        print("No candidate settles faster on the fitted plant, keeping the current gains.")
+    else:
+        _print_gains("Proposed", best.gains)
+        _print_evaluation("Proposed", best)
+        if transport is not None and not args.dry_run:
+            if push_gains(transport, best.gains):
+                print("Gains sent. They last until the stirrer resets: copy them into "
+                      "the sketch to keep them.")
+            else:
+                print("The device did not confirm the gains.")
+
+    if transport is not None:
+        from UI.transport import stop_transport_loop
+        transport.close()
+        stop_transport_loop()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,41 @@
 // =========================
 BLEService stirrerService("12345678-1234-1234-1234-123456789abc");
 
+// Sized for a whole PROFILE command (see UI/profile.py)
 BLEStringCharacteristic stirrerRX(
   "12345678-1234-1234-1234-123456789abd",
   BLEWrite | BLEWriteWithoutResponse,
-  64
+  244
 );
 
-BLEStringCharacteristic stirrerTX(
+// Raw bytes: carries ASCII lines and binary telemetry frames
+const int NOTIFY_MAX_BYTES = 128;
+BLECharacteristic stirrerTX(
   "12345678-1234-1234-1234-123456789abe",
   BLERead | BLENotify,
-  128
+  NOTIFY_MAX_BYTES
 );
 
+// A notification carries at most ATT_MTU - 3 bytes, the rest is cut off.
+// ArduinoBLE does not tell the negotiated MTU: it is 23 (20 bytes) until
+// the host reports it with the MTU command, on each connection.
+const int NOTIFY_MIN_BYTES = 20;
+int notifyBytes            = NOTIFY_MIN_BYTES;
+bool centralConnected      = false;
+
+void stirrerSendBytes(const uint8_t* data, int len) {
+  if (!BLE.connected()) return;
+  for (int i = 0; i < len; i += notifyBytes) {
+    stirrerTX.writeValue(&data[i], min(notifyBytes, len - i));
+  }
+}
+
+// Binary frames are packed several per notification (see packFrame)
+void flushPack();
+
 void stirrerSend(const String& s) {
-  if (BLE.connected()) stirrerTX.setValue(s);
+  flushPack();  // keep frames and lines in order
+  stirrerSendBytes((const uint8_t*)s.c_str(), s.length());
 }
 
 // =========================
@@ -47,6 +68,12 @@ const float FF_OFFSET = 42.0f;
 const float KP = 0.0058f;
 const float KI = 0.00008f;
 
+// Gains in use: the constants above at power-on, then KP/KI/KFF/FFO commands
+float kp       = KP;
+float ki       = KI;
+float kff      = KFF;
+float ffOffset = FF_OFFSET;
+
 
 // Setpoint limits
 const float SP_MIN = 0.0f;
@@ -66,7 +93,8 @@ unsigned long lastCtrlMillis = 0;
 // =========================
 // RPM MEASUREMENT
 // =========================
-volatile unsigned long pulseCount  = 0;
+volatile unsigned long pulseCount  = 0;   // since the last control tick
+volatile unsigned long pulseTotal  = 0;   // since power-on, for the frame RPM
 volatile unsigned long lastPulseUs = 0;
 
 float rawRPM      = 0.0f;
@@ -88,10 +116,55 @@ AutoTunePID pid(0.0f, 255.0f, TuningMethod::CohenCoon);
 bool motorEnabled  = false;
 bool streamEnabled = true;
 
-unsigned long RUN_TIME_MS    = 0;
+unsigned long RUN_TIME_MS    = 0;   // set by T, kept across profile runs
+unsigned long runLengthMs    = 0;   // this run: RUN_TIME_MS, or the profile's length
 unsigned long runStartMillis = 0;
 bool timedRunActive          = false;
 
+// =========================
+// BINARY TELEMETRY (must match UI/protocol.py)
+// =========================
+//   A5 5A | type u8 | seq u16 | t_ms u32 | setpoint u16 | rpm f32 | pwm u8 | crc8
+// Little-endian, CRC-8 (poly 0x07) over type..pwm
+const uint8_t FRAME_TELEMETRY = 0x01;
+bool binaryEnabled           = false;
+unsigned long telemPeriodMs  = CTRL_PERIOD_MS;
+unsigned long lastTelemMillis = 0;
+uint16_t telemSeq            = 0;
+
+// Frame RPM, measured over each telemetry period (see measureFrameRpm)
+const unsigned long FRAME_STALL_US = 500000;  // no pulse for this long: stopped
+unsigned long framePulseTotal = 0;
+unsigned long framePulseUs    = 0;
+bool frameRefValid            = false;
+float frameRpm                = 0.0f;
+int pwmApplied               = 0;
+
+// Notification packing: frames are sent together when the next one would
+// not fit in a notification (notifyBytes), or after PACK_MAX_DELAY_MS.
+// At the default MTU that is one 17-byte frame per notification.
+const unsigned long PACK_MAX_DELAY_MS = 100;
+uint8_t packBuf[NOTIFY_MAX_BYTES];
+int packLen                  = 0;
+unsigned long packStartMillis = 0;
+
+// =========================
+// PROFILE (must match UI/profile.py)
+// =========================
+//   PROFILE <rpm>:<s>,<rpm>:<s>,...  ramp linearly to each RPM over s
+//   seconds (0 = step), starting from the setpoint at START
+// START runs the uploaded profile, its length sets that run's time (T is kept).
+// Progress: "PROFILE,<segment>" at each segment, "PROFILE,DONE" at the end.
+// While it runs the profile owns the setpoint (S is ignored), and the same
+// PROFILE uploaded again (a host reconnecting) does not restart it.
+const int PROFILE_MAX_SEGMENTS = 16;
+float profileRpm[PROFILE_MAX_SEGMENTS];
+unsigned long profileEndMs[PROFILE_MAX_SEGMENTS];  // from the start of the run
+int profileLen        = 0;
+int profileSegment    = -1;                        // -1 = no profile running
+float profileStartRpm = 0.0f;
+String profileSpec    = "";                        // accepted PROFILE argument
+
 // =========================
 // ISR
 // =========================
@@ -99,6 +172,7 @@ void hallISR() {
   unsigned long now = micros();
   if (now - lastPulseUs >= DEBOUNCE_US) {
     pulseCount++;
+    pulseTotal++;
     lastPulseUs = now;
   }
 }
@@ -116,7 +190,7 @@ void setup() {
   analogWrite(pin_motor, 0);
 
   pid.setSetpoint(Setpoint);
-  pid.setManualGains(KP, KI, 0.0f);
+  pid.setManualGains(kp, ki, 0.0f);
   pid.enableAntiWindup(true, 0.8f);
   pid.setOscillationMode(OscillationMode::Normal);
 
@@ -130,7 +204,7 @@ void setup() {
   BLE.addService(stirrerService);
   BLE.setAdvertisedService(stirrerService);
 
-  stirrerTX.setValue("");
+  stirrerTX.writeValue((const uint8_t*)"", 0);
   BLE.advertise();
 }
 
@@ -139,8 +213,15 @@ void setup() {
 // =========================
 void loop() {
   BLE.poll();
+  if (BLE.connected() != centralConnected) {
+    centralConnected = !centralConnected;
+    notifyBytes = NOTIFY_MIN_BYTES;  // until the new central sends MTU
+    packLen = 0;
+  }
   handleCommands();
   runControl();
+  sendBinaryTelemetry();
+  if (packLen > 0 && millis() - packStartMillis >= PACK_MAX_DELAY_MS) flushPack();
 }
 
 // =========================
@@ -153,7 +234,19 @@ void loop() {
 //   T <seconds> → set run duration (0 = forever)
 //   STREAM ON   → enable data stream
 //   STREAM OFF  → disable data stream
+//   BIN ON/OFF  → binary frames instead of ASCII lines
+//   RATE <ms>   → binary telemetry period
+//   MTU <bytes> → ATT MTU the host negotiated, sizes the notifications
+//   PROFILE ... → upload a profile, PROFILE CLEAR → remove it
+//   KP/KI <g>   → PI gains, KFF <g>/FFO <pwm> → feedforward (UI/tuning.py)
+//   PID         → report the gains in use
 // =========================
+
+void sendGains() {
+  stirrerSend("PID," + String(kp, 6) + "," + String(ki, 6) + "," +
+              String(kff, 6) + "," + String(ffOffset, 2) + "\n");
+}
+
 void handleCommands() {
   if (!stirrerRX.written()) return;
 
@@ -167,22 +260,75 @@ void handleCommands() {
     motorEnabled    = true;
     timedRunActive  = true;
     runStartMillis  = millis();
-    pid.setManualGains(KP, KI, 0.0f);  // reset integrator on each start
+    runLengthMs     = RUN_TIME_MS;
+    pid.setManualGains(kp, ki, 0.0f);  // reset integrator on each start
+    if (profileLen > 0) {
+      profileSegment  = 0;
+      profileStartRpm = Setpoint;
+      runLengthMs     = profileEndMs[profileLen - 1];
+      if (streamEnabled) stirrerSend("PROFILE,0\n");
+    }
   }
   else if (cmd == "STOP") {
     motorEnabled   = false;
     timedRunActive = false;
+    profileSegment = -1;
     analogWrite(pin_motor, 0);
     stirrerSend("STOPPED\n");
   }
+  else if (cmd.startsWith("KP ")) {
+    kp = cmd.substring(3).toFloat();
+    pid.setManualGains(kp, ki, 0.0f);
+    sendGains();
+  }
+  else if (cmd.startsWith("KI ")) {
+    ki = cmd.substring(3).toFloat();
+    pid.setManualGains(kp, ki, 0.0f);
+    sendGains();
+  }
+  else if (cmd.startsWith("KFF ")) {
+    kff = cmd.substring(4).toFloat();
+    sendGains();
+  }
+  else if (cmd.startsWith("FFO ")) {
+    ffOffset = cmd.substring(4).toFloat();
+    sendGains();
+  }
+  else if (cmd == "PID") {
+    sendGains();
+  }
+  else if (cmd == "PROFILE CLEAR") {
+    profileLen     = 0;
+    profileSegment = -1;
+    profileSpec    = "";
+    stirrerSend("PROFILE_OK 0 0\n");
+  }
+  else if (cmd.startsWith("PROFILE ")) {
+    String spec = cmd.substring(8);
+    if (profileSegment >= 0 && spec == profileSpec) {
+      sendProfileOk();  // re-upload of the running profile: keep running it
+      return;
+    }
+    profileSegment = -1;
+    if (parseProfile(spec)) {
+      profileSpec = spec;
+      sendProfileOk();
+    } else {
+      profileSpec = "";
+      stirrerSend("PROFILE_ERR\n");
+    }
+  }
   else if (cmd.startsWith("S ")) {
-    Setpoint = constrain(cmd.substring(2).toFloat(), SP_MIN, SP_MAX);
-    pid.setSetpoint(Setpoint);
+    if (profileSegment < 0) {
+      Setpoint = constrain(cmd.substring(2).toFloat(), SP_MIN, SP_MAX);
+      pid.setSetpoint(Setpoint);
+    }
     stirrerSend("SETPOINT," + String(Setpoint, 0) + "\n");
   }
   else if (cmd.startsWith("T ")) {
     float seconds = cmd.substring(2).toFloat();
     RUN_TIME_MS = (seconds <= 0.0f) ? 0UL : (unsigned long)(seconds * 1000.0f);
+    if (profileSegment < 0) runLengthMs = RUN_TIME_MS;  // also the current run, unless a profile
   }
   else if (cmd == "STREAM ON") {
     streamEnabled = true;
@@ -190,6 +336,71 @@ void handleCommands() {
   else if (cmd == "STREAM OFF") {
     streamEnabled = false;
   }
+  else if (cmd == "BIN ON") {
+    binaryEnabled = true;
+  }
+  else if (cmd == "BIN OFF") {
+    binaryEnabled = false;
+  }
+  else if (cmd.startsWith("RATE ")) {
+    telemPeriodMs = constrain(cmd.substring(5).toInt(), 5, 1000);
+  }
+  else if (cmd.startsWith("MTU ")) {
+    flushPack();
+    notifyBytes = constrain(cmd.substring(4).toInt() - 3, NOTIFY_MIN_BYTES, NOTIFY_MAX_BYTES);
+  }
+}
+
+// =========================
+// PROFILE
+// =========================
+void sendProfileOk() {
+  stirrerSend("PROFILE_OK " + String(profileLen) + " " +
+              String(profileEndMs[profileLen - 1]) + "\n");
+}
+
+bool parseProfile(String spec) {
+  profileLen = 0;
+  unsigned long total = 0;
+  int n = 0;
+  while (spec.length() > 0) {
+    if (n >= PROFILE_MAX_SEGMENTS) return false;
+    int comma  = spec.indexOf(',');
+    String seg = (comma < 0) ? spec : spec.substring(0, comma);
+    spec       = (comma < 0) ? String("") : spec.substring(comma + 1);
+
+    int colon = seg.indexOf(':');
+    if (colon < 0) return false;
+    float rpm     = seg.substring(0, colon).toFloat();
+    float seconds = seg.substring(colon + 1).toFloat();
+    if (rpm < SP_MIN || rpm > SP_MAX || seconds < 0.0f) return false;
+
+    total += (unsigned long)(seconds * 1000.0f + 0.5f);
+    profileRpm[n]   = rpm;
+    profileEndMs[n] = total;
+    n++;
+  }
+  if (n == 0 || total == 0) return false;
+  profileLen = n;
+  return true;
+}
+
+void updateProfile(unsigned long now) {
+  if (profileSegment < 0 || !motorEnabled) return;
+
+  unsigned long elapsed = now - runStartMillis;
+  while (profileSegment < profileLen - 1 && elapsed >= profileEndMs[profileSegment]) {
+    profileSegment++;
+    if (streamEnabled) stirrerSend("PROFILE," + String(profileSegment) + "\n");
+  }
+
+  unsigned long segStart = (profileSegment == 0) ? 0 : profileEndMs[profileSegment - 1];
+  unsigned long segEnd   = profileEndMs[profileSegment];
+  float from = (profileSegment == 0) ? profileStartRpm : profileRpm[profileSegment - 1];
+  float to   = profileRpm[profileSegment];
+  float f    = (elapsed >= segEnd) ? 1.0f : (float)(elapsed - segStart) / (segEnd - segStart);
+  Setpoint = from + (to - from) * f;
+  pid.setSetpoint(Setpoint);
 }
 
 // =========================
@@ -207,20 +418,26 @@ void runControl() {
   if (streamEnabled && motorEnabled && millis() - lastTimeMsg > 500) {
     lastTimeMsg = millis();
 
-    if (RUN_TIME_MS == 0) {
+    if (runLengthMs == 0) {
       stirrerSend("TIME_LEFT,INF\n");
     } else {
-      long remaining = (long)(RUN_TIME_MS - (millis() - runStartMillis));
+      long remaining = (long)(runLengthMs - (millis() - runStartMillis));
       if (remaining < 0) remaining = 0;
       stirrerSend("TIME_LEFT," + String(remaining) + "\n");
     }
   }
 
   // --- Timed run check ---
-  if (timedRunActive && RUN_TIME_MS > 0 && (now - runStartMillis >= RUN_TIME_MS)) {
+  if (timedRunActive && runLengthMs > 0 && (now - runStartMillis >= runLengthMs)) {
     motorEnabled   = false;
     timedRunActive = false;
     analogWrite(pin_motor, 0);
+    if (profileSegment >= 0) {
+      profileSegment = -1;
+      if (streamEnabled) stirrerSend("PROFILE,DONE\n");
+    }
+    // The periodic TIME_LEFT stops with the motor: report the end
+    if (streamEnabled) stirrerSend("TIME_LEFT,0\n");
     stirrerSend("STOPPED\n");
     return;
   }
@@ -244,6 +461,9 @@ void runControl() {
 
   rpmFiltered = EMA_ALPHA * rawRPM + (1.0f - EMA_ALPHA) * rpmFiltered;
 
+  // --- Profile setpoint for this tick ---
+  updateProfile(now);
+
   // --- Motor off ---
   if (!motorEnabled) {
     analogWrite(pin_motor, 0);
@@ -251,7 +471,7 @@ void runControl() {
   }
 
   // --- Feedforward + PI ---
-  float pwmFF  = FF_OFFSET + KFF * Setpoint;
+  float pwmFF  = ffOffset + kff * Setpoint;
   pid.update(rpmFiltered);
   float pwmPID = pid.getOutput();
   
@@ -263,9 +483,10 @@ void runControl() {
   
   int pwm = constrain((int)(pwmFF + pwmPID), 0, 255);
   analogWrite(pin_motor, pwm);
+  pwmApplied = pwm;
 
-  // --- Stream: Setpoint,RPM,PWM ---
-  if (streamEnabled) {
+  // --- Stream: Setpoint,RPM,PWM (ASCII mode) ---
+  if (streamEnabled && !binaryEnabled) {
     stirrerSend(
       String(Setpoint,    0) + "," +
       String(rpmFiltered, 1) + "," +
@@ -273,3 +494,82 @@ void runControl() {
     );
   }
 }
+
+// =========================
+// BINARY TELEMETRY
+// =========================
+uint8_t crc8(const uint8_t* data, size_t len) {
+  uint8_t crc = 0;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+// RPM over one frame period, so every frame is a fresh measure whatever
+// RATE is (rpmFiltered only moves every CTRL_PERIOD_MS): the pulses since
+// the previous frame over the time between their last pulses. Held while
+// no pulse came, 0 once none came for FRAME_STALL_US.
+float measureFrameRpm() {
+  unsigned long total, lastUs;
+  noInterrupts();
+  total  = pulseTotal;
+  lastUs = lastPulseUs;
+  interrupts();
+
+  unsigned long pulses = total - framePulseTotal;
+  if (pulses > 0) {
+    if (frameRefValid && lastUs != framePulseUs) {
+      frameRpm = (pulses * 60000000.0f) / ((float)(lastUs - framePulseUs) * PULSES_PER_REV);
+    }
+    framePulseTotal = total;
+    framePulseUs    = lastUs;
+    frameRefValid   = true;
+  } else if (micros() - lastUs > FRAME_STALL_US) {
+    frameRpm      = 0.0f;
+    frameRefValid = false;
+  }
+  return frameRpm;
+}
+
+void sendBinaryTelemetry() {
+  if (!binaryEnabled || !streamEnabled || !motorEnabled) return;
+
+  unsigned long now = millis();
+  if (now - lastTelemMillis < telemPeriodMs) return;
+  lastTelemMillis = now;
+
+  uint16_t sp = (uint16_t)constrain(Setpoint + 0.5f, 0.0f, 65535.0f);
+  float rpm   = measureFrameRpm();
+  uint8_t pwm = (uint8_t)constrain(pwmApplied, 0, 255);
+
+  uint8_t frame[17];
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = FRAME_TELEMETRY;
+  memcpy(&frame[3], &telemSeq, 2);
+  memcpy(&frame[5], &now, 4);
+  memcpy(&frame[9], &sp, 2);
+  memcpy(&frame[11], &rpm, 4);
+  frame[15] = pwm;
+  frame[16] = crc8(&frame[2], 14);
+
+  packFrame(frame, sizeof(frame));
+  telemSeq++;
+}
+
+void packFrame(const uint8_t* frame, int len) {
+  if (packLen + len > notifyBytes) flushPack();
+  if (packLen == 0) packStartMillis = millis();
+  memcpy(&packBuf[packLen], frame, len);
+  packLen += len;
+}
+
+void flushPack() {
+  if (packLen == 0) return;
+  stirrerSendBytes(packBuf, packLen);
+  packLen = 0;
+}
@@ -3,7 +3,8 @@
 // =========================
 // RUN TIME SETUP
 // =========================
-unsigned long RUN_TIME_MS = 0;
+unsigned long RUN_TIME_MS = 0;   // set by T, kept across profile runs
+unsigned long runLengthMs = 0;   // this run: RUN_TIME_MS, or the profile's length
 unsigned long runStartMillis = 0;
 bool timedRunActive = false;
 
@@ -22,7 +23,9 @@ unsigned long lastCtrlMillis = 0;
 // =========================
 // RPM MEASUREMENT
 // =========================
-volatile unsigned long pulseCount = 0;
+volatile unsigned long pulseCount = 0;       // since the last control tick
+volatile unsigned long pulseTotal = 0;       // since power-on, for the frame RPM
+volatile unsigned long lastPulseMicros = 0;
 const int PULSES_PER_REV = 1;
 
 // =========================
@@ -39,8 +42,9 @@ double Setpoint = 3000.0;
 double Input    = 0.0;
 double PIout    = 0.0;
 
-// Feedforward
-const double kFF = 0.0092;   // PWM per RPM
+// Feedforward: PWM = ffOffset + kFF × Setpoint
+double kFF = 0.0092;         // PWM per RPM
+double ffOffset = 0.0;
 
 // PI gains
 double Kp = 0.02;
@@ -58,12 +62,51 @@ PID speedPI(&Input, &PIout, &Setpoint, Kp, Ki, Kd, DIRECT);
 // =========================
 bool motorEnabled = false;
 bool streamEnabled = false;  // Only stream serial data when enabled
+double pwmApplied = 0.0;
+
+// =========================
+// LINK / BINARY TELEMETRY (must match UI/protocol.py)
+// =========================
+//   A5 5A | type u8 | seq u16 | t_ms u32 | setpoint u16 | rpm f32 | pwm u8 | crc8
+// Little-endian, CRC-8 (poly 0x07) over type..pwm
+const unsigned long DEFAULT_BAUD = 9600;
+const uint8_t FRAME_TELEMETRY = 0x01;
+bool binaryEnabled = false;                  // Binary frames instead of ASCII lines
+unsigned long telemPeriodMs = CTRL_PERIOD_MS;
+unsigned long lastTelemMillis = 0;
+uint16_t telemSeq = 0;
+
+// Frame RPM, measured over each telemetry period (see measureFrameRpm)
+const unsigned long FRAME_STALL_US = 500000;  // no pulse for this long: stopped
+unsigned long framePulseTotal = 0;
+unsigned long framePulseMicros = 0;
+bool frameRefValid = false;
+double frameRpm = 0.0;
+
+// =========================
+// PROFILE (must match UI/profile.py)
+// =========================
+//   PROFILE <rpm>:<s>,<rpm>:<s>,...  ramp linearly to each RPM over s
+//   seconds (0 = step), starting from the setpoint at START
+// START runs the uploaded profile, its length sets that run's time (T is kept).
+// Progress: "PROFILE,<segment>" at each segment, "PROFILE,DONE" at the end.
+// While it runs the profile owns the setpoint (S is ignored), and the same
+// PROFILE uploaded again (a host reconnecting) does not restart it.
+const int PROFILE_MAX_SEGMENTS = 16;
+float profileRpm[PROFILE_MAX_SEGMENTS];
+unsigned long profileEndMs[PROFILE_MAX_SEGMENTS];  // from the start of the run
+int profileLen = 0;
+int profileSegment = -1;                           // -1 = no profile running
+double profileStartRpm = 0.0;
+String profileSpec = "";                           // accepted PROFILE argument
 
 // =========================
 // ISR
 // =========================
 void hallISR() {
   pulseCount++;
+  pulseTotal++;
+  lastPulseMicros = micros();
 }
 
 // =========================
@@ -80,7 +123,7 @@ void setup() {
   speedPI.SetOutputLimits(-50, 50);  // PI is correction only
   speedPI.SetMode(AUTOMATIC);
 
-  Serial.begin(9600);
+  Serial.begin(DEFAULT_BAUD);
 }
 
 // =========================
@@ -91,13 +134,23 @@ void loop() {
   handleSerialUI();
 
   // Timed auto-stop
-  if (timedRunActive && RUN_TIME_MS > 0 &&
-      millis() - runStartMillis >= RUN_TIME_MS) {
+  if (timedRunActive && runLengthMs > 0 &&
+      millis() - runStartMillis >= runLengthMs) {
     motorEnabled = false;
     timedRunActive = false;
     analogWrite(pin_motor, 0);
+    if (profileSegment >= 0) {
+      profileSegment = -1;
+      if (streamEnabled) Serial.println("PROFILE,DONE");
+    }
+    // The periodic TIME_LEFT stops with the motor: report the end
+    if (streamEnabled) Serial.println("TIME_LEFT,0");
+    Serial.println("STOPPED");
   }
 
+  // Binary telemetry runs on its own period
+  sendBinaryTelemetry();
+
   unsigned long now = millis();
   if (now - lastCtrlMillis < CTRL_PERIOD_MS) return;
   lastCtrlMillis = now;
@@ -121,16 +174,19 @@ void loop() {
   if (streamEnabled && motorEnabled && millis() - lastTimeMsg > 500) {
     lastTimeMsg = millis();
 
-    if (RUN_TIME_MS == 0) {
+    if (runLengthMs == 0) {
       Serial.println("TIME_LEFT,INF");
     } else {
-      long remaining = (long)(RUN_TIME_MS - (millis() - runStartMillis));
+      long remaining = (long)(runLengthMs - (millis() - runStartMillis));
       if (remaining < 0) remaining = 0;
       Serial.print("TIME_LEFT,");
       Serial.println(remaining);
     }
   }
 
+  // Profile setpoint for this tick
+  updateProfile(now);
+
   // Motor off
   if (!motorEnabled) {
     analogWrite(pin_motor, 0);
@@ -141,7 +197,7 @@ void loop() {
   // ERROR & CONTROL
   // -------------------------
   double error = Setpoint - rpmFiltered;
-  double pwmFF = kFF * Setpoint;
+  double pwmFF = ffOffset + kFF * Setpoint;
 
   if (abs(error) < 80.0) {
     speedPI.SetMode(MANUAL);
@@ -162,11 +218,12 @@ void loop() {
   double pwmCmd = pwmFF + PIout;
   pwmCmd = constrain(pwmCmd, 0, 255);
   analogWrite(pin_motor, (int)pwmCmd);
+  pwmApplied = pwmCmd;
 
   // -------------------------
-  // DEBUG OUTPUT (only if streaming enabled)
+  // DEBUG OUTPUT (only if streaming enabled, ASCII mode)
   // -------------------------
-  if (streamEnabled) {
+  if (streamEnabled && !binaryEnabled) {
     Serial.print(Setpoint);
     Serial.print(",");
     Serial.print(rpmFiltered);
@@ -176,6 +233,143 @@ void loop() {
   }
 }
 
+// =========================
+// BINARY TELEMETRY
+// =========================
+uint8_t crc8(const uint8_t* data, size_t len) {
+  uint8_t crc = 0;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+// RPM over one frame period, so every frame is a fresh measure whatever
+// RATE is (rpmFiltered only moves every CTRL_PERIOD_MS): the pulses since
+// the previous frame over the time between their last pulses. Held while
+// no pulse came, 0 once none came for FRAME_STALL_US.
+float measureFrameRpm() {
+  unsigned long total, lastUs;
+  noInterrupts();
+  total = pulseTotal;
+  lastUs = lastPulseMicros;
+  interrupts();
+
+  unsigned long pulses = total - framePulseTotal;
+  if (pulses > 0) {
+    if (frameRefValid && lastUs != framePulseMicros) {
+      frameRpm = (pulses * 60000000.0) / ((double)(lastUs - framePulseMicros) * PULSES_PER_REV);
+    }
+    framePulseTotal = total;
+    framePulseMicros = lastUs;
+    frameRefValid = true;
+  } else if (micros() - lastUs > FRAME_STALL_US) {
+    frameRpm = 0.0;
+    frameRefValid = false;
+  }
+  return (float)frameRpm;
+}
+
+void sendBinaryTelemetry() {
+  if (!binaryEnabled || !streamEnabled || !motorEnabled) return;
+
+  unsigned long now = millis();
+  if (now - lastTelemMillis < telemPeriodMs) return;
+  lastTelemMillis = now;
+
+  uint16_t sp = (uint16_t)constrain(Setpoint + 0.5, 0, 65535);
+  float rpm = measureFrameRpm();
+  uint8_t pwm = (uint8_t)constrain(pwmApplied, 0, 255);
+
+  uint8_t frame[17];
+  frame[0] = 0xA5;
+  frame[1] = 0x5A;
+  frame[2] = FRAME_TELEMETRY;
+  memcpy(&frame[3], &telemSeq, 2);
+  memcpy(&frame[5], &now, 4);
+  memcpy(&frame[9], &sp, 2);
+  memcpy(&frame[11], &rpm, 4);
+  frame[15] = pwm;
+  frame[16] = crc8(&frame[2], 14);
+
+  Serial.write(frame, sizeof(frame));
+  telemSeq++;
+}
+
+// =========================
+// PROFILE
+// =========================
+void printProfileOk() {
+  Serial.print("PROFILE_OK ");
+  Serial.print(profileLen);
+  Serial.print(" ");
+  Serial.println(profileEndMs[profileLen - 1]);
+}
+
+bool parseProfile(String spec) {
+  profileLen = 0;
+  unsigned long total = 0;
+  int n = 0;
+  while (spec.length() > 0) {
+    if (n >= PROFILE_MAX_SEGMENTS) return false;
+    int comma = spec.indexOf(',');
+    String seg = (comma < 0) ? spec : spec.substring(0, comma);
+    spec = (comma < 0) ? String("") : spec.substring(comma + 1);
+
+    int colon = seg.indexOf(':');
+    if (colon < 0) return false;
+    float rpm = seg.substring(0, colon).toFloat();
+    float seconds = seg.substring(colon + 1).toFloat();
+    if (rpm < 0 || rpm > 12000 || seconds < 0) return false;
+
+    total += (unsigned long)(seconds * 1000.0 + 0.5);
+    profileRpm[n] = rpm;
+    profileEndMs[n] = total;
+    n++;
+  }
+  if (n == 0 || total == 0) return false;
+  profileLen = n;
+  return true;
+}
+
+void updateProfile(unsigned long now) {
+  if (profileSegment < 0 || !motorEnabled) return;
+
+  unsigned long elapsed = now - runStartMillis;
+  while (profileSegment < profileLen - 1 && elapsed >= profileEndMs[profileSegment]) {
+    profileSegment++;
+    if (streamEnabled) {
+      Serial.print("PROFILE,");
+      Serial.println(profileSegment);
+    }
+  }
+
+  unsigned long segStart = (profileSegment == 0) ? 0 : profileEndMs[profileSegment - 1];
+  unsigned long segEnd = profileEndMs[profileSegment];
+  double from = (profileSegment == 0) ? profileStartRpm : profileRpm[profileSegment - 1];
+  double to = profileRpm[profileSegment];
+  double f = (elapsed >= segEnd) ? 1.0 : (double)(elapsed - segStart) / (segEnd - segStart);
+  Setpoint = from + (to - from) * f;
+}
+
+// =========================
+// GAINS
+// =========================
+// "PID,<Kp>,<Ki>,<kFF>,<ffOffset>" after every gain change (see UI/tuning.py)
+void printGains() {
+  Serial.print("PID,");
+  Serial.print(Kp, 6);
+  Serial.print(",");
+  Serial.print(Ki, 6);
+  Serial.print(",");
+  Serial.print(kFF, 6);
+  Serial.print(",");
+  Serial.println(ffOffset, 2);
+}
+
 // =========================
 // SERIAL UI
 // =========================
@@ -193,6 +387,23 @@ void handleSerialUI() {
     return;
   }
 
+  // -------------------------
+  // Baud rate upgrade (reply goes out at the old rate)
+  // -------------------------
+  if (cmd.startsWith("BAUD ")) {
+    long baud = cmd.substring(5).toInt();
+    if (baud >= 9600 && baud <= 1000000) {
+      Serial.print("BAUD_OK ");
+      Serial.println(baud);
+      Serial.flush();
+      Serial.end();
+      Serial.begin(baud);
+    } else {
+      Serial.println("BAUD_ERR");
+    }
+    return;
+  }
+
   // -------------------------
   // Start/Stop motor
   // -------------------------
@@ -200,23 +411,69 @@ void handleSerialUI() {
     motorEnabled = true;
     timedRunActive = true;
     runStartMillis = millis();
+    runLengthMs = RUN_TIME_MS;
+    if (profileLen > 0) {
+      profileSegment = 0;
+      profileStartRpm = Setpoint;
+      runLengthMs = profileEndMs[profileLen - 1];
+      if (streamEnabled) Serial.println("PROFILE,0");
+    }
   } else if (cmd == "STOP") {
     motorEnabled = false;
     timedRunActive = false;
+    profileSegment = -1;
     analogWrite(pin_motor, 0);
+    Serial.println("STOPPED");
+  }
+
+  // -------------------------
+  // Profile upload
+  // -------------------------
+  if (cmd == "PROFILE CLEAR") {
+    profileLen = 0;
+    profileSegment = -1;
+    profileSpec = "";
+    Serial.println("PROFILE_OK 0 0");
+    return;
+  }
+  if (cmd.startsWith("PROFILE ")) {
+    String spec = cmd.substring(8);
+    if (profileSegment >= 0 && spec == profileSpec) {
+      printProfileOk();  // re-upload of the running profile: keep running it
+      return;
+    }
+    profileSegment = -1;
+    if (parseProfile(spec)) {
+      profileSpec = spec;
+      printProfileOk();
+    } else {
+      profileSpec = "";
+      Serial.println("PROFILE_ERR");
+    }
+    return;
   }
 
   // -------------------------
   // Setpoint & PID tuning
   // -------------------------
   if (cmd.startsWith("S ")) {
-    Setpoint = constrain(cmd.substring(2).toFloat(), 0, 12000);
+    if (profileSegment < 0) Setpoint = constrain(cmd.substring(2).toFloat(), 0, 12000);
   } else if (cmd.startsWith("KP ")) {
     Kp = cmd.substring(3).toFloat();
     speedPI.SetTunings(Kp, Ki, 0);
+    printGains();
   } else if (cmd.startsWith("KI ")) {
     Ki = cmd.substring(3).toFloat();
     speedPI.SetTunings(Kp, Ki, 0);
+    printGains();
+  } else if (cmd.startsWith("KFF ")) {
+    kFF = cmd.substring(4).toFloat();
+    printGains();
+  } else if (cmd.startsWith("FFO ")) {
+    ffOffset = cmd.substring(4).toFloat();
+    printGains();
+  } else if (cmd == "PID") {
+    printGains();
   }
 
   // -------------------------
@@ -225,6 +482,7 @@ void handleSerialUI() {
   else if (cmd.startsWith("T ")) {
     double seconds = cmd.substring(2).toFloat();
     RUN_TIME_MS = (seconds <= 0) ? 0 : (unsigned long)(seconds * 1000.0);
+    if (profileSegment < 0) runLengthMs = RUN_TIME_MS;  // also the current run, unless a profile
   }
 
   // -------------------------
@@ -232,4 +490,13 @@ void handleSerialUI() {
   // -------------------------
   else if (cmd == "STREAM ON") streamEnabled = true;
   else if (cmd == "STREAM OFF") streamEnabled = false;
+
+  // -------------------------
+  // Telemetry format & rate
+  // -------------------------
+  else if (cmd == "BIN ON") binaryEnabled = true;
+  else if (cmd == "BIN OFF") binaryEnabled = false;
+  else if (cmd.startsWith("RATE ")) {
+    telemPeriodMs = constrain(cmd.substring(5).toInt(), 5, 1000);
+  }
 }
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The UI package is imported from the repository root, as `python -m UI.<tool>` does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from UI.archive import RunArchive
+from UI.emulator import SERIAL_SKETCH, StirrerEmulator
+from UI.recorder import RunRecorder, flush_recordings
+from UI.telemetry import ChunkParser
+
+
+def record_run(runs_dir, commands, until_ms, **meta):
+    """Record an emulated run, one feed per control tick, and index it."""
+    recorder = RunRecorder("emulated", runs_dir=str(runs_dir))
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    parser = ChunkParser()
+    for cmd in ["STREAM ON"] + commands:
+        emulator.handle_command(cmd)
+    recorder.start_run(**meta)
+    t0 = time.time()
+    while emulator.now_ms < until_ms:
+        emulator.run_until(emulator.now_ms + SERIAL_SKETCH.ctrl_period_ms)
+        recorder.record(parser.feed(emulator.read(), emulator.now_ms / 1000), t0)
+    run_id = recorder.run_id
+    recorder.end_run()
+    flush_recordings()
+    archive = RunArchive(str(runs_dir))
+    archive.scan()
+    return archive.setpoint_schedule(run_id)
+
+
+def test_profile_run_stores_its_segment_boundaries(tmp_path):
+    profile = "PROFILE 2000:2,2000:1,4000:0,4000:1"
+    schedule = record_run(tmp_path, ["S 1000", profile, "START"], 3500,
+                          setpoint_rpm=1000, profile=profile)
+    assert list(schedule.rpm) == [1000, 2000, 2000, 4000]
+    assert list(schedule.t_s) == pytest.approx([0, 2, 3, 3], abs=0.3)
+
+
+def test_ramp_without_profile_keeps_its_ends(tmp_path):
+    # A run started elsewhere: the ramp is only seen in the samples
+    profile = "PROFILE 3000:2,3000:1"
+    schedule = record_run(tmp_path, ["S 1000", profile, "START"], 2750)
+    assert len(schedule) <= 3
+    assert schedule.rpm.iloc[-1] == 3000
@@ -0,0 +1,36 @@
+from UI.device_session import DeviceSession
+from UI.emulator import SERIAL_SKETCH, StirrerEmulator
+
+
+def run(session, emulator, commands, until_ms):
+    for text in commands:
+        session.command(text)
+        emulator.write(text.encode())
+    emulator.run_until(until_ms)
+    session.feed(emulator.read())
+
+
+def test_quality_is_reset_per_run_without_recording():
+    session = DeviceSession("emulated", record=False)
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(session, emulator, ["STREAM ON\n", "S 2000\n", "START\n"], 5000)
+    first = session.quality.samples
+    assert first > 0
+    run(session, emulator, ["STOP\n"], 5000)
+    run(session, emulator, ["START\n"], 6000)
+    assert 0 < session.quality.samples < first
+
+
+def test_run_started_by_another_client_resets_quality(monkeypatch):
+    monkeypatch.setattr("UI.device_session.STOP_GRACE_S", 0.0)
+    session = DeviceSession("emulated", record=False)
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    for cmd in ("STREAM ON", "T 2", "START"):  # not sent through this session
+        emulator.handle_command(cmd)
+    emulator.run_until(3000)
+    session.feed(emulator.read())
+    assert session.quality.samples > 0
+    emulator.handle_command("START")
+    emulator.run_until(3500)
+    session.feed(emulator.read())
+    assert session.quality.samples == 2
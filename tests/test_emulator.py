@@ -0,0 +1,155 @@
+import pytest
+
+from UI.device_session import DeviceSession
+from UI.emulator import BLE_SKETCH, SERIAL_SKETCH, StirrerEmulator
+from UI.telemetry import ChunkParser, Sample
+
+
+def lines(emulator):
+    return emulator.read().decode(errors="ignore").splitlines()
+
+
+def run(emulator, commands, until_ms):
+    for cmd in commands:
+        emulator.handle_command(cmd)
+    emulator.run_until(until_ms)
+
+
+def test_who_and_baud():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    emulator.write(b"WHO\nBAUD 115200\nBAUD 50\n")
+    assert lines(emulator) == ["DEVICE:STIRRER", "BAUD_OK 115200", "BAUD_ERR"]
+    assert emulator.baud == 115200
+
+
+def test_malformed_numbers_parse_like_the_firmware():
+    # String.toFloat()/toInt(): the leading number, 0 if there is none
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    emulator.write(b"S abc\nKP ?\nKI 0.5x\nT -\nRATE fast\nBAUD 9600baud\nBAUD x\n")
+    assert emulator.setpoint == 0
+    assert (emulator.kp, emulator.ki) == (0, 0.5)
+    assert emulator.run_time_ms == 0
+    assert emulator.telemetry_period_ms == 5
+    assert lines(emulator)[-2:] == ["BAUD_OK 9600", "BAUD_ERR"]
+    emulator.handle_command("S 2500rpm")
+    assert emulator.setpoint == 2500
+    emulator = StirrerEmulator(BLE_SKETCH, packet_bytes=128)
+    emulator.write(b"MTU\nMTU x\n")
+    assert emulator.notify_bytes == 20
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_controller_reaches_setpoint(sketch):
+    emulator = StirrerEmulator(sketch)
+    run(emulator, ["S 3000", "START"], 60000)   # the serial sketch's PI is slow
+    assert emulator.rpm == pytest.approx(3000, rel=0.05)
+
+
+def test_timed_run_reports_its_end():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(emulator, ["STREAM ON", "T 2", "START"], 3000)
+    out = lines(emulator)
+    assert out[-2:] == ["TIME_LEFT,0", "STOPPED"]
+    assert not emulator.motor_enabled
+    assert emulator.now_ms - emulator.run_start_ms >= 2000
+
+
+def test_stop_reports_stopped():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(emulator, ["START"], 1000)
+    emulator.read()
+    emulator.handle_command("STOP")
+    assert lines(emulator) == ["STOPPED"]
+
+
+# ================= PROFILES =================
+def test_profile_sets_the_run_length():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(emulator, ["STREAM ON", "PROFILE 2000:1,2000:1", "START"], 5000)
+    out = lines(emulator)
+    assert "PROFILE_OK 2 2000" in out
+    assert out.index("PROFILE,DONE") < out.index("STOPPED")
+    assert emulator.run_length_ms == 2000
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_runtime_kept_after_a_profile_run(sketch):
+    # Regression: START with a profile used to overwrite the T runtime
+    emulator = StirrerEmulator(sketch)
+    run(emulator, ["T 5", "PROFILE 2000:1", "START"], 2000)
+    assert not emulator.motor_enabled
+    emulator.handle_command("PROFILE CLEAR")
+    start = emulator.now_ms
+    run(emulator, ["START"], start + 4000)
+    assert emulator.motor_enabled
+    emulator.run_until(start + 5500)
+    assert not emulator.motor_enabled
+
+
+def test_runtime_set_during_a_profile_applies_to_the_next_run():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(emulator, ["PROFILE 2000:3", "START"], 500)
+    emulator.handle_command("T 1")
+    emulator.run_until(2000)
+    assert emulator.motor_enabled            # the profile keeps its length
+    emulator.run_until(3500)
+    assert not emulator.motor_enabled
+    emulator.handle_command("PROFILE CLEAR")
+    start = emulator.now_ms
+    run(emulator, ["START"], start + 1500)
+    assert not emulator.motor_enabled
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_reconnection_keeps_a_running_profile(sketch):
+    # A host reconnecting mid-profile replays the applied S/T/PROFILE commands
+    session = DeviceSession("emulated", record=False)
+    emulator = StirrerEmulator(sketch)
+    for text in ("STREAM ON\n", "S 2000\n", "PROFILE 2000:1,3800:0,3800:3\n", "START\n"):
+        session.command(text)
+        emulator.write(text.encode())
+    emulator.run_until(2000)
+    assert (emulator.profile_segment, emulator.setpoint) == (2, 3800)
+    emulator.read()
+    emulator.write("".join(session.restore_commands()).encode())
+    assert "PROFILE_OK 3 4000" in lines(emulator)
+    assert (emulator.profile_segment, emulator.setpoint) == (2, 3800)
+    emulator.run_until(5000)
+    out = lines(emulator)
+    assert out.index("PROFILE,DONE") < out.index("STOPPED")
+    assert not emulator.motor_enabled
+
+
+def test_bad_profiles_are_rejected():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    for spec in ("PROFILE ", "PROFILE 2000", "PROFILE 20000:1", "PROFILE 2000:0",
+                 "PROFILE " + ",".join(["2000:1"] * 17)):
+        emulator.handle_command(spec)
+        assert lines(emulator) == ["PROFILE_ERR"]
+
+
+# ================= BINARY TELEMETRY =================
+def test_frame_rpm_is_measured_per_frame():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    run(emulator, ["STREAM ON", "BIN ON", "RATE 25", "S 3000", "START"], 10000)
+    rpms = [e.rpm for e in ChunkParser().feed(emulator.read(), 0.0) if isinstance(e, Sample)]
+    spinning = rpms[len(rpms) // 2:]
+    repeats = sum(a == b for a, b in zip(spinning, spinning[1:]))
+    assert repeats < len(spinning) // 4      # the filtered RPM would repeat ~9 in 10
+    assert spinning[-1] == pytest.approx(emulator.motor_rpm, rel=0.02)
+
+
+@pytest.mark.parametrize("telemetry_hz, frames", [(None, 1000 / 50), (1000, 1000)])
+def test_rate_and_forced_telemetry_rate(telemetry_hz, frames):
+    emulator = StirrerEmulator(SERIAL_SKETCH, telemetry_hz=telemetry_hz)
+    run(emulator, ["STREAM ON", "BIN ON", "RATE 50", "START"], 1000)
+    parser = ChunkParser()
+    parser.feed(emulator.read(), 0.0)
+    assert parser.frames == pytest.approx(frames, abs=1)
+
+
+def test_gain_commands_are_reported():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    for cmd in ("KP 0.01", "KI 0.002", "KFF 0.009", "FFO 3"):
+        emulator.handle_command(cmd)
+    assert lines(emulator)[-1] == "PID,0.010000,0.002000,0.009000,3.00"
@@ -0,0 +1,25 @@
+from UI.latency import LatencyTracker
+from UI.telemetry import Sample
+
+
+def feed(tracker, t, setpoint):
+    tracker.observe(Sample(t, setpoint, setpoint, 100))
+
+
+def test_setpoint_round_trip_is_timed():
+    tracker = LatencyTracker("test")
+    feed(tracker, 0.0, 2000)
+    tracker.command_sent("S 3000\n", 0.1)
+    feed(tracker, 0.25, 2000)
+    feed(tracker, 0.5, 3000)
+    assert tracker.histogram.total == 1
+    assert tracker.histogram.percentile(50) >= 400
+
+
+def test_unchanged_setpoint_is_not_timed():
+    tracker = LatencyTracker("test")
+    feed(tracker, 0.0, 2000)
+    tracker.command_sent("S 2000\n", 0.1)
+    feed(tracker, 0.25, 2000)
+    assert tracker.histogram.total == 0
+    assert tracker.timeouts == 0
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from UI.calibration import Calibration
+from UI.emulator import BLE_SKETCH, SERIAL_SKETCH
+from UI.profile import (PROFILE_MAX_CHARS, Profile, ProfileStep, check_profile, encode_profile,
+                        expected_setpoint)
+
+
+def test_profile_validation():
+    with pytest.raises(ValueError):
+        Profile([])
+    with pytest.raises(ValueError):
+        Profile([(2000, -1)])
+    with pytest.raises(ValueError):
+        Profile([(2000, 1)], unit="HZ")
+    assert Profile([(2000, 10), (3000, 5.5)]).duration_s == 15.5
+
+
+def test_encode_profile():
+    steps = [ProfileStep(2000, 10), ProfileStep(3000.4, 0), ProfileStep(3000, 2.5)]
+    assert encode_profile(steps) == "PROFILE 2000:10,3000:0,3000:2.5\n"
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([ProfileStep(2000, 1)] * 17, "steps"),
+    ([ProfileStep(2000, 0)], "no duration"),
+    ([ProfileStep(8000, 1)], "outside"),
+])
+def test_encode_profile_rejects(steps, message):
+    with pytest.raises(ValueError, match=message):
+        encode_profile(steps)
+
+
+def test_encode_profile_length_limit():
+    steps = [ProfileStep(6999.9, 12345.678)] * 16
+    with pytest.raises(ValueError, match="characters"):
+        encode_profile(steps)
+    assert PROFILE_MAX_CHARS <= 244
+
+
+def test_expected_setpoint():
+    steps = [ProfileStep(2000, 10), ProfileStep(4000, 0), ProfileStep(4000, 5)]
+    t = np.array([0, 5, 10, 12, 20])
+    assert list(expected_setpoint(steps, 1000, t)) == [1000, 1500, 4000, 4000, 4000]
+
+
+def test_shear_profile_follows_the_calibration():
+    calibration = Calibration([(1000, 500), (3000, 1500), (7000, 3500)])
+    steps = Profile([(500, 0), (3500, 30)], unit="SHEAR").to_rpm(calibration)
+    # The ramp is split at the 1500 s⁻¹ calibration point
+    assert [round(s.target) for s in steps] == [1000, 3000, 7000]
+    assert [s.duration_s for s in steps] == pytest.approx([0, 10, 20])
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_check_profile_on_the_emulator(sketch):
+    steps = [ProfileStep(2000, 2), ProfileStep(3000, 0), ProfileStep(3000, 1.5), ProfileStep(1500, 1)]
+    report = check_profile(steps, sketch)
+    assert report["ok"], report
+    assert report["lines"][0] == "PROFILE,0"
+    assert report["lines"][-1] == "PROFILE,DONE"
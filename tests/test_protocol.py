@@ -0,0 +1,42 @@
+import pytest
+
+from UI.protocol import FRAME_LEN, SYNC, crc8, decode_telemetry, encode_telemetry
+
+
+def test_frame_round_trip():
+    frame = encode_telemetry(7, 123456, 3000, 2987.5, 142)
+    assert len(frame) == FRAME_LEN
+    assert frame.startswith(SYNC)
+    assert decode_telemetry(frame) == (7, 123456, 3000, 2987.5, 142)
+
+
+def test_counters_wrap_and_fields_are_clamped():
+    seq, t_ms, setpoint, _, pwm = decode_telemetry(
+        encode_telemetry(65536 + 3, 2**32 + 10, 70000.4, 0.0, 300))
+    assert (seq, t_ms, setpoint, pwm) == (3, 10, 0xFFFF, 255)
+    _, _, setpoint, _, pwm = decode_telemetry(encode_telemetry(0, 0, -5, 0.0, -1))
+    assert (setpoint, pwm) == (0, 0)
+
+
+def test_crc_known_value():
+    # CRC-8, poly 0x07, no reflection, init 0: check value of "123456789"
+    assert crc8(b"123456789") == 0xF4
+
+
+@pytest.mark.parametrize("index", range(2, FRAME_LEN))
+def test_corrupted_byte_is_rejected(index):
+    frame = bytearray(encode_telemetry(1, 1000, 2000, 1999.0, 100))
+    frame[index] ^= 0x10
+    with pytest.raises(ValueError):
+        decode_telemetry(frame)
+
+
+def test_bad_sync_short_frame_and_unknown_type():
+    frame = encode_telemetry(1, 1000, 2000, 1999.0, 100)
+    with pytest.raises(ValueError):
+        decode_telemetry(b"\x00" + frame[1:])
+    with pytest.raises(ValueError):
+        decode_telemetry(frame[:-1])
+    body = bytes([0x02]) + frame[3:-1]
+    with pytest.raises(ValueError, match="unknown frame type"):
+        decode_telemetry(SYNC + body + bytes([crc8(body)]))
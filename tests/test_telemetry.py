@@ -0,0 +1,115 @@
+import pytest
+
+from UI.emulator import BLE_PACKET_BYTES, BLE_SKETCH, SERIAL_SKETCH, StirrerEmulator
+from UI.protocol import encode_telemetry
+from UI.telemetry import ChunkParser, Message, Sample, TimeLeft, parse_line
+
+
+def test_parse_line():
+    assert parse_line("b", 1.0) is None
+    assert parse_line("TIME_LEFT,1500", 1.0) == TimeLeft(1500, 1.0)
+    assert parse_line("TIME_LEFT,INF", 1.0) == TimeLeft(None, 1.0)
+    assert parse_line("STOPPED", 1.0) == Message("STOPPED")
+    assert parse_line("PROFILE_OK 2 5000", 1.0) == Message("PROFILE_OK 2 5000")
+    assert parse_line("3000.00,2950.50,27.00", 1.0) == Sample(1.0, 3000.0, 2950.5, 27.0)
+    with pytest.raises(ValueError):
+        parse_line("garbage", 1.0)
+
+
+# ================= ASCII =================
+def test_ascii_lines_split_across_chunks():
+    parser = ChunkParser()
+    data = b"3000.00,2950.50,27.00\r\nb\r\nTIME_LEFT,INF\r\nPID,0.02,0.0015,0.0092,0.00\r\n"
+    events = []
+    for i in range(0, len(data), 5):
+        events += parser.feed(data[i:i + 5], 2.0)
+    assert events == [Sample(2.0, 3000.0, 2950.5, 27.0), TimeLeft(None, 2.0),
+                      Message("PID,0.02,0.0015,0.0092,0.00")]
+    assert parser.stats()["parse_errors"] == 0
+
+
+def test_bad_line_is_counted_and_skipped():
+    parser = ChunkParser()
+    events = parser.feed(b"1,2\nnot,a,number\n3000,2900,30\n", 0.0)
+    assert events == [Sample(0.0, 3000.0, 2900.0, 30.0)]
+    assert parser.parse_errors == 2
+
+
+def test_overlong_partial_line_is_dropped():
+    parser = ChunkParser(max_line=16)
+    assert parser.feed(b"x" * 40, 0.0) == []
+    assert parser.dropped_bytes == 40
+    assert parser.feed(b"\nTIME_LEFT,0\n", 0.0) == [TimeLeft(0, 0.0)]
+
+
+# ================= SERIAL BINARY =================
+def test_binary_frames_interleaved_with_lines():
+    parser = ChunkParser()
+    data = (encode_telemetry(0, 1000, 3000, 2990.0, 120) + b"TIME_LEFT,500\n"
+            + encode_telemetry(1, 1025, 3000, 2995.0, 121))
+    events = []
+    for byte in data:
+        events += parser.feed(bytes([byte]), 10.0)
+    assert [type(e) for e in events] == [Sample, TimeLeft, Sample]
+    first, _, second = events
+    assert (first.seq, first.rpm, first.pwm) == (0, 2990.0, 120.0)
+    assert second.device_t - first.device_t == pytest.approx(0.025)
+    assert parser.frames == 2 and parser.lines == 1
+
+
+def test_corrupt_frame_resyncs_and_lost_frames_counted():
+    parser = ChunkParser()
+    bad = bytearray(encode_telemetry(1, 1025, 3000, 2995.0, 121))
+    bad[12] ^= 0xFF
+    data = (encode_telemetry(0, 1000, 3000, 2990.0, 120) + bytes(bad)
+            + encode_telemetry(2, 1050, 3000, 3001.0, 122))
+    events = parser.feed(data, 0.0)
+    assert [e.seq for e in events] == [0, 2]
+    assert parser.parse_errors > 0
+    assert parser.lost_frames == 1
+
+
+def test_device_clock_reanchored_after_reset():
+    parser = ChunkParser()
+    parser.feed(encode_telemetry(0, 50000, 3000, 0.0, 0), 100.0)
+    sample, = parser.feed(encode_telemetry(1, 10, 3000, 0.0, 0), 130.0)
+    assert sample.device_t == pytest.approx(130.0)
+
+
+def test_serial_emulator_stream():
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    for cmd in ("STREAM ON", "BIN ON", "RATE 25", "T 2", "START"):
+        emulator.handle_command(cmd)
+    emulator.run_until(2500)
+    parser = ChunkParser()
+    events = parser.feed(emulator.read(), 0.0)
+    samples = [e for e in events if isinstance(e, Sample)]
+    assert len(samples) == pytest.approx(2000 / 25, abs=1)
+    assert [s.seq for s in samples] == list(range(len(samples)))
+    assert parser.stats()["parse_errors"] == 0
+    assert events[-2:] == [TimeLeft(0, 0.0), Message("STOPPED")]
+
+
+# ================= BLE PACKED =================
+@pytest.mark.parametrize("mtu", [None, 23, 247])
+def test_ble_packed_notifications(mtu):
+    emulator = StirrerEmulator(BLE_SKETCH, packet_bytes=BLE_PACKET_BYTES)
+    emulator.central_connected()
+    commands = ([f"MTU {mtu}"] if mtu else []) + ["BIN ON", "RATE 25", "PID", "T 1", "START"]
+    for cmd in commands:
+        emulator.handle_command(cmd)
+    emulator.run_until(1500)
+    notifications = emulator.read_notifications()
+    limit = 20 if mtu in (None, 23) else mtu - 3
+    assert max(len(n) for n in notifications) <= limit
+
+    parser = ChunkParser()
+    events = []
+    for notification in notifications:
+        events += parser.feed(notification, 0.0)
+    samples = [e for e in events if isinstance(e, Sample)]
+    assert [s.seq for s in samples] == list(range(len(samples)))
+    assert len(samples) == pytest.approx(1000 / 25, abs=1)
+    assert Message("STOPPED") in events
+    assert any(isinstance(e, Message) and e.text.startswith("PID,") for e in events)
+    assert parser.stats()["parse_errors"] == 0
@@ -0,0 +1,39 @@
+from UI.transport import COMMAND_QUEUE_MAX, Transport
+
+
+def queued(transport):
+    return [text.strip() for _, text in transport._outbox]
+
+
+def test_settings_coalesce_within_a_segment():
+    transport = Transport("test")
+    for text in ("S 1000\n", "S 2000\n", "START\n", "S 3000\n", "S 4000\n"):
+        transport._enqueue(text)
+    assert queued(transport) == ["S 2000", "START", "S 4000"]
+    assert transport.coalesced == 2
+
+
+def test_full_queue_drops_settings_before_start_and_stop():
+    transport = Transport("test")
+    transport._enqueue("STOP\n")
+    for i in range(COMMAND_QUEUE_MAX - 2):
+        transport._enqueue("PID\n")
+    transport._enqueue("S 1000\n")
+    transport._enqueue("START\n")        # full: drops the setting
+    assert queued(transport)[0] == "STOP"
+    assert "S 1000" not in queued(transport) and queued(transport)[-1] == "START"
+    transport._enqueue("WHO\n")          # then the oldest other command
+    assert queued(transport)[:2] == ["STOP", "PID"]
+    assert len(transport._outbox) == COMMAND_QUEUE_MAX
+    assert transport.dropped == 2
+
+
+def test_start_and_stop_are_never_dropped():
+    transport = Transport("test")
+    for i in range(COMMAND_QUEUE_MAX):
+        transport._enqueue("STOP\n" if i % 2 else "START\n")
+    transport._enqueue("S 1000\n")       # refused
+    transport._enqueue("START\n")        # grows the queue
+    assert queued(transport).count("START") == COMMAND_QUEUE_MAX // 2 + 1
+    assert "S 1000" not in queued(transport)
+    assert transport.dropped == 1
@@ -0,0 +1,61 @@
+import pytest
+
+from UI.calibration import load_calibration
+from UI.emulator import BLE_SKETCH, SERIAL_SKETCH, Plant, StirrerEmulator, default_plant
+from UI.telemetry import ChunkParser, Sample
+from UI.tuning import (STEP_HOLD_S, STEP_RPMS, Gains, choose_gains, fit_plant, gain_commands,
+                       parse_gains, simulate_steps, sketch_gains)
+
+
+def test_parse_gains():
+    assert parse_gains("PID,0.020000,0.001500,0.009200,0.00") == Gains(0.02, 0.0015, 0.0092, 0.0)
+    assert parse_gains("PID,0.02,0.0015") is None
+    assert parse_gains("PID,a,b,c,d") is None
+    assert parse_gains("STOPPED") is None
+
+
+def test_gain_commands_round_trip_through_the_emulator():
+    gains = Gains(0.012345, 0.000678, 0.0045, 12.5)
+    emulator = StirrerEmulator(SERIAL_SKETCH)
+    for cmd in gain_commands(gains):
+        emulator.write(cmd.encode())
+    reported = parse_gains(emulator.read().decode().splitlines()[-1])
+    assert reported == pytest.approx(gains)
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_fit_recovers_the_emulated_plant(sketch):
+    plant = default_plant(sketch)
+    samples = simulate_steps(sketch, plant, sketch_gains(sketch))
+    fit = fit_plant(samples, sketch)
+    assert fit.gain == pytest.approx(plant.gain, rel=0.05)
+    assert fit.tau_s == pytest.approx(plant.tau_ms / 1000, abs=0.25)
+
+
+@pytest.mark.parametrize("sketch", [SERIAL_SKETCH, BLE_SKETCH], ids=["serial", "ble"])
+def test_fit_recovers_the_plant_from_binary_telemetry(sketch):
+    # The link commands of a real step test switch the device to binary frames
+    plant = default_plant(sketch)
+    emulator = StirrerEmulator(sketch, plant=plant)
+    parser = ChunkParser()
+    samples = []
+    for i, rpm in enumerate(STEP_RPMS):
+        commands = ["BIN ON", "RATE 25", "STREAM ON", f"S {rpm}", "START"] if i == 0 else [f"S {rpm}"]
+        for cmd in commands:
+            emulator.handle_command(cmd)
+        emulator.run_until((i + 1) * STEP_HOLD_S * 1000)
+        events = parser.feed(emulator.read(), emulator.now_ms / 1000)
+        samples += [e for e in events if isinstance(e, Sample) and e.pwm > 0]
+    fit = fit_plant(samples, sketch)
+    assert fit.gain == pytest.approx(plant.gain, rel=0.05)
+    assert fit.tau_s == pytest.approx(plant.tau_ms / 1000, abs=0.25)
+
+
+def test_chosen_gains_pass_and_settle_faster():
+    # The serial sketch's gains overshoot on this slower, weaker motor
+    sketch = SERIAL_SKETCH
+    plant = Plant(80.0, 5.0, 600.0)
+    fit = fit_plant(simulate_steps(sketch, plant, sketch_gains(sketch)), sketch)
+    current, best = choose_gains(fit, sketch, sketch_gains(sketch), load_calibration())
+    assert best.verdict == "PASS"
+    assert best.total_settling_s < current.total_settling_s